@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import aiohttp
+from base64 import b64encode
+from botocore.exceptions import ClientError
+from typing import Dict, Any, Optional, Tuple
+
+from common.aws import get_client, run_sync
+
+logger = logging.getLogger()
+
+# A cached token is refreshed this long before it expires
+DOC_RIO_TOKEN_REFRESH_MARGIN_SECONDS = int(os.environ.get('DOC_RIO_TOKEN_REFRESH_MARGIN_SECONDS', '60'))
+# Lifetime assumed when the token response has no expires_in (Salesforce omits it; the session timeout applies)
+DOC_RIO_TOKEN_DEFAULT_TTL_SECONDS = int(os.environ.get('DOC_RIO_TOKEN_DEFAULT_TTL_SECONDS', '1800'))
+# SecureString parameter sharing the token between containers (empty keeps the cache per container)
+DOC_RIO_TOKEN_PARAMETER_NAME = os.environ.get('DOC_RIO_TOKEN_PARAMETER_NAME', '')
+DOC_RIO_TOTAL_TIMEOUT_SECONDS = float(os.environ.get('DOC_RIO_TOTAL_TIMEOUT_SECONDS', '300'))
+DOC_RIO_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('DOC_RIO_CONNECT_TIMEOUT_SECONDS', '10'))
+
+
+class DocRioClient:
+    """
+    Client for the DocRio files API.
+
+    The OAuth client-credentials token is cached at module scope and reused by warm invocations
+    until shortly before it expires. Refreshes are single-flight: concurrent callers wait for the
+    one token request in progress instead of each calling the token endpoint. With
+    DOC_RIO_TOKEN_PARAMETER_NAME set, the token is also shared through Parameter Store, so a burst
+    of cold containers does not request one token each. A 401 from the API refreshes the token and
+    retries the request once.
+    """
+
+    def __init__(self, auth_url: str, api_url: str, client_id: str, client_secret: str,
+                 token_parameter_name: str = DOC_RIO_TOKEN_PARAMETER_NAME):
+        self.auth_url = auth_url
+        self.api_url = api_url
+        self.token_parameter_name = token_parameter_name
+        self._basic_auth = f'Basic {b64encode(f"{client_id}:{client_secret}".encode()).decode()}'
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self) -> None:
+        # The session and the lock belong to an event loop, so both are recreated if it changes
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._session = None
+            self._loop = loop
+
+    def get_session(self) -> aiohttp.ClientSession:
+        self._bind_loop()
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(
+                    total=DOC_RIO_TOTAL_TIMEOUT_SECONDS,
+                    connect=DOC_RIO_CONNECT_TIMEOUT_SECONDS
+                )
+            )
+        return self._session
+
+    def _is_fresh(self, expires_at: float) -> bool:
+        return time.time() < expires_at - DOC_RIO_TOKEN_REFRESH_MARGIN_SECONDS
+
+    async def get_token(self, rejected_token: Optional[str] = None) -> str:
+        """
+        Return a valid bearer token, requesting a new one only when no fresh token is cached.
+
+        Args:
+            rejected_token (Optional[str]): A token the API answered 401 to; it is never returned again.
+
+        Raises:
+            aiohttp.ClientError: If the token request fails.
+        """
+        if self._token and self._token != rejected_token and self._is_fresh(self._token_expires_at):
+            return self._token
+
+        self._bind_loop()
+        async with self._lock:
+            # Another caller may have refreshed the token while this one waited
+            if self._token and self._token != rejected_token and self._is_fresh(self._token_expires_at):
+                return self._token
+
+            shared = await run_sync(self._read_shared_token) if self.token_parameter_name else None
+            if shared and shared['access_token'] != rejected_token and self._is_fresh(shared['expires_at']):
+                self._token, self._token_expires_at = shared['access_token'], shared['expires_at']
+                return self._token
+
+            token, expires_at = await self._request_token()
+            self._token, self._token_expires_at = token, expires_at
+            if self.token_parameter_name:
+                await run_sync(self._write_shared_token, token, expires_at)
+            return token
+
+    async def _request_token(self) -> Tuple[str, float]:
+        headers = {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Authorization': self._basic_auth
+        }
+        data = {
+            'grant_type': 'client_credentials'
+        }
+        async with self.get_session().post(self.auth_url, headers=headers, data=data) as response:
+            response.raise_for_status()
+            response_json = await response.json()
+        expires_in = int(response_json.get('expires_in') or DOC_RIO_TOKEN_DEFAULT_TTL_SECONDS)
+        logger.info(f"Retrieved a new DocRio token valid for {expires_in} seconds")
+        return response_json['access_token'], time.time() + expires_in
+
+    def _read_shared_token(self) -> Optional[Dict[str, Any]]:
+        try:
+            response = get_client('ssm').get_parameter(Name=self.token_parameter_name, WithDecryption=True)
+            return json.loads(response['Parameter']['Value'])
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ParameterNotFound':
+                logger.warning(f"Could not read the shared DocRio token: {str(e)}")
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Ignoring malformed shared DocRio token: {str(e)}")
+        return None
+
+    def _write_shared_token(self, token: str, expires_at: float) -> None:
+        try:
+            get_client('ssm').put_parameter(
+                Name=self.token_parameter_name,
+                Value=json.dumps({'access_token': token, 'expires_at': expires_at}),
+                Type='SecureString',
+                Overwrite=True
+            )
+        except ClientError as e:
+            # The token is still cached in this container
+            logger.warning(f"Could not share the DocRio token: {str(e)}")
+
+    async def get_signed_url(self, file_info_id: str) -> str:
+        """
+        Look up the SignedUrlV2 of a File Info record.
+
+        Raises:
+            aiohttp.ClientError: If the lookup fails (after one retry with a new token on 401).
+        """
+        token = await self.get_token()
+        for attempt in range(2):
+            headers = {
+                'accept': 'application/json',
+                'Authorization': f'Bearer {token}'
+            }
+            async with self.get_session().get(self.api_url, headers=headers, params={'Id': file_info_id}) as response:
+                if response.status == 401 and attempt == 0:
+                    logger.info("DocRio rejected the cached token, requesting a new one")
+                    token = await self.get_token(rejected_token=token)
+                    continue
+                response.raise_for_status()
+                response_json = await response.json()
+                return response_json['Records'][0]['SignedUrlV2']
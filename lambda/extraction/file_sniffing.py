@@ -0,0 +1,84 @@
+import re
+from typing import Optional, Tuple
+
+# Bytes read from the start of a file to recognize its type
+SNIFF_BYTES = 4096
+
+# (signature, content type, extension), checked at the start of the file
+FILE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png', '.png'),
+    (b'\xff\xd8\xff', 'image/jpeg', '.jpg'),
+    (b'II*\x00', 'image/tiff', '.tiff'),
+    (b'MM\x00*', 'image/tiff', '.tiff'),
+]
+PDF_SIGNATURE = b'%PDF-'
+PDF_CONTENT_TYPE = 'application/pdf'
+# Image formats that always hold exactly one page (TIFF can hold several)
+SINGLE_PAGE_IMAGE_TYPES = ('image/png', 'image/jpeg')
+UNKNOWN_CONTENT_TYPE = 'application/octet-stream'
+
+# A page object; /Pages (the page tree) is excluded by requiring a non-letter after /Page
+PDF_PAGE_OBJECT_PATTERN = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+# Longest match that can straddle two chunks
+PDF_PAGE_OBJECT_OVERLAP = 64
+
+
+def sniff_content_type(head: bytes) -> Tuple[str, str]:
+    """
+    Recognize a file from its first bytes.
+
+    Returns:
+        Tuple[str, str]: The content type and file extension. Unrecognized files keep the
+        .pdf extension everything was staged with before.
+    """
+    for signature, content_type, extension in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    # Readers accept a PDF header anywhere in the first kilobyte (some scanners prepend junk)
+    if PDF_SIGNATURE in head[:1024]:
+        return PDF_CONTENT_TYPE, '.pdf'
+    return UNKNOWN_CONTENT_TYPE, '.pdf'
+
+
+class PdfPageCounter:
+    """
+    Counts the page objects of a PDF fed to it in order, chunk by chunk, without parsing it.
+
+    The count is a hint, not the page count. Page objects stored inside compressed object streams
+    cannot be seen, so it can be too low (0 when every page is compressed, which finish() reports as
+    unknown), and incrementally updated files can repeat page objects, so it can also be too high.
+    Whatever routes on it must check the real page count before relying on it.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._tail = b''
+
+    def feed(self, data: bytes) -> None:
+        buffer = self._tail + data
+        for match in PDF_PAGE_OBJECT_PATTERN.finditer(buffer):
+            # Matches ending inside the tail were counted with the previous chunk. A match ending at the
+            # end of the buffer may continue as /Pages in the next chunk, so it is left for the next round
+            if len(self._tail) <= match.end() < len(buffer):
+                self.count += 1
+        self._tail = buffer[-PDF_PAGE_OBJECT_OVERLAP:]
+
+    def finish(self) -> Optional[int]:
+        """
+        Returns:
+            Optional[int]: The page count, or None when no page object was visible
+        """
+        match = PDF_PAGE_OBJECT_PATTERN.search(self._tail)
+        if match and match.end() == len(self._tail):
+            self.count += 1
+        self._tail = b''
+        return self.count or None
+
+
+def resolve_page_count(content_type: str, pdf_page_count: Optional[int]) -> Optional[int]:
+    """
+    Page count of a sniffed file, or None when it is not known.
+    """
+    if content_type in SINGLE_PAGE_IMAGE_TYPES:
+        return 1
+    return pdf_page_count if content_type == PDF_CONTENT_TYPE else None
@@ -1,13 +1,19 @@
 import os
 import json
-import boto3
 import aiohttp
 from botocore.exceptions import ClientError
-from typing import Dict, Any
-from base64 import b64encode
+from typing import Dict, Any, Optional
 from aws_xray_sdk.core import xray_recorder
 from aws_xray_sdk.core import patch_all
 import asyncio
+from common.aws import run_sync
+from common.artifacts import find_prior_artifacts
+from common.ocr_routes import OCR_SYNC_MAX_PAGES, OCR_SHARDED_MAX_PAGES
+from common.appconnect import get_appconnect_client
+from common.status import StatusPublisher
+from docrio import DocRioClient
+from transfer import transfer_to_s3
+from file_sniffing import SINGLE_PAGE_IMAGE_TYPES, PDF_CONTENT_TYPE
 
 patch_all()
 
@@ -18,76 +24,41 @@ DOC_RIO_AUTH_URL = os.environ["DOC_RIO_AUTH_URL"]
 DOC_RIO_CLIENT_ID = os.environ["DOC_RIO_CLIENT_ID"]
 DOC_RIO_CLIENT_SECRET = os.environ["DOC_RIO_CLIENT_SECRET"]
 
-IBM_APPCONNECT_URL = os.environ['IBM_APPCONNECT_URL']
-IBM_APPCONNECT_USERNAME = os.environ['IBM_APPCONNECT_USERNAME']
-IBM_APPCONNECT_PASSWORD = os.environ['IBM_APPCONNECT_PASSWORD']
+# Images and PDFs with a known page count within the route ceilings (common.ocr_routes) are OCR'd by the
+# processing Lambda (page by page, in parallel, with a per-page cache) instead of through a Textract job
+OCR_SYNC_ENABLED = os.environ.get('OCR_SYNC_ENABLED', 'true').lower() == 'true'
+# Textract's synchronous APIs accept images up to 10 MB
+OCR_SYNC_MAX_BYTES = int(os.environ.get('OCR_SYNC_MAX_BYTES', str(10 * 1024 * 1024)))
+# The processing Lambda stages the PDF in /tmp to split it
+OCR_SYNC_MAX_PDF_BYTES = int(os.environ.get('OCR_SYNC_MAX_PDF_BYTES', str(256 * 1024 * 1024)))
 
-s3_client = boto3.client("s3")
+# Pooled AppConnect session, reused by warm invocations
+appconnect = get_appconnect_client()
 
-async def update_salesforce_status(file_info_id: str, document_id: str, status: str) -> Dict[str, Any]:
-    """
-    Update the Salesforce status for a given fileInfoId and documentId.
-    """
-    payload = {
-        "Id": document_id,
-        "File_Info_Id__c": file_info_id,
-        "Document_Extraction_Status__c": status
-    }
-    
-    async with aiohttp.ClientSession() as session:
-        try:
-            _url = f"{IBM_APPCONNECT_URL}/Treatment_API/Treatment/{payload['Id']}"
-            print(f"IBM_APPCONNECT_URL: {_url}")
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/json',
-                'Authorization': f'Basic {b64encode(f"{IBM_APPCONNECT_USERNAME}:{IBM_APPCONNECT_PASSWORD}".encode()).decode()}'
-            }
-            
-            payload_json = json.dumps(payload)
-            print(f"Payload JSON: {payload_json}")
-            
-            async with session.put(_url, data=payload_json, headers=headers) as response:
-                response_text = await response.text()
-                print(f"IBM AppConnect response: {response_text}")
-
-                if response.status in [200, 201]:
-                    response_data = json.loads(response_text)
-                    print(f"Successfully notified IBM AppConnect for file {file_info_id}")
-                    return response_data
-                else:
-                    error_message = f"Failed to notify IBM AppConnect. Status: {response.status}, Response: {response_text}"
-                    print(error_message)
-                    raise Exception(error_message)
-        except Exception as e:
-            error_message = f"Error notifying IBM AppConnect: {str(e)}"
-            print(error_message)
-            raise
+# Caches the DocRio token across warm invocations
+docrio = DocRioClient(DOC_RIO_AUTH_URL, DOC_RIO_API_URL, DOC_RIO_CLIENT_ID, DOC_RIO_CLIENT_SECRET)
 
-async def get_bearer_token() -> str:
+def choose_ocr_route(content_type: str, page_count: Optional[int], size: int) -> str:
     """
-    Retrieve a new bearer token using basic authorization.
-    
-    Returns:
-        str: The bearer token.
-    
-    Raises:
-        aiohttp.ClientError: If the token retrieval fails.
+    'sync' (synchronous Textract calls in the processing Lambda) for single-page images within
+    Textract's size limit and for PDFs with a known page count up to OCR_SYNC_MAX_PAGES;
+    'sharded' (the same calls, page by page in parallel) for PDFs up to OCR_SHARDED_MAX_PAGES;
+    'async' (a Textract job) for everything else, including PDFs whose pages could not be counted.
+    The counted pages can be too few, so the processing Lambda checks the real count before OCR.
     """
-    headers = {
-        'Content-Type': 'application/x-www-form-urlencoded',
-        'Authorization': f'Basic {b64encode(f"{DOC_RIO_CLIENT_ID}:{DOC_RIO_CLIENT_SECRET}".encode()).decode()}'
-    }
-    data = {
-        'grant_type': 'client_credentials'
-    }
-    print(f"Authorization Header: {headers}") # TODO: Remove this
-    
-    async with aiohttp.ClientSession() as session:
-        async with session.post(DOC_RIO_AUTH_URL, headers=headers, data=data) as response:
-            response.raise_for_status()
-            response_json = await response.json()
-            return response_json['access_token']
+    if not OCR_SYNC_ENABLED:
+        return 'async'
+    if content_type in SINGLE_PAGE_IMAGE_TYPES:
+        return 'sync' if size <= OCR_SYNC_MAX_BYTES else 'async'
+    if content_type != PDF_CONTENT_TYPE:
+        return 'async'
+    if not page_count or size > OCR_SYNC_MAX_PDF_BYTES:
+        return 'async'
+    if page_count <= OCR_SYNC_MAX_PAGES:
+        return 'sync'
+    if page_count <= OCR_SHARDED_MAX_PAGES:
+        return 'sharded'
+    return 'async'
 
 @xray_recorder.capture('lambda_handler')
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -106,6 +77,7 @@ async def async_lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str,
                         and the original payload for the next step.
     """
     print(f"Received event: {json.dumps(event, default=str)}")
+    status_publisher = StatusPublisher(appconnect)
     
     try:
             
@@ -126,46 +98,31 @@ async def async_lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str,
                 'body': json.dumps({'error': error_message})
             }
             
-        await update_salesforce_status(file_info_id, document_id, "Retrieving Document from Docrio")
+        # Status updates are sent in the background while the document is retrieved
+        await status_publisher.publish(file_info_id, document_id, "Retrieving Document from Docrio")
 
 
-        # Get a new bearer token
-        bearer_token = await get_bearer_token()
-        
-        # Make API request to get SignedUrlV2
-        headers = {
-            'accept': 'application/json',
-            'Authorization': f'Bearer {bearer_token}'
-        }
-        params = {'Id': file_info_id}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(DOC_RIO_API_URL, headers=headers, params=params) as response:
-                response.raise_for_status()
-                response_json = await response.json()
-        
-        # Extract SignedUrlV2
-        signed_url = response_json['Records'][0]['SignedUrlV2']
+        # Get SignedUrlV2 with the cached bearer token
+        signed_url = await docrio.get_signed_url(file_info_id)
 
-        # Download file from SignedUrlV2
-        async with aiohttp.ClientSession() as session:
-            async with session.get(signed_url) as file_response:
-                file_response.raise_for_status()
-                file_content = await file_response.read()
-        
-        # Upload file to RAW_STAGING_BUCKET
-        file_name = f"{file_info_id}.pdf"  # Assuming it's a PDF
-        await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: s3_client.put_object(
-                Bucket=RAW_STAGING_BUCKET_NAME,
-                Key=file_name,
-                Body=file_content
-            )
-        )
-        
-        print(f"Success: File {file_name} uploaded to {RAW_STAGING_BUCKET_NAME}")
+        # Stream the file from SignedUrlV2 into RAW_STAGING_BUCKET, named after its sniffed type. The
+        # content hash lets later stages reuse OCR output for files they have already seen
+        transfer = await transfer_to_s3(docrio.get_session(), signed_url, RAW_STAGING_BUCKET_NAME, file_info_id)
+        file_name = transfer['key']
+        content_hash = transfer['contentHash']
+        unchanged = transfer['unchanged']
+        ocr_route = choose_ocr_route(transfer['contentType'], transfer['pageCount'], transfer['size'])
+        print(f"File {file_name}: {transfer['contentType']}, {transfer['pageCount'] or 'unknown'} pages, OCR route {ocr_route}")
+
+        # An unchanged file keeps the staged object; later stages can reuse what was derived from it
+        prior_artifacts = await run_sync(find_prior_artifacts, content_hash, file_name) if unchanged else None
+        if unchanged:
+            print(f"File {file_name} is unchanged ({content_hash}). Prior artifacts: {prior_artifacts}")
+        else:
+            print(f"Success: File {file_name} ({transfer['size']} bytes, {transfer['parts']} parts) uploaded to {RAW_STAGING_BUCKET_NAME}")
         
-        await update_salesforce_status(file_info_id, document_id, "Extracting Content from Document")
+        await status_publisher.publish(file_info_id, document_id, "Extracting Content from Document")
+        status_update_failures = await status_publisher.flush()
         
         # Prepare the response with the original payload for the next step
         return {
@@ -175,7 +132,14 @@ async def async_lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str,
                 "fileInfoId": file_info_id,
                 "file_name": file_name,
                 "bucket_name": RAW_STAGING_BUCKET_NAME,
-                "documentType": document_type
+                "documentType": document_type,
+                "contentHash": content_hash,
+                "contentType": transfer['contentType'],
+                "pageCount": transfer['pageCount'],
+                "ocrRoute": ocr_route,
+                "unchanged": unchanged,
+                "priorArtifacts": prior_artifacts,
+                "statusUpdateFailures": status_update_failures
             }
         }
     
@@ -185,3 +149,6 @@ async def async_lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str,
             "statusCode": 500,
             "body": json.dumps({"message": f"Error: {str(e)}"})
         }
+    finally:
+        # Never leave updates queued in a frozen container
+        await status_publisher.flush()
@@ -0,0 +1,321 @@
+import os
+import re
+import asyncio
+import hashlib
+import logging
+import aiohttp
+from typing import Dict, Any, List, Optional
+
+from common.aws import get_client, run_sync
+from common.artifacts import (CONTENT_HASH_METADATA_KEY, COPY_OBJECT_MAX_BYTES, get_stored_content_hash,
+                              put_content_hash_sidecar)
+from file_sniffing import SNIFF_BYTES, PdfPageCounter, sniff_content_type, resolve_page_count
+
+logger = logging.getLogger()
+
+# 'streaming' pipes the download into an S3 multipart upload; 'buffered' reads the whole file, then puts it
+EXTRACTION_TRANSFER_MODE = os.environ.get('EXTRACTION_TRANSFER_MODE', 'streaming')
+# Multipart part size (S3 requires at least 5 MB for every part but the last)
+EXTRACTION_PART_SIZE_BYTES = max(int(os.environ.get('EXTRACTION_PART_SIZE_MB', '8')), 5) * 1024 * 1024
+# Parts held in memory at once; peak memory stays around this many parts whatever the file size
+EXTRACTION_TRANSFER_CONCURRENCY = int(os.environ.get('EXTRACTION_TRANSFER_CONCURRENCY', '4'))
+# Download parts with parallel ranged GETs when the source answers a Range request with 206
+EXTRACTION_RANGED_DOWNLOAD = os.environ.get('EXTRACTION_RANGED_DOWNLOAD', 'true').lower() == 'true'
+# Large files can take longer than the session's total timeout, so transfers only time out on a stalled read
+EXTRACTION_READ_TIMEOUT_SECONDS = float(os.environ.get('EXTRACTION_READ_TIMEOUT_SECONDS', '60'))
+
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes\s+\d+-\d+/(\d+)$')
+READ_CHUNK_BYTES = 1024 * 1024
+TRANSFER_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=EXTRACTION_READ_TIMEOUT_SECONDS)
+
+
+class TransferError(ValueError):
+    """
+    The source returned a body that does not match what was requested.
+    """
+
+
+def _content_range_total(response: aiohttp.ClientResponse) -> Optional[int]:
+    match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+    return int(match.group(1)) if match else None
+
+
+class StreamingTransfer:
+    """
+    Copies one file from an HTTP URL into S3 without holding the whole file in memory.
+
+    The body is cut into EXTRACTION_PART_SIZE_BYTES parts that are uploaded as an S3 multipart
+    upload, EXTRACTION_TRANSFER_CONCURRENCY at a time, while the rest is still downloading.
+    When the source supports ranges, parts are also downloaded in parallel. The SHA-256 of the
+    content is computed in part order either way. Files that fit in one part use a plain put.
+
+    The key is key_stem plus the extension of the file type sniffed from the first bytes. When the
+    content turns out to match the hash of the object already at that key, the multipart upload is
+    aborted instead of completed, leaving the existing object untouched. PDF page objects are
+    counted along the way so the caller can route small documents to synchronous OCR.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, url: str, bucket_name: str, key_stem: str):
+        self.session = session
+        self.url = url
+        self.bucket_name = bucket_name
+        self.key_stem = key_stem
+        self.key: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.existing_hash: Optional[str] = None
+        self.page_counter = PdfPageCounter()
+        self._head = b''
+        self.s3_client = get_client('s3')
+        self.slots = asyncio.Semaphore(EXTRACTION_TRANSFER_CONCURRENCY)
+        self.hasher = hashlib.sha256()
+        self.upload_id: Optional[str] = None
+        self.etags: Dict[int, str] = {}
+        self.size = 0
+        self._next_hash_index = 0
+        self._unhashed: Dict[int, bytes] = {}
+        self._hashed: Dict[int, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._failure: Optional[BaseException] = None
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: key, contentType, pageCount (None when unknown), contentHash, size,
+            whether the content was unchanged, parts (0 for a single put) and whether ranged GETs were used
+        """
+        headers = {'Range': f'bytes=0-{EXTRACTION_PART_SIZE_BYTES - 1}'} if EXTRACTION_RANGED_DOWNLOAD else {}
+        try:
+            async with self.session.get(self.url, headers=headers, timeout=TRANSFER_TIMEOUT) as response:
+                response.raise_for_status()
+                total_size = _content_range_total(response) if response.status == 206 else None
+                if total_size is None:
+                    await self._stream(response)
+                else:
+                    first_part = await response.read()
+            if total_size is not None:
+                self._head = first_part[:SNIFF_BYTES]
+                await self._download_ranges(first_part, total_size)
+            await asyncio.gather(*self._tasks)
+        except BaseException:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            if self.upload_id:
+                await run_sync(self.s3_client.abort_multipart_upload,
+                               Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id)
+            raise
+
+        content_hash = self.hasher.hexdigest()
+        unchanged = content_hash == self.existing_hash
+        if self.upload_id:
+            if unchanged:
+                await run_sync(self.s3_client.abort_multipart_upload,
+                               Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id)
+            else:
+                await self._complete(content_hash)
+        return {
+            'key': self.key,
+            'contentType': self.content_type,
+            'pageCount': resolve_page_count(self.content_type, self.page_counter.finish()),
+            'contentHash': content_hash,
+            'size': self.size,
+            'unchanged': unchanged,
+            'parts': len(self.etags),
+            'ranged': total_size is not None
+        }
+
+    async def _stream(self, response: aiohttp.ClientResponse) -> None:
+        # Sequential body: parts are hashed as they are cut, so they are always hashed in order
+        buffer = bytearray()
+        index = 0
+        async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+            buffer += chunk
+            while len(buffer) >= EXTRACTION_PART_SIZE_BYTES:
+                part = bytes(buffer[:EXTRACTION_PART_SIZE_BYTES])
+                del buffer[:EXTRACTION_PART_SIZE_BYTES]
+                await self._submit(index, part)
+                index += 1
+        if index == 0:
+            self._add_hashed(0, bytes(buffer))
+            await self._put_whole(bytes(buffer))
+        elif buffer:
+            await self._submit(index, bytes(buffer))
+
+    async def _submit(self, index: int, part: bytes) -> None:
+        self._add_hashed(index, part)
+        await self._start_upload()
+        await self._acquire_slot()
+        self._tasks.append(asyncio.create_task(self._upload_slot(index, part)))
+
+    async def _upload_slot(self, index: int, part: bytes) -> None:
+        try:
+            await self._upload_part(index, part)
+        except Exception as e:
+            self._fail(e)
+            raise
+        finally:
+            self.slots.release()
+
+    async def _download_ranges(self, first_part: bytes, total_size: int) -> None:
+        part_count = -(-total_size // EXTRACTION_PART_SIZE_BYTES)
+        if part_count <= 1:
+            self._add_hashed(0, first_part)
+            await self._put_whole(first_part)
+            return
+
+        await self._start_upload()
+        for index in range(part_count):
+            # A slot is held until the part is uploaded and hashed, which bounds the parts kept in memory
+            await self._acquire_slot()
+            self._hashed[index] = asyncio.Event()
+            start = index * EXTRACTION_PART_SIZE_BYTES
+            end = min(start + EXTRACTION_PART_SIZE_BYTES, total_size) - 1
+            self._tasks.append(asyncio.create_task(
+                self._range_slot(index, start, end, first_part if index == 0 else None)))
+
+    async def _range_slot(self, index: int, start: int, end: int, part: Optional[bytes]) -> None:
+        try:
+            if part is None:
+                async with self.session.get(self.url, headers={'Range': f'bytes={start}-{end}'},
+                                            timeout=TRANSFER_TIMEOUT) as response:
+                    response.raise_for_status()
+                    part = await response.read()
+            if len(part) != end - start + 1:
+                raise TransferError(f"Range {start}-{end} of {self.key} returned {len(part)} bytes")
+            self._add_hashed(index, part)
+            await self._upload_part(index, part)
+            await self._hashed[index].wait()
+        except Exception as e:
+            self._fail(e)
+            raise
+        finally:
+            self.slots.release()
+
+    async def _acquire_slot(self) -> None:
+        await self.slots.acquire()
+        if self._failure:
+            self.slots.release()
+            raise self._failure
+
+    def _fail(self, error: BaseException) -> None:
+        # Parts waiting for an earlier part to be hashed would otherwise hold their slots forever
+        self._failure = self._failure or error
+        for hashed in self._hashed.values():
+            hashed.set()
+
+    def _add_hashed(self, index: int, part: bytes) -> None:
+        if index == 0:
+            self._head = part[:SNIFF_BYTES]
+        self.size += len(part)
+        self._unhashed[index] = part
+        while self._next_hash_index in self._unhashed:
+            in_order = self._unhashed.pop(self._next_hash_index)
+            self.hasher.update(in_order)
+            self.page_counter.feed(in_order)
+            hashed = self._hashed.get(self._next_hash_index)
+            if hashed:
+                hashed.set()
+            self._next_hash_index += 1
+
+    async def _resolve_target(self) -> None:
+        if self.key is None:
+            self.content_type, extension = sniff_content_type(self._head)
+            self.key = f"{self.key_stem}{extension}"
+            self.existing_hash = await run_sync(get_stored_content_hash, self.bucket_name, self.key)
+
+    async def _start_upload(self) -> None:
+        if self.upload_id is None:
+            await self._resolve_target()
+            response = await run_sync(self.s3_client.create_multipart_upload,
+                                      Bucket=self.bucket_name, Key=self.key, ContentType=self.content_type)
+            self.upload_id = response['UploadId']
+
+    async def _upload_part(self, index: int, part: bytes) -> None:
+        response = await run_sync(
+            self.s3_client.upload_part,
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=index + 1,
+            Body=part
+        )
+        self.etags[index + 1] = response['ETag']
+
+    async def _put_whole(self, content: bytes) -> None:
+        await self._resolve_target()
+        if self.hasher.hexdigest() == self.existing_hash:
+            return
+        await run_sync(
+            self.s3_client.put_object,
+            Bucket=self.bucket_name,
+            Key=self.key,
+            Body=content,
+            ContentType=self.content_type,
+            Metadata={CONTENT_HASH_METADATA_KEY: self.hasher.hexdigest()}
+        )
+
+    async def _complete(self, content_hash: str) -> None:
+        response = await run_sync(
+            self.s3_client.complete_multipart_upload,
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': [{'ETag': etag, 'PartNumber': number} for number, etag in sorted(self.etags.items())]}
+        )
+        # The hash is only known once the last part is read, so it is attached with a server-side copy,
+        # or kept in a sidecar object when the file is too large to copy
+        if self.size > COPY_OBJECT_MAX_BYTES:
+            await run_sync(put_content_hash_sidecar, self.bucket_name, self.key, response['ETag'], content_hash)
+            return
+        await run_sync(
+            self.s3_client.copy_object,
+            Bucket=self.bucket_name,
+            Key=self.key,
+            CopySource={'Bucket': self.bucket_name, 'Key': self.key},
+            ContentType=self.content_type,
+            Metadata={CONTENT_HASH_METADATA_KEY: content_hash},
+            MetadataDirective='REPLACE'
+        )
+
+
+async def transfer_to_s3(session: aiohttp.ClientSession, url: str, bucket_name: str, key_stem: str) -> Dict[str, Any]:
+    """
+    Download url into s3://bucket_name/<key_stem><extension>, the extension matching the sniffed file
+    type, tagging the object with the content's SHA-256. Nothing is written when the object already
+    at that key has the same hash.
+
+    Returns:
+        Dict[str, Any]: The key, content type and page count, contentHash and size of the file,
+        whether it was unchanged, and how it was transferred
+    """
+    if EXTRACTION_TRANSFER_MODE != 'buffered':
+        return await StreamingTransfer(session, url, bucket_name, key_stem).run()
+
+    async with session.get(url, timeout=TRANSFER_TIMEOUT) as response:
+        response.raise_for_status()
+        content = await response.read()
+    content_type, extension = sniff_content_type(content[:SNIFF_BYTES])
+    key = f"{key_stem}{extension}"
+    page_counter = PdfPageCounter()
+    page_counter.feed(content)
+    content_hash = hashlib.sha256(content).hexdigest()
+    unchanged = content_hash == await run_sync(get_stored_content_hash, bucket_name, key)
+    if not unchanged:
+        await run_sync(
+            get_client('s3').put_object,
+            Bucket=bucket_name,
+            Key=key,
+            Body=content,
+            ContentType=content_type,
+            Metadata={CONTENT_HASH_METADATA_KEY: content_hash}
+        )
+    return {
+        'key': key,
+        'contentType': content_type,
+        'pageCount': resolve_page_count(content_type, page_counter.finish()),
+        'contentHash': content_hash,
+        'size': len(content),
+        'unchanged': unchanged,
+        'parts': 0,
+        'ranged': False
+    }
@@ -1,26 +1,22 @@
 import json
-import boto3
 import os
 import time
 import asyncio
-import aiohttp
 from botocore.exceptions import ClientError
 from decimal import Decimal
 from boto3.dynamodb.conditions import Key
-from base64 import b64encode
 import requests
 from aws_xray_sdk.core import xray_recorder
 from aws_xray_sdk.core import patch_all
+from common.aws import table_call
+from common.appconnect import get_appconnect_client
 
 patch_all()
 
-# Initialize DynamoDB client
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['DOCUMENT_METADATA_TABLE_NAME'])
+DOCUMENT_METADATA_TABLE_NAME = os.environ['DOCUMENT_METADATA_TABLE_NAME']
 
-IBM_APPCONNECT_URL = os.environ['IBM_APPCONNECT_URL']
-IBM_APPCONNECT_USERNAME = os.environ['IBM_APPCONNECT_USERNAME']
-IBM_APPCONNECT_PASSWORD = os.environ['IBM_APPCONNECT_PASSWORD']
+# Pooled AppConnect session, reused by warm invocations
+appconnect = get_appconnect_client()
 
 
 async def update_dynamodb(document_id: str, status: str, completion_time: int, duration: float, error: str = None) -> None:
@@ -39,7 +35,8 @@ async def update_dynamodb(document_id: str, status: str, completion_time: int, d
     """
     try:
         # First, query the table to get the latest item for this documentId
-        response = table.query(
+        response = await table_call(
+            DOCUMENT_METADATA_TABLE_NAME, 'query',
             KeyConditionExpression=Key('documentId').eq(document_id),
             ScanIndexForward=False,  # This will sort in descending order
             Limit=1  # We only need the most recent item
@@ -61,7 +58,7 @@ async def update_dynamodb(document_id: str, status: str, completion_time: int, d
             if error:
                 item['error'] = error
             
-            table.put_item(Item=item)
+            await table_call(DOCUMENT_METADATA_TABLE_NAME, 'put_item', Item=item)
         else:
             # If an item exists, update it
             latest_item = items[0]
@@ -83,7 +80,8 @@ async def update_dynamodb(document_id: str, status: str, completion_time: int, d
                 expression_attribute_names['#error'] = 'error'
                 expression_attribute_values[':error'] = error
 
-            table.update_item(
+            await table_call(
+                DOCUMENT_METADATA_TABLE_NAME, 'update_item',
                 Key={
                     'documentId': document_id,
                     'timestamp': latest_item['timestamp']
@@ -100,35 +98,14 @@ async def update_dynamodb(document_id: str, status: str, completion_time: int, d
 
 async def notify_ibm_appconnect(file_info_id, payload):
     print(f"Payload: {payload}")
-    async with aiohttp.ClientSession() as session:
-        try:
-            _url = f"{IBM_APPCONNECT_URL}/Treatment_API/Treatment/{payload['Id']}"
-            print(f"IBM_APPCONNECT_URL: {_url}")
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/json',
-                'Authorization': f'Basic {b64encode(f"{IBM_APPCONNECT_USERNAME}:{IBM_APPCONNECT_PASSWORD}".encode()).decode()}'
-            }
-            
-            payload_json = json.dumps(payload)
-            print(f"Payload JSON: {payload_json}")
-            
-            async with session.put(_url, data=payload_json, headers=headers) as response:
-                response_text = await response.text()
-                print(f"IBM AppConnect response: {response_text}")
-
-                if response.status in [200, 201]:
-                    response_data = json.loads(response_text)
-                    print(f"Successfully notified IBM AppConnect for file {file_info_id}")
-                    return response_data  # Return the entire response data
-                else:
-                    error_message = f"Failed to notify IBM AppConnect. Status: {response.status}, Response: {response_text}"
-                    print(error_message)
-                    raise Exception(error_message)
-        except Exception as e:
-            error_message = f"Error notifying IBM AppConnect: {str(e)}"
-            print(error_message)
-            raise Exception(error_message)
+    try:
+        response_data = await appconnect.update_treatment(payload)
+        print(f"Successfully notified IBM AppConnect for file {file_info_id}")
+        return response_data  # Return the entire response data
+    except Exception as e:
+        error_message = f"Error notifying IBM AppConnect: {str(e)}"
+        print(error_message)
+        raise Exception(error_message)
 
 
 async def process_event(event):
@@ -243,7 +220,8 @@ def construct_appconnect_payload(extracted_data, file_info_id, document_id):
 @xray_recorder.capture('lambda_handler')
 def lambda_handler(event, context):
     try:
-        result = asyncio.run(process_event(event))
+        # Reuse the container's event loop so the pooled AppConnect session survives warm invocations
+        result = asyncio.get_event_loop().run_until_complete(process_event(event))
         return result
     except Exception as e:
         print(f"Error in lambda_handler: {str(e)}")
@@ -0,0 +1,81 @@
+import json
+import time
+import logging
+from typing import Dict, Any, Tuple
+
+logger = logging.getLogger()
+
+
+def invoke_model_streaming(bedrock_runtime: Any, model_id: str, request_body: Dict[str, Any],
+                           closing_tag: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Invoke a Claude model with InvokeModelWithResponseStream and read text deltas only until
+    closing_tag has been generated. Nothing after it is parsed, so the stream is closed
+    right away. The tag is also sent as a stop sequence so the model stops generating.
+
+    Blocking (reads the event stream); run it with run_sync.
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: The generated text (including closing_tag when it was reached),
+        and timings: timeToFirstTokenMs, totalMs, stoppedAtTag, stopReason, inputTokens, outputTokens
+    """
+    body = dict(request_body)
+    body['stop_sequences'] = list(body.get('stop_sequences', [])) + [closing_tag]
+
+    started = time.monotonic()
+    response = bedrock_runtime.invoke_model_with_response_stream(
+        modelId=model_id,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(body)
+    )
+    stream = response['body']
+
+    parts = []
+    # End of the text read so far, long enough to find a tag split across two deltas
+    tail = ''
+    first_token_at = None
+    stopped_at_tag = False
+    stop_reason = None
+    usage: Dict[str, Any] = {}
+    try:
+        for event in stream:
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            payload = json.loads(chunk['bytes'])
+            event_type = payload.get('type')
+
+            if event_type == 'message_start':
+                usage['inputTokens'] = payload.get('message', {}).get('usage', {}).get('input_tokens')
+            elif event_type == 'content_block_delta':
+                text = payload.get('delta', {}).get('text')
+                if not text:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                parts.append(text)
+                window = tail + text
+                if closing_tag in window:
+                    stopped_at_tag = True
+                    break
+                tail = window[-(len(closing_tag) - 1):]
+            elif event_type == 'message_delta':
+                stop_reason = payload.get('delta', {}).get('stop_reason')
+                usage['outputTokens'] = payload.get('usage', {}).get('output_tokens')
+                # Bedrock leaves the matched stop sequence out of the text
+                if stop_reason == 'stop_sequence' and payload['delta'].get('stop_sequence') == closing_tag:
+                    parts.append(closing_tag)
+                    stopped_at_tag = True
+    finally:
+        stream.close()
+
+    finished = time.monotonic()
+    stats = {
+        'timeToFirstTokenMs': round((first_token_at - started) * 1000) if first_token_at else None,
+        'totalMs': round((finished - started) * 1000),
+        'stoppedAtTag': stopped_at_tag,
+        'stopReason': stop_reason,
+        **usage
+    }
+    return ''.join(parts), stats
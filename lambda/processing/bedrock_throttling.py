@@ -0,0 +1,176 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError, ReadTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+logger = logging.getLogger()
+
+# Client-side pacing against the account's Bedrock quotas for the model (0 disables a limit).
+# Each Lambda instance paces itself, so set these to the quota divided by the expected concurrency.
+BEDROCK_RPM_LIMIT = float(os.environ.get('BEDROCK_RPM_LIMIT', '0'))
+BEDROCK_TPM_LIMIT = float(os.environ.get('BEDROCK_TPM_LIMIT', '0'))
+# Retries of throttled or transiently failing calls, with full-jitter exponential backoff
+BEDROCK_MAX_RETRIES = int(os.environ.get('BEDROCK_MAX_RETRIES', '6'))
+BEDROCK_RETRY_BASE_SECONDS = float(os.environ.get('BEDROCK_RETRY_BASE_SECONDS', '1'))
+BEDROCK_RETRY_MAX_SECONDS = float(os.environ.get('BEDROCK_RETRY_MAX_SECONDS', '30'))
+
+# Retries are done here, with pacing and metrics, instead of inside botocore
+BEDROCK_CLIENT_CONFIG = Config(retries={'max_attempts': 1, 'mode': 'standard'})
+
+THROTTLING_ERROR_CODES = ('ThrottlingException', 'TooManyRequestsException')
+TRANSIENT_ERROR_CODES = ('ServiceUnavailableException', 'InternalServerException',
+                         'ModelNotReadyException', 'ModelTimeoutException', 'ModelStreamErrorException')
+
+
+class TokenBucket:
+    """
+    Refills at rate_per_minute up to one minute's worth. acquire() waits until the requested
+    amount is available, so callers go out at the configured rate instead of in bursts.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = rate_per_minute
+        self.available = rate_per_minute
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """
+        Returns:
+            float: Seconds spent waiting
+        """
+        # A single request larger than the bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        # Waiters are served in order, so a large request is not starved by smaller ones
+        async with self._lock:
+            self._refill()
+            while self.available < amount:
+                delay = (amount - self.available) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.available -= amount
+        return waited
+
+    def settle(self, reserved: float, used: float) -> None:
+        """
+        Return what a call reserved but did not use (or take what it used beyond its reservation).
+        """
+        self._refill()
+        self.available = min(self.capacity, self.available + reserved - used)
+
+    def drain(self) -> None:
+        """
+        Empty the bucket after a throttle, so the other calls of this instance back off as well.
+        """
+        self._refill()
+        self.available = min(self.available, 0)
+
+
+def classify_error(error: Exception) -> Optional[str]:
+    """
+    'throttled' or 'transient' for errors worth retrying, None for everything else.
+    """
+    if isinstance(error, ClientError):
+        code = error.response.get('Error', {}).get('Code') or ''
+        # Errors raised mid-stream by a response stream use camelCase codes (throttlingException)
+        code = code[:1].upper() + code[1:]
+        if code in THROTTLING_ERROR_CODES:
+            return 'throttled'
+        if code in TRANSIENT_ERROR_CODES:
+            return 'transient'
+        return None
+    if isinstance(error, (ConnectionError, ReadTimeoutError)):
+        return 'transient'
+    return None
+
+
+class BedrockInvoker:
+    """
+    Paces Bedrock calls with request and token buckets and retries throttled and transient
+    failures with jittered exponential backoff, so bursts queue up instead of failing documents.
+    Keep one per container; the buckets are shared by every call made from it.
+    """
+
+    def __init__(self, rpm_limit: float = BEDROCK_RPM_LIMIT, tpm_limit: float = BEDROCK_TPM_LIMIT,
+                 max_retries: int = BEDROCK_MAX_RETRIES):
+        self.requests = TokenBucket(rpm_limit) if rpm_limit > 0 else None
+        self.tokens = TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self.max_retries = max_retries
+        self._loop = None
+
+    def _bind_loop(self) -> None:
+        # Buckets hold an asyncio.Lock, which belongs to the loop that created it
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            for bucket in (self.requests, self.tokens):
+                if bucket:
+                    bucket._lock = asyncio.Lock()
+
+    async def invoke(self, call: Callable[[], Awaitable[T]], estimated_tokens: int,
+                     used_tokens: Callable[[T], Optional[int]] = lambda result: None) -> Tuple[T, Dict[str, Any]]:
+        """
+        Run call() once the buckets allow it, retrying throttled and transient errors.
+
+        Args:
+            call: Makes one Bedrock request
+            estimated_tokens: Input plus max output tokens, reserved from the token bucket per attempt
+            used_tokens: Reads the actual token usage from a result, to settle the reservation
+                (None keeps the whole reservation)
+
+        Returns:
+            Tuple[T, Dict[str, Any]]: The result and the call's metrics
+            (attempts, throttles, pacingWaitMs, backoffWaitMs)
+
+        Raises:
+            Exception: The last error, when it is not retryable or the retries are used up
+        """
+        self._bind_loop()
+        metrics = {'attempts': 0, 'throttles': 0, 'pacingWaitMs': 0, 'backoffWaitMs': 0}
+        while True:
+            waited = 0.0
+            if self.requests:
+                waited += await self.requests.acquire(1)
+            if self.tokens:
+                waited += await self.tokens.acquire(estimated_tokens)
+            metrics['pacingWaitMs'] += round(waited * 1000)
+            metrics['attempts'] += 1
+
+            try:
+                result = await call()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == 'throttled':
+                    metrics['throttles'] += 1
+                    for bucket in (self.requests, self.tokens):
+                        if bucket:
+                            bucket.drain()
+                if kind is None or metrics['attempts'] > self.max_retries:
+                    logger.warning(f"Bedrock call failed after {metrics['attempts']} attempts: {metrics}")
+                    raise
+                delay = random.uniform(0, min(BEDROCK_RETRY_MAX_SECONDS,
+                                              BEDROCK_RETRY_BASE_SECONDS * 2 ** (metrics['attempts'] - 1)))
+                logger.info(f"Bedrock call {kind} ({str(e)}). Retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                metrics['backoffWaitMs'] += round(delay * 1000)
+                continue
+
+            if self.tokens:
+                used = used_tokens(result)
+                if used is not None:
+                    self.tokens.settle(min(estimated_tokens, self.tokens.capacity), used)
+            return result, metrics
@@ -0,0 +1,175 @@
+import re
+import math
+import asyncio
+import logging
+from typing import List, Dict, Any, Callable, Awaitable, Optional, TypeVar
+
+from prompts import DOCUMENT_FIELDS, CHOICE_VALUES
+from textract_text import split_pages, PAGE_SEPARATOR
+
+logger = logging.getLogger()
+
+T = TypeVar('T')
+
+LIST_ITEM_PATTERN = re.compile(r'<li>(.*?)</li>', re.DOTALL | re.IGNORECASE)
+NOT_APPLICABLE_VALUES = {'', 'n/a', 'na', 'none', 'null'}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate for Claude models (about four characters per token).
+    """
+    return math.ceil(len(text) / 4)
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Split OCR text into chunks of at most max_tokens, keeping whole pages together.
+
+    Pages are packed into a chunk until the next page would exceed the budget. A single page
+    that is larger than the budget on its own is split on line boundaries.
+    """
+    chunks = []
+    current_pages: List[str] = []
+    current_tokens = 0
+
+    for page in split_pages(text):
+        page_tokens = estimate_tokens(page)
+        if page_tokens > max_tokens:
+            if current_pages:
+                chunks.append(PAGE_SEPARATOR.join(current_pages))
+                current_pages, current_tokens = [], 0
+            chunks.extend(_split_page(page, max_tokens))
+            continue
+
+        if current_pages and current_tokens + page_tokens > max_tokens:
+            chunks.append(PAGE_SEPARATOR.join(current_pages))
+            current_pages, current_tokens = [], 0
+        current_pages.append(page)
+        current_tokens += page_tokens
+
+    if current_pages:
+        chunks.append(PAGE_SEPARATOR.join(current_pages))
+    return chunks
+
+
+def _split_page(page: str, max_tokens: int) -> List[str]:
+    chunks = []
+    current_lines: List[str] = []
+    current_tokens = 0
+    for line in page.split("\n"):
+        line_tokens = estimate_tokens(line) + 1
+        if current_lines and current_tokens + line_tokens > max_tokens:
+            chunks.append("\n".join(current_lines))
+            current_lines, current_tokens = [], 0
+        current_lines.append(line)
+        current_tokens += line_tokens
+    if current_lines:
+        chunks.append("\n".join(current_lines))
+    return chunks
+
+
+async def extract_chunks(chunks: List[str], extract: Callable[[str], Awaitable[T]],
+                         concurrency: int) -> List[T]:
+    """
+    Run the extraction for every chunk concurrently, with at most `concurrency` model calls
+    in flight. Results are returned in chunk (page) order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def extract_chunk(index: int, chunk: str) -> T:
+        async with semaphore:
+            logger.info(f"Extracting chunk {index + 1}/{len(chunks)} (~{estimate_tokens(chunk)} tokens)")
+            return await extract(chunk)
+
+    return await asyncio.gather(*(extract_chunk(index, chunk) for index, chunk in enumerate(chunks)))
+
+
+def reduce_extractions(document_type: str, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge the partial results of each chunk into one result, field by field, according to
+    the field types in prompts.DOCUMENT_FIELDS. Partials must be in page order.
+    """
+    reducers = {
+        'text': _reduce_text,
+        'list': _reduce_list,
+        'visit_count': _reduce_visit_count,
+        'unique_count': _reduce_unique_count,
+        'boolean': _reduce_boolean,
+        'choice': _reduce_choice,
+    }
+
+    reduced = {}
+    for field, field_type in DOCUMENT_FIELDS[document_type].items():
+        values = [partial.get(field) for partial in partials if isinstance(partial, dict)]
+        values = [value for value in values if value is not None]
+        reduced[field] = reducers[field_type](values) if values else None
+    return reduced
+
+
+def _reduce_text(values: List[Any]) -> Optional[str]:
+    for value in values:
+        if str(value).strip().lower() not in NOT_APPLICABLE_VALUES:
+            return str(value).strip()
+    return str(values[0])
+
+
+def _list_items(value: Any) -> List[str]:
+    if isinstance(value, list):
+        items = []
+        for entry in value:
+            items.extend(_list_items(entry))
+        return items
+    text = str(value)
+    items = LIST_ITEM_PATTERN.findall(text)
+    return [item.strip() for item in items] if items else [text.strip()]
+
+
+def _normalize_item(item: str) -> str:
+    return re.sub(r'[^a-z0-9 ]', '', re.sub(r'\s+', ' ', item.lower())).strip()
+
+
+def _reduce_list(values: List[Any]) -> str:
+    items = []
+    seen = set()
+    for value in values:
+        for item in _list_items(value):
+            normalized = _normalize_item(item)
+            if normalized in NOT_APPLICABLE_VALUES or normalized in seen:
+                continue
+            seen.add(normalized)
+            items.append(item)
+
+    if not items:
+        return "N/A"
+    return "<ul>" + "".join(f"<li>{item}</li>" for item in items) + "</ul>"
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _reduce_visit_count(values: List[Any]) -> int:
+    # Chunks cover disjoint page ranges, so visits found in each chunk add up
+    return sum(count for count in map(_to_int, values) if count is not None)
+
+
+def _reduce_unique_count(values: List[Any]) -> int:
+    # The same finding is often repeated across reports, so summing would double count
+    counts = [count for count in map(_to_int, values) if count is not None]
+    return max(counts) if counts else 0
+
+
+def _reduce_boolean(values: List[Any]) -> bool:
+    return any(value is True or str(value).strip().lower() == 'true' for value in values)
+
+
+def _reduce_choice(values: List[Any]) -> Optional[str]:
+    # Records are chronological, so the latest recommendation is the current one
+    for value in reversed(values):
+        if value in CHOICE_VALUES:
+            return value
+    return values[-1]
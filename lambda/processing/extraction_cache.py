@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+from typing import Dict, Any, Optional, List, Tuple
+
+from common.aws import get_client, get_table
+
+logger = logging.getLogger()
+
+# Comma-separated tiers checked in order: memory, dynamodb, s3 (empty disables the cache)
+EXTRACTION_CACHE_TIERS = os.environ.get('EXTRACTION_CACHE_TIERS', 'memory,dynamodb')
+EXTRACTION_CACHE_TTL_SECONDS = int(os.environ.get('EXTRACTION_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+EXTRACTION_CACHE_MEMORY_ENTRIES = int(os.environ.get('EXTRACTION_CACHE_MEMORY_ENTRIES', '256'))
+EXTRACTION_CACHE_TABLE_NAME = os.environ.get('EXTRACTION_CACHE_TABLE_NAME')
+EXTRACTION_CACHE_BUCKET_NAME = os.environ.get('EXTRACTION_CACHE_BUCKET_NAME', os.environ.get('LAMBDA_OUTPUT_BUCKET_NAME'))
+EXTRACTION_CACHE_PREFIX = os.environ.get('EXTRACTION_CACHE_PREFIX', 'extraction-cache/')
+
+
+def build_cache_key(text: str, document_type: str, model_id: str, prompt_version: str) -> str:
+    """
+    Content-addressed key: the same OCR text, document type, model and prompts always map
+    to the same cached extraction, wherever the document came from.
+    """
+    text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    key_material = json.dumps([text_hash, document_type, model_id, prompt_version])
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+
+class MemoryCacheTier:
+    """
+    In-process LRU. Lives at module scope, so it is shared by warm invocations of the same container.
+    Chunks are looked up from several worker threads at once, so the LRU is guarded by a lock.
+    """
+    name = 'memory'
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self.entries[key] = (time.time() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class DynamoDBCacheTier:
+    """
+    Shared tier in a DynamoDB table keyed by cacheKey. Expired items are removed by the
+    table's TTL, and also ignored on read because TTL deletion is not immediate.
+    """
+    name = 'dynamodb'
+
+    def __init__(self, table_name: str, ttl_seconds: int):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = get_table(self.table_name).get_item(Key={'cacheKey': key}).get('Item')
+        if not item or int(item.get('ttl', 0)) < time.time():
+            return None
+        return json.loads(item['value'])
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        get_table(self.table_name).put_item(Item={
+            'cacheKey': key,
+            'value': json.dumps(value),
+            'ttl': int(time.time()) + self.ttl_seconds
+        })
+
+
+class S3CacheTier:
+    """
+    Shared tier storing one JSON object per key. Pair with a lifecycle rule on the prefix to
+    clean up expired entries; expiry is also checked on read.
+    """
+    name = 's3'
+
+    def __init__(self, bucket_name: str, prefix: str, ttl_seconds: int):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = get_client('s3').get_object(Bucket=self.bucket_name, Key=f"{self.prefix}{key}.json")
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        entry = json.load(response['Body'])
+        if entry.get('expiresAt', 0) < time.time():
+            return None
+        return entry['value']
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        get_client('s3').put_object(
+            Bucket=self.bucket_name,
+            Key=f"{self.prefix}{key}.json",
+            Body=json.dumps({'expiresAt': int(time.time()) + self.ttl_seconds, 'value': value}),
+            ContentType="application/json"
+        )
+
+
+class ExtractionCache:
+    """
+    Tiered cache of extraction results. Reads check tiers in order and backfill the faster
+    tiers on a hit further down. Writes go to every tier. Cache errors are logged and treated
+    as misses so they never fail a document.
+    """
+
+    def __init__(self, tiers: List[Any]):
+        self.tiers = tiers
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        for index, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                logger.warning(f"Extraction cache tier {tier.name} read failed: {str(e)}")
+                continue
+            if value is not None:
+                for faster_tier in self.tiers[:index]:
+                    self._put(faster_tier, key, value)
+                return value, tier.name
+        return None, None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        for tier in self.tiers:
+            self._put(tier, key, value)
+
+    @staticmethod
+    def _put(tier: Any, key: str, value: Dict[str, Any]) -> None:
+        try:
+            tier.put(key, value)
+        except Exception as e:
+            logger.warning(f"Extraction cache tier {tier.name} write failed: {str(e)}")
+
+
+def create_extraction_cache() -> ExtractionCache:
+    tiers = []
+    for tier_name in [name.strip() for name in EXTRACTION_CACHE_TIERS.split(',') if name.strip()]:
+        if tier_name == 'memory':
+            tiers.append(MemoryCacheTier(EXTRACTION_CACHE_MEMORY_ENTRIES, EXTRACTION_CACHE_TTL_SECONDS))
+        elif tier_name == 'dynamodb' and EXTRACTION_CACHE_TABLE_NAME:
+            tiers.append(DynamoDBCacheTier(EXTRACTION_CACHE_TABLE_NAME, EXTRACTION_CACHE_TTL_SECONDS))
+        elif tier_name == 's3' and EXTRACTION_CACHE_BUCKET_NAME:
+            tiers.append(S3CacheTier(EXTRACTION_CACHE_BUCKET_NAME, EXTRACTION_CACHE_PREFIX, EXTRACTION_CACHE_TTL_SECONDS))
+        else:
+            logger.warning(f"Extraction cache tier '{tier_name}' is unknown or not configured. Skipping it.")
+    return ExtractionCache(tiers)
@@ -1,16 +1,31 @@
 import os
-import boto3
 import json
 import logging
 from botocore.exceptions import ClientError
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime
 import time
-import aiohttp
-from base64 import b64encode
 from aws_xray_sdk.core import xray_recorder
 from aws_xray_sdk.core import patch_all
 import asyncio
+from textract_output import list_output_parts, iter_output_blocks
+from textract_text import combine_textract_results, PAGE_SEPARATOR
+from prompts import SYSTEM_PROMPT, build_user_prompt, empty_extraction, prompt_version
+from extraction_cache import create_extraction_cache, build_cache_key
+from ocr_artifacts import get_content_hash, load_ocr_text, save_ocr_text, ocr_artifact_key as ocr_artifact_key_for
+from chunked_extraction import estimate_tokens, split_into_chunks, extract_chunks, reduce_extractions
+from text_compaction import compact_text
+from page_relevance import select_relevant_pages
+from sync_ocr import ocr_document_sync, SyncOcrUnsuitable
+from bedrock_streaming import invoke_model_streaming
+from bedrock_throttling import BedrockInvoker, BEDROCK_CLIENT_CONFIG
+from model_tiering import model_ladder, ladder_id, validate_extraction
+from common.aws import get_client, run_sync, table_call
+from common.appconnect import get_appconnect_client
+from common.status import StatusPublisher
+from common.artifacts import analysis_key
+from common.leases import ConcurrencyGovernor, LeaseUnavailable
+from common.ocr_routes import SYNC_OCR_ROUTES, route_max_pages
 
 patch_all()
 
@@ -29,63 +44,57 @@ if missing_vars:
     raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
 # Initialize AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-textract_client = boto3.client('textract')
-bedrock_runtime = boto3.client('bedrock-runtime')
+s3_client = get_client('s3')
+textract_client = get_client('textract')
+bedrock_runtime = get_client('bedrock-runtime', BEDROCK_CLIENT_CONFIG)
+
+# Module scope so the in-memory tier survives warm invocations
+extraction_cache = create_extraction_cache()
+# Pace and retry Bedrock calls, one per model (quotas are per model); module scope so every call of the container shares the buckets
+bedrock_invokers: Dict[str, BedrockInvoker] = {}
 
 # Get environment variables
-table = dynamodb.Table(os.environ['DOCUMENT_METADATA_TABLE_NAME'])
+DOCUMENT_METADATA_TABLE_NAME = os.environ['DOCUMENT_METADATA_TABLE_NAME']
 BEDROCK_MODEL_ID = os.environ['BEDROCK_MODEL_ID']
 LAMBDA_OUTPUT_BUCKET_NAME = os.environ['LAMBDA_OUTPUT_BUCKET_NAME']
-
-IBM_APPCONNECT_URL = os.environ['IBM_APPCONNECT_URL']
-IBM_APPCONNECT_USERNAME = os.environ['IBM_APPCONNECT_USERNAME']
-IBM_APPCONNECT_PASSWORD = os.environ['IBM_APPCONNECT_PASSWORD']
-
-async def update_salesforce_status(file_info_id, document_id, status):
-    """
-    Update the Salesforce status for a given fileInfoId and documentId.
-    """
-    
-    payload = {
-        "Id": document_id,
-        "File_Info_Id__c": file_info_id,
-        "Document_Extraction_Status__c": status
-    }
-    
-    async with aiohttp.ClientSession() as session:
-        try:
-            _url = f"{IBM_APPCONNECT_URL}/Treatment_API/Treatment/{payload['Id']}"
-            logger.info(f"IBM_APPCONNECT_URL: {_url}")
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/json',
-                'Authorization': f'Basic {b64encode(f"{IBM_APPCONNECT_USERNAME}:{IBM_APPCONNECT_PASSWORD}".encode()).decode()}'
-            }
-            
-            payload_json = json.dumps(payload)
-            logger.info(f"Payload JSON: {payload_json}")
-            
-            async with session.put(_url, data=payload_json, headers=headers) as response:
-                response_text = await response.text()
-                logger.info(f"IBM AppConnect response: {response_text}")
-
-                if response.status in [200, 201]:
-                    response_data = json.loads(response_text)
-                    logger.info(f"Successfully notified IBM AppConnect for file {file_info_id}")
-                    return response_data  # Return the entire response data
-                else:
-                    error_message = f"Failed to notify IBM AppConnect. Status: {response.status}, Response: {response_text}"
-                    logger.error(error_message)
-                    raise Exception(error_message)
-        except Exception as e:
-            error_message = f"Error notifying IBM AppConnect: {str(e)}"
-            logger.error(error_message)
-            raise
+TEXTRACT_OUTPUT_BUCKET_NAME = os.environ.get('TEXTRACT_OUTPUT_BUCKET_NAME', LAMBDA_OUTPUT_BUCKET_NAME)
+
+# Pooled AppConnect session, reused by warm invocations
+appconnect = get_appconnect_client()
+
+# 'workflow' reuses the Textract job started by the Step Function; 'self' always starts a new job in this Lambda
+TEXTRACT_JOB_SOURCE = os.environ.get('TEXTRACT_JOB_SOURCE', 'workflow')
+# 's3' reads the job's OutputConfig objects in parallel, 'api' pages through the Textract Get API
+TEXTRACT_RESULT_SOURCE = os.environ.get('TEXTRACT_RESULT_SOURCE', 's3')
+
+# Documents estimated above the threshold are split into page-aligned chunks that are extracted concurrently
+EXTRACTION_CHUNK_THRESHOLD_TOKENS = int(os.environ.get('EXTRACTION_CHUNK_THRESHOLD_TOKENS', '60000'))
+EXTRACTION_CHUNK_MAX_TOKENS = int(os.environ.get('EXTRACTION_CHUNK_MAX_TOKENS', '40000'))
+EXTRACTION_CHUNK_CONCURRENCY = int(os.environ.get('EXTRACTION_CHUNK_CONCURRENCY', '4'))
+
+# Strip repeated page headers/footers and whitespace from the OCR text before it is sent to Bedrock
+OCR_COMPACTION_ENABLED = os.environ.get('OCR_COMPACTION_ENABLED', 'true').lower() == 'true'
+# Send only the pages holding the sections a document type's fields come from (types with a section vocabulary)
+PAGE_RELEVANCE_ENABLED = os.environ.get('PAGE_RELEVANCE_ENABLED', 'true').lower() == 'true'
+# Return the prior analysis of a source file the extraction stage found unchanged, when the model and prompts match
+REUSE_UNCHANGED_ANALYSIS = os.environ.get('REUSE_UNCHANGED_ANALYSIS', 'true').lower() == 'true'
+# Stream the model's response and stop reading once the extracted data is complete
+BEDROCK_STREAMING = os.environ.get('BEDROCK_STREAMING', 'true').lower() == 'true'
+BEDROCK_MAX_TOKENS = int(os.environ.get('BEDROCK_MAX_TOKENS', '4096'))
+
+# Bedrock calls and Textract jobs in flight across every processing Lambda (leases in CONCURRENCY_LEASE_TABLE_NAME).
+# The Textract limit is shared with the jobs the workflow starts through the callback Lambda.
+BEDROCK_CONCURRENCY_LIMIT = int(os.environ.get('BEDROCK_CONCURRENCY_LIMIT', '10'))
+TEXTRACT_JOB_CONCURRENCY_LIMIT = int(os.environ.get('TEXTRACT_JOB_CONCURRENCY_LIMIT', '50'))
+# Leases outlive the Lambda timeout, so a crashed holder's slot frees up once it could no longer be running
+CONCURRENCY_LEASE_SECONDS = int(os.environ.get('CONCURRENCY_LEASE_SECONDS', '900'))
+
+bedrock_calls = ConcurrencyGovernor('bedrock', BEDROCK_CONCURRENCY_LIMIT, CONCURRENCY_LEASE_SECONDS)
+textract_jobs = ConcurrencyGovernor('textract-jobs', TEXTRACT_JOB_CONCURRENCY_LIMIT, CONCURRENCY_LEASE_SECONDS)
 
 async def async_lambda_handler(event, context):
     logger.info(f"Received event: {json.dumps(event, default=str)}")
+    status_publisher = StatusPublisher(appconnect)
     
     try:
         processing_result = event['processingResult']
@@ -103,38 +112,119 @@ async def async_lambda_handler(event, context):
                 'body': json.dumps({'error': error_message})
             }
         
-        await update_salesforce_status(file_info_id, document_id, "Processing Extracted Document Content")
+        # Sent in the background while OCR and extraction run
+        await status_publisher.publish(file_info_id, document_id, "Processing Extracted Document Content")
             
         logger.info(f"Validated input: bucket={bucket_name}, key={key}, type={document_type}")
 
-        job_id = start_textract_job(bucket_name, key)
-        if not job_id:
-            raise ValueError("Failed to start Textract job")
-        logger.info(f"Started Textract job: {job_id}")
-
-        # So with these parameters, your function will wait a maximum of about 87.5 minutes (1 hour and 27.5 minutes) before timing out. 
-        # This should be sufficient for most Textract jobs, but you might want to verify this against your typical document processing times.
-        job_status = await wait_for_job_completion(job_id, max_attempts=180, delay=3)
-        logger.info(f"Textract job completed with status: {job_status}")
-        if job_status != 'SUCCEEDED':
-            raise ValueError(f"Textract job failed or timed out. Final status: {job_status}")
+        # OCR runs once per unique file: reuse the persisted text when this content was already processed
+        content_hash = processing_result.get('contentHash') or await run_sync(get_content_hash, bucket_name, key)
+        ocr_artifact_key = ocr_artifact_key_for(content_hash)
+
+        prior_analysis = await run_sync(load_prior_analysis, processing_result) if REUSE_UNCHANGED_ANALYSIS else None
+        if prior_analysis is not None:
+            output_key, organized_data = prior_analysis
+            logger.info(f"Source file is unchanged. Reusing analysis {output_key}; skipping OCR and extraction.")
+            status_update_failures = await status_publisher.flush()
+            return create_success_response(output_key, organized_data, document_id, file_info_id,
+                                           content_hash, ocr_artifact_key, status_update_failures)
+        combined_text = await run_sync(load_ocr_text, content_hash)
+        if combined_text is not None:
+            logger.info(f"Loaded persisted OCR text {ocr_artifact_key}. Skipping Textract.")
+        else:
+            combined_text = await extract_text_with_textract(processing_result, bucket_name, key)
+            await run_sync(save_ocr_text, content_hash, combined_text, key)
+            logger.info(f"Persisted OCR text to {ocr_artifact_key}")
+
+        # The persisted artifact keeps the full OCR text; only the model input is compacted
+        compaction_stats = None
+        if OCR_COMPACTION_ENABLED:
+            combined_text, compaction_stats = compact_text(combined_text)
+            logger.info(f"Compacted OCR text: {compaction_stats}")
+
+        page_relevance = None
+        if PAGE_RELEVANCE_ENABLED:
+            combined_text, page_relevance = select_relevant_pages(combined_text, document_type)
+            logger.info(f"Page relevance filter: {page_relevance}")
 
-        textract_results = await get_textract_results(job_id)
-        combined_text = combine_textract_results(textract_results)
         organized_data = await process_data_with_claude(combined_text, key, document_type)
+        organized_data["compaction"] = compaction_stats
+        organized_data["pageRelevance"] = page_relevance
 
         logger.info(f"Organized data: {organized_data}")
 
-        output_key = f"{key}-organized-analysis.json"
-        save_to_s3(organized_data, output_key)
-        await update_dynamodb(key, organized_data)
+        output_key = analysis_key(key)
+        # The S3 and DynamoDB writes are independent, so they run concurrently
+        await asyncio.gather(
+            run_sync(save_to_s3, organized_data, output_key),
+            update_dynamodb(key, organized_data)
+        )
         
-        return create_success_response(output_key, organized_data, document_id, file_info_id)
-
+        status_update_failures = await status_publisher.flush()
+        return create_success_response(output_key, organized_data, document_id, file_info_id,
+                                       content_hash, ocr_artifact_key, status_update_failures)
+
+    except (LeaseUnavailable, SyncOcrUnsuitable):
+        # Every slot stayed busy (the Step Function retries the task later), or the document needs
+        # a Textract job (the Step Function starts one): fail the invocation with the error's name
+        await status_publisher.flush()
+        raise
     except Exception as e:
         logger.error(f"Error in lambda_handler: {str(e)}", exc_info=True)
+        await status_publisher.flush()
         return create_error_response(e)
 
+async def extract_text_with_textract(processing_result: Dict[str, Any], bucket_name: str, key: str) -> str:
+    """
+    OCR the staged document with Textract and return the combined text with page boundaries.
+    """
+    ocr_route = processing_result.get('ocrRoute')
+    if ocr_route in SYNC_OCR_ROUTES:
+        # The workflow routed the document here without starting a Textract job: OCR it page by page.
+        # SyncOcrUnsuitable propagates so the workflow runs a Textract job through the callback path
+        content_type = processing_result.get('contentType')
+        max_pages = route_max_pages(ocr_route)
+        if ocr_route == 'sharded':
+            # Long documents put as much load on Textract as a job, so they share the job slots
+            async with textract_jobs.slot():
+                combined_text, _ = await ocr_document_sync(bucket_name, key, content_type, max_pages)
+        else:
+            combined_text, _ = await ocr_document_sync(bucket_name, key, content_type, max_pages)
+        return combined_text
+
+    workflow_job_id = processing_result.get('textractJobId')
+    if workflow_job_id and TEXTRACT_JOB_SOURCE == 'workflow':
+        # The workflow already ran (and waited for) a document analysis job, so read its results directly
+        logger.info(f"Reusing workflow Textract analysis job: {workflow_job_id}")
+        textract_blocks = iter_textract_results(
+            workflow_job_id, api='analysis',
+            output_bucket=TEXTRACT_OUTPUT_BUCKET_NAME, output_prefix=f'textract-output/{key}',
+            loop=asyncio.get_running_loop()
+        )
+    else:
+        # Fallback: start and wait for our own text detection job, holding a Textract job slot while it runs
+        async with textract_jobs.slot():
+            job_id = await run_sync(start_textract_job, bucket_name, key)
+            if not job_id:
+                raise ValueError("Failed to start Textract job")
+            logger.info(f"Started Textract job: {job_id}")
+
+            # So with these parameters, your function will wait a maximum of about 87.5 minutes (1 hour and 27.5 minutes) before timing out. 
+            # This should be sufficient for most Textract jobs, but you might want to verify this against your typical document processing times.
+            job_status = await wait_for_job_completion(job_id, max_attempts=180, delay=3)
+        logger.info(f"Textract job completed with status: {job_status}")
+        if job_status != 'SUCCEEDED':
+            raise ValueError(f"Textract job failed or timed out. Final status: {job_status}")
+
+        textract_blocks = iter_textract_results(
+            job_id, output_bucket=LAMBDA_OUTPUT_BUCKET_NAME, output_prefix=f'textract-output/{key}',
+            loop=asyncio.get_running_loop()
+        )
+
+    # Blocks are fetched, filtered and rendered one page at a time so the full block list is never held in memory
+    combined_text = await run_sync(combine_textract_results, textract_blocks, PAGE_SEPARATOR)
+    return combined_text
+
 @xray_recorder.capture('lambda_handler')
 def lambda_handler(event, context):
     loop = asyncio.get_event_loop()
@@ -156,6 +246,33 @@ def start_textract_job(bucket_name: str, key: str) -> str:
     )
     return response['JobId']
 
+def load_prior_analysis(processing_result: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    The analysis an earlier run stored for this source file, when the extraction stage found the file
+    unchanged and that analysis was produced for the same document type, model ladder and prompts.
+
+    Returns:
+        Optional[Tuple[str, Dict[str, Any]]]: The analysis S3 key and its organized data, or None
+    """
+    location = (processing_result.get('priorArtifacts') or {}).get('analysis')
+    if not processing_result.get('unchanged') or not location:
+        return None
+
+    try:
+        response = s3_client.get_object(Bucket=location['bucket'], Key=location['key'])
+        organized_data = json.loads(response['Body'].read())
+    except (ClientError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not load prior analysis {location['key']}: {str(e)}")
+        return None
+
+    document_type = processing_result['documentType']
+    if (organized_data.get('documentType') != document_type
+            or organized_data.get('modelId') != ladder_id(model_ladder(document_type))
+            or organized_data.get('promptVersion') != prompt_version(document_type)):
+        logger.info(f"Prior analysis {location['key']} was produced with a different type, model or prompt. Reprocessing.")
+        return None
+    return location['key'], organized_data
+
 def save_to_s3(data: Dict[str, Any], output_key: str) -> None:
     s3_client.put_object(
         Bucket=LAMBDA_OUTPUT_BUCKET_NAME,
@@ -165,7 +282,9 @@ def save_to_s3(data: Dict[str, Any], output_key: str) -> None:
     )
 
 def create_success_response(output_key: str, organized_data: Dict[str, Any], 
-                            document_id: str, file_info_id: str) -> Dict[str, Any]:
+                            document_id: str, file_info_id: str, content_hash: str = None,
+                            ocr_artifact_key: str = None,
+                            status_update_failures: List[Dict[str, Any]] = None) -> Dict[str, Any]:
     return {
         'statusCode': 200,
         'body': json.dumps({'message': 'Medical document processed successfully'}),
@@ -175,6 +294,12 @@ def create_success_response(output_key: str, organized_data: Dict[str, Any],
         'documentType': organized_data['documentType'],
         'sourceKey': organized_data['sourceKey'],
         'processingTimestamp': organized_data['processingTimestamp'],
+        'extractionCache': organized_data.get('cache'),
+        'compaction': organized_data.get('compaction'),
+        'pageRelevance': organized_data.get('pageRelevance'),
+        'statusUpdateFailures': status_update_failures or [],
+        'contentHash': content_hash,
+        'ocrArtifactKey': ocr_artifact_key,
         'documentId': document_id,
         'fileInfoId': file_info_id
     }
@@ -205,7 +330,7 @@ async def wait_for_job_completion(job_id: str, max_attempts: int = 120, delay: i
     """
     for attempt in range(max_attempts):
         try:
-            response = textract_client.get_document_text_detection(JobId=job_id)
+            response = await run_sync(textract_client.get_document_text_detection, JobId=job_id)
             status = response['JobStatus']
             
             if status == 'SUCCEEDED':
@@ -226,19 +351,47 @@ async def wait_for_job_completion(job_id: str, max_attempts: int = 120, delay: i
     
     raise ValueError(f"Textract job timed out after {max_attempts} attempts")
 
-async def get_textract_results(job_id: str) -> List[Dict[str, Any]]:
-    pages = []
+def iter_textract_results(job_id: str, api: str = 'text', output_bucket: str = None,
+                          output_prefix: str = None,
+                          loop: asyncio.AbstractEventLoop = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield all blocks for a completed Textract job, one response page at a time.
+
+    Args:
+        job_id: The Textract job ID
+        api: 'text' for StartDocumentTextDetection jobs, 'analysis' for StartDocumentAnalysis jobs
+        output_bucket: Bucket of the job's OutputConfig, read in parallel when TEXTRACT_RESULT_SOURCE is 's3'
+        output_prefix: S3Prefix of the job's OutputConfig
+        loop: The handler's event loop, which schedules the parallel output part reads. Consume the
+            blocks on a worker thread (run_sync) so the loop stays free to run them
+
+    Yields:
+        Dict[str, Any]: Blocks in reading order
+    """
+    if TEXTRACT_RESULT_SOURCE == 's3' and output_bucket and output_prefix and loop:
+        part_keys = list_output_parts(output_bucket, output_prefix, job_id)
+        if part_keys:
+            logger.info(f"Reading {len(part_keys)} Textract output parts from s3://{output_bucket}/{output_prefix}/{job_id}/")
+            yield from iter_output_blocks(output_bucket, part_keys, loop)
+            return
+        logger.info("No Textract output parts found in S3. Falling back to the Textract Get API")
+
+    get_results = textract_client.get_document_analysis if api == 'analysis' else textract_client.get_document_text_detection
     next_token = None
 
     while True:
         try:
             if next_token:
-                response = textract_client.get_document_text_detection(JobId=job_id, NextToken=next_token)
+                response = get_results(JobId=job_id, NextToken=next_token)
             else:
-                response = textract_client.get_document_text_detection(JobId=job_id)
+                response = get_results(JobId=job_id)
+
+            if response.get('JobStatus') not in (None, 'SUCCEEDED', 'PARTIAL_SUCCESS'):
+                raise ValueError(f"Textract job {job_id} is not complete. Status: {response.get('JobStatus')}")
 
-            pages.extend(response.get('Blocks', []))
-            logger.info(f"Retrieved {len(response.get('Blocks', []))} blocks from Textract")
+            blocks = response.get('Blocks', [])
+            logger.info(f"Retrieved {len(blocks)} blocks from Textract")
+            yield from blocks
 
             next_token = response.get('NextToken')
             if not next_token:
@@ -247,93 +400,109 @@ async def get_textract_results(job_id: str) -> List[Dict[str, Any]]:
             logger.error(f"Error calling Textract API: {str(e)}")
             raise
 
-    return pages
-
-def combine_textract_results(textract_results: List[Dict[str, Any]]) -> str:
-    combined_text = []
-    for block in textract_results:
-        if block.get('BlockType') == 'LINE':
-            text = block.get('Text')
-            if text is not None:
-                combined_text.append(text)
-    return "\n".join(combined_text)
-
 async def process_data_with_claude(combined_text: str, src_key: str, document_type: str) -> Dict[str, Any]:
-    system_prompt = """You are a medical document processor trained in extracting information from medical documents. Use the provided Textract OCR results to extract the data accurately and concisely."""
-
-    document_prompts = {
-            "PT/Chiro": """Extract the following information and DO NOT be repetitive:
-- history: The patients account of what they verbally told the provider. Summarize the history of present illness from the many vistis, and cause of injury (Limit to 1-2 sentences, do not be repetive). {"value": string}
-- chiefComplaints: What the client complained about in regards to their injury (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g. "chiefComplaints": "<ul><li>First complaint description</li><li>Second complaint description</li><li>Third complaint description</li></ul>") {"value": "<ul><li>string</li></ul>"}
-- numberOfVisits: Total count of visits to the provider. {"value": number}
-- impression: The provider's diagnosis and interpretation of the patient's condition based on their exam or diagnostic test (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {"value": "<ul><li>string</li></ul>"}
-- recommendations: Recommendations based on treatment. Important, only select ONE of the available string values: Physical Therapy, Diagnostic Testing, Injections, Surgery. {"value": string}""",
-            "Provider": """Extract the following information and DO NOT be repetitive:
-- history: The patients account of what they verbally told the provider. Summarize the history of present illness from the many vistis, and cause of injury (Limit to 1-2 sentences, do not be repetive).{"value": strings}
-- chiefComplaints: What the client complained about in regards to their injury (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g. "chiefComplaints": "<ul><li>First complaint description</li><li>Second complaint description</li><li>Third complaint description</li></ul>") {"value": "<ul><li>string</li></ul>"}
-- numberOfVisits: Total count of visits to the provider. The default value is 0. {"value": number}
-- examFindings: The physical exam findings throughout the chronology of the visits. Summary based on current physical exam and the clients condition (Limit to 4-6 sentences). If a list of sentences are provided, please wrap them inordered list <li></li> tags in the response. (e.g. "examFindings": ["<ul><li>Finding 1</li><li>Finding 2</li>Finding 3</li></ul>"]) {"value": "<ul><li>string</li></ul>"}
-- impression: The provider's diagnosis and interpretation of the patient's condition based on their exam or diagnostic test (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {"value": "<ul><li>string</li></ul>"}
-- recommendations: Recommendations based on treatment. Important, onlyselect ONE of the available string values: Physical Therapy, Diagnostic Testing, Injections, Surgery. {"value": string}
-- surgeryRecommended: If surgery is recommended next course of treatment then true else false. The default value is false. {"value": boolean}
-- injectionRecommended: If injections are recommended next course of treatment then true else false. The default value is false. {"value": boolean}
-- numberOfOtherPositiveFindings: Count of unique findings that are NOT fractures, bulges, herniations, or tears. The default value is 0. {"value": number}""",
-            "Diagnostic Test": """Extract the following information and DO NOT be repetitive:
-- numberOfVisits: Total count of visits to the provider. The default value is 0. {"value": number}
-- impression: The provider's diagnosis and interpretation of the patient's condition based on their exam or diagnostic test (bulleted list of strings). Please use bulleted list <li></li> tags in the response.. (e.g "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {"value": "<ul><li>string</li></ul>"}
-- positiveFindings: If a positive finding of fractures, bulges, herniations,or tears exist then true else false. The default value is false. {"value": boolean}
-- numberofFractures: Count of unique fractures in findings. The default value is 0. {"value": number}
-- numberofBulges: Count of unique bulges in findings. The default value is 0. {"value": number}
-- numberofHerniations: Count of unique herniations in findings. The default value is 0. {"value": number}
-- numberofTears: Count of unique tears in findings. The default value is 0. {"value": number}
-- radiculopathy: If Radiculopathy exists in findings then true else false. The default value is false. {"value": boolean}
-- numberOfOtherPositiveFindings: Count of unique findings that are NOT fractures, bulges, herniations, or tears. The default value is 0. {"value": number}""",
-            "Procedures": """Extract the following information and DO NOT be repetitive:
-- numberOfVisits: Total count of visits to the provider. The default value is 0. {"value": number}
-- preOpDiagnosis: The medical condition identified before surgery that requires the surgical procedure (bulleted list of strings). Please use bulleted list <li></li> tags in the response. If there is no pre-op diagnosis, use "N/A" {"value": "<ul><li>string</li></ul>"}
-- postOpDiagnosis: The confirmed medical condition after surgery, often refined with additional findings from the operation (bulleted list of strings). Please use bulleted list <li></li> tags in the response. If there is no post-op diagnosis, use "N/A" {"value": "<ul><li>string</li></ul>"}
-- procedurePerformed: The specific surgical procedure carried out to address the diagnosed medical condition. The default value is an empty array. If there are procedures performed, please use bulleted list <li></li> tags in the response. If there is no procedure performed, use "N/A" {"value": "<ul><li>string</li></ul>"}""",
-            "Hospital/Urgent Care": """Extract the following information and DO NOT be repetitive:
-- history: The patients account of what they verbally told the provider. Summarize the history of present illness from the many vistis, and cause of injury (Limit to 1-2 sentences, do not be repetive). {"value": string}
-- chiefComplaints: What the client complained about in regards to their injury (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g. "chiefComplaints": "<ul><li>First complaint description</li><li>Second complaint description</li><li>Third complaint description</li></ul>") {"value": "<ul><li>string</li></ul>"}
-- impression: The provider's diagnosis and interpretation of the patient's condition based on their exam or diagnostic test (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {"value": "<ul><li>string</li></ul>"}
-- surgeryRecommended: If surgery is recommended next course of treatment then true else false. The default value is false. {"value": boolean}
-- injectionRecommended: If injections are recommended next course of treatment then true else false. The default value is false. {"value": boolean}
-- radiculopathy: If Radiculopathy exists in findings then true else false. The default value is false. {"value": boolean}"""
+    ladder = model_ladder(document_type)
+    models = ladder_id(ladder)
+    cache_key = build_cache_key(combined_text, document_type, models, prompt_version(document_type))
+    cached_data, cache_tier = await run_sync(extraction_cache.get, cache_key)
+    if cached_data is not None:
+        logger.info(f"Extraction cache hit ({cache_tier}) for {src_key}. Skipping Bedrock.")
+        return {
+            "documentType": document_type,
+            "extractedData": cached_data,
+            "sourceKey": src_key,
+            "processingTimestamp": datetime.now().isoformat(),
+            "modelId": models,
+            "promptVersion": prompt_version(document_type),
+            "cache": {"hit": True, "tier": cache_tier, "key": cache_key}
         }
 
-    user_prompt = f"""
-    {document_prompts[document_type]}
-
-Do NOT be repetitive in any of your answers. Respond with a JSON object containing the extracted information, matching the structure and data types specified above and follow the instructions in the prompt.
-Some of the items will return a list of strings, please use an unorderded bulleted list <li></li> tags in the response.(e.g. "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {{"value": "<ul><li>string</li></ul>"}}
-Please do not include the "value" key in the response of the JSON object. Do not return "history": {{"value": "This is the history"}}, instead return the value with out the "value" key e.g. {{"history": "This is the history"}}.
-Also important, do not create new keys outside of the ones specified (e.g. do not create {{ "1": "Physical Therapy", "2": "Surgery" }} it must be {{ "recommendations": 'Physical Therapy', 'Surgery'}}), the keys must be the same as the ones specified in the prompt.
-Wrap the JSON object in <extracted_data> tags. If you cannot find the requested information, return an empty JSON object with null values. Do not include any other content in your response. Please ensure that JSON is valid and all fields are present."""
-
-    extraction_response = await invoke_claude_converse(system_prompt, user_prompt, combined_text)
-    extracted_json_str = await extract_tagged_content(extraction_response, 'extracted_data')
-    
-    if not extracted_json_str:
-        logger.warning(f"No extracted data found for document type: {document_type}")
-        extracted_data = {field: None for field in document_prompts[document_type].split('\n') if field.strip().startswith('-')}
+    estimated_tokens = estimate_tokens(combined_text)
+    if estimated_tokens > EXTRACTION_CHUNK_THRESHOLD_TOKENS:
+        # Too large (or too slow) for one call: extract page-aligned chunks concurrently and merge the results
+        chunks = split_into_chunks(combined_text, EXTRACTION_CHUNK_MAX_TOKENS)
+        logger.info(f"Document is ~{estimated_tokens} tokens. Extracting {len(chunks)} chunks "
+                    f"with concurrency {EXTRACTION_CHUNK_CONCURRENCY}")
+        results = await extract_chunks(
+            chunks, lambda chunk: extract_with_model_ladder(chunk, document_type, ladder, require_any_field=False),
+            EXTRACTION_CHUNK_CONCURRENCY
+        )
+        extracted_data = reduce_extractions(document_type, [partial for partial, _ in results])
     else:
-        try:
-            extracted_data = json.loads(extracted_json_str)
-        except json.JSONDecodeError:
-            logger.error(f"Failed to parse JSON: {extracted_json_str}")
-            extracted_data = {field: None for field in document_prompts[document_type].split('\n') if field.strip().startswith('-')}
+        chunks = [combined_text]
+        results = [await extract_with_model_ladder(combined_text, document_type, ladder)]
+        extracted_data = results[0][0]
+    tiering = [tier for _, tier in results]
+
+    # Failed extractions (including ones no model got past validation) are not cached so the next attempt calls the model again
+    if (isinstance(extracted_data, dict) and any(value is not None for value in extracted_data.values())
+            and all(tier["valid"] for tier in tiering)):
+        await run_sync(extraction_cache.put, cache_key, extracted_data)
 
     return {
         "documentType": document_type,
         "extractedData": extracted_data,
         "sourceKey": src_key,
-        "processingTimestamp": datetime.now().isoformat()
+        "processingTimestamp": datetime.now().isoformat(),
+        "modelId": models,
+        "promptVersion": prompt_version(document_type),
+        "chunkCount": len(chunks),
+        "modelTiering": tiering,
+        "cache": {"hit": False, "key": cache_key}
     }
 
-async def invoke_claude_converse(system_prompt: str, user_prompt: str, textract_text: str) -> str:
+async def extract_with_model_ladder(text: str, document_type: str, ladder: List[str],
+                                   require_any_field: bool = True) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Extract with the first model of the ladder, moving to the next model only while the
+    extraction fails validation. When every model fails, the last parsable extraction is kept.
+    Chunks pass require_any_field=False, since an all-null chunk is valid (see validate_extraction).
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Any]]: The extraction, and which model produced it
+        (modelId, valid, escalations, problems of the rejected attempts)
+    """
+    fallback = None
+    rejected = []
+    for model_id in ladder:
+        extracted = await extract_with_claude(text, document_type, model_id)
+        problems = validate_extraction(document_type, extracted, require_any_field)
+        if not problems:
+            return extracted, {"modelId": model_id, "valid": True, "escalations": len(rejected), "rejected": rejected}
+        logger.warning(f"Extraction by {model_id} failed validation for {document_type}: {problems}")
+        rejected.append({"modelId": model_id, "problems": problems})
+        if extracted is not None:
+            fallback = (extracted, model_id)
+
+    if fallback is None:
+        return empty_extraction(document_type), {"modelId": None, "valid": False, "escalations": len(ladder) - 1, "rejected": rejected}
+    return fallback[0], {"modelId": fallback[1], "valid": False, "escalations": len(ladder) - 1, "rejected": rejected}
+
+async def extract_with_claude(text: str, document_type: str, model_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Run a single extraction call and parse the tagged JSON result.
+
+    Returns:
+        Optional[Dict[str, Any]]: The parsed extraction, or None when the response held no valid JSON
+    """
+    extraction_response = await invoke_claude_converse(SYSTEM_PROMPT, build_user_prompt(document_type), text,
+                                                       model_id, document_type)
+    extracted_json_str = await extract_tagged_content(extraction_response, 'extracted_data')
+    
+    if not extracted_json_str:
+        logger.warning(f"No extracted data found for document type: {document_type}")
+        return None
+
     try:
-        logger.info(f"Invoking Claude with BEDROCK_MODEL_ID: {BEDROCK_MODEL_ID}")
+        return json.loads(extracted_json_str)
+    except json.JSONDecodeError:
+        logger.error(f"Failed to parse JSON: {extracted_json_str}")
+        return None
+
+async def invoke_claude_converse(system_prompt: str, user_prompt: str, textract_text: str,
+                                 model_id: str = BEDROCK_MODEL_ID, document_type: Optional[str] = None) -> str:
+    try:
+        logger.info(f"Invoking Claude with model: {model_id}")
         
         messages = [
             {
@@ -347,42 +516,88 @@ async def invoke_claude_converse(system_prompt: str, user_prompt: str, textract_
             }
         ]
 
-        request_body = json.dumps({
+        request_body = {
             "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 4096,
+            "max_tokens": BEDROCK_MAX_TOKENS,
             "temperature": 0.2,
             "top_p": 0.999,
             "top_k": 250,
             "messages": messages
-        })
-        
-        logger.info(f"Request body: {request_body}")
-
-        response = bedrock_runtime.invoke_model(
-            modelId=BEDROCK_MODEL_ID,
-            contentType="application/json",
-            accept="application/json",
-            body=request_body
-        )
-        
-        logger.info(f"Received response from Bedrock: {response}")
-        
-        response_body = json.loads(response['body'].read())
-        logger.info(f"Response body: {response_body}")
-        
-        if 'content' not in response_body or not response_body['content']:
-            raise ValueError("Unexpected response format from Bedrock")
+        }
         
-        return response_body['content'][0]['text']
+        logger.info(f"Request body: {json.dumps(request_body)}")
+
+        async def call() -> Tuple[str, Dict[str, Any]]:
+            if BEDROCK_STREAMING:
+                return await run_sync(
+                    invoke_model_streaming, bedrock_runtime, model_id, request_body, '</extracted_data>'
+                )
+            return await run_sync(invoke_model_buffered, model_id, request_body)
+
+        # Reserve the prompt plus the whole output budget; the reservation is settled with the actual usage
+        estimated_tokens = estimate_tokens(messages[0]["content"][0]["text"]) + BEDROCK_MAX_TOKENS
+        # The slot is held across retries, so a throttled call does not make room for another one
+        async with bedrock_calls.slot():
+            invoker = bedrock_invokers.setdefault(model_id, BedrockInvoker())
+            (text, stats), metrics = await invoker.invoke(call, estimated_tokens, used_tokens)
+        log_generation_stats(document_type, model_id, BEDROCK_STREAMING, {**stats, **metrics})
+        return text
     except Exception as e:
         logger.error(f"Error invoking Claude Converse API: {str(e)}", exc_info=True)
         raise
 
+def invoke_model_buffered(model_id: str, request_body: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Invoke the model with InvokeModel and return the text and the call's timings and usage.
+    """
+    started = time.monotonic()
+    response = bedrock_runtime.invoke_model(
+        modelId=model_id,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(request_body)
+    )
+    
+    logger.info(f"Received response from Bedrock: {response}")
+    
+    response_body = json.loads(response['body'].read())
+    logger.info(f"Response body: {response_body}")
+    
+    if 'content' not in response_body or not response_body['content']:
+        raise ValueError("Unexpected response format from Bedrock")
+
+    usage = response_body.get('usage', {})
+    return response_body['content'][0]['text'], {
+        'totalMs': round((time.monotonic() - started) * 1000),
+        'stopReason': response_body.get('stop_reason'),
+        'inputTokens': usage.get('input_tokens'),
+        'outputTokens': usage.get('output_tokens')
+    }
+
+def used_tokens(result: Tuple[str, Dict[str, Any]]) -> Optional[int]:
+    """
+    Tokens a call counted against the TPM quota. A stream closed at the closing tag never reads
+    the final usage event, so its output tokens are estimated from the streamed text.
+    """
+    text, stats = result
+    if stats.get('inputTokens') is None:
+        return None
+    output_tokens = stats.get('outputTokens')
+    if output_tokens is None:
+        output_tokens = estimate_tokens(text)
+    return stats['inputTokens'] + output_tokens
+
+def log_generation_stats(document_type: Optional[str], model_id: str, streaming: bool, stats: Dict[str, Any]) -> None:
+    """
+    One line per model call, for tuning BEDROCK_MAX_TOKENS per document type and the
+    BEDROCK_RPM_LIMIT / BEDROCK_TPM_LIMIT pacing (attempts, throttles and wait times).
+    """
+    logger.info(f"Bedrock generation: {json.dumps({'documentType': document_type, 'modelId': model_id, 'streaming': streaming, 'maxTokens': BEDROCK_MAX_TOKENS, **stats})}")
+
 async def extract_tagged_content(text: str, tag: str) -> str:
     import re
     pattern = rf'<{tag}>(.*?)</{tag}>'
     match = re.search(pattern, text, re.DOTALL)
-    print(f"Match: {match}")
     if match:
         return match.group(1).strip()
     else:
@@ -392,8 +607,8 @@ async def extract_tagged_content(text: str, tag: str) -> str:
 async def update_dynamodb(document_id: str, organized_data: Dict[str, Any]) -> None:
     try:
         current_timestamp = int(time.time() * 1000)  # Convert to milliseconds
-        await asyncio.to_thread(
-            table.put_item,
+        await table_call(
+            DOCUMENT_METADATA_TABLE_NAME, 'put_item',
             Item={
                 'documentId': document_id,
                 'status': 'processed',
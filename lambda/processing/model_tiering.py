@@ -0,0 +1,84 @@
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from prompts import DOCUMENT_FIELDS, CHOICE_VALUES
+
+logger = logging.getLogger()
+
+# Models tried in order per document type, e.g.
+# {"default": ["<haiku model id>", "<sonnet model id>"], "Provider": ["<sonnet model id>"]}.
+# A model is only tried when the previous one's extraction failed validation. Types without an
+# entry use "default", or BEDROCK_MODEL_ID alone when there is no default.
+BEDROCK_MODEL_LADDER = json.loads(os.environ.get('BEDROCK_MODEL_LADDER') or '{}')
+
+
+def model_ladder(document_type: str) -> List[str]:
+    ladder = BEDROCK_MODEL_LADDER.get(document_type, BEDROCK_MODEL_LADDER.get('default'))
+    if isinstance(ladder, str):
+        ladder = [ladder]
+    return list(ladder) if ladder else [os.environ['BEDROCK_MODEL_ID']]
+
+
+def ladder_id(ladder: List[str]) -> str:
+    """
+    Identifies the models an extraction may come from, for cache keys and prior analysis checks.
+    A single-model ladder is just that model's ID.
+    """
+    return ",".join(ladder)
+
+
+def _is_count(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, float):
+        return value.is_integer() and value >= 0
+    return isinstance(value, int) and value >= 0
+
+
+def _is_list(value: Any) -> bool:
+    if isinstance(value, list):
+        return all(isinstance(item, str) for item in value)
+    return isinstance(value, str)
+
+
+# Field type (prompts.DOCUMENT_FIELDS) -> check of a non-null value
+FIELD_CHECKS = {
+    'text': lambda value: isinstance(value, str),
+    'list': _is_list,
+    'visit_count': _is_count,
+    'unique_count': _is_count,
+    'boolean': lambda value: isinstance(value, bool),
+    'choice': lambda value: value in CHOICE_VALUES,
+}
+
+
+def validate_extraction(document_type: str, extracted: Optional[Dict[str, Any]],
+                        require_any_field: bool = True) -> List[str]:
+    """
+    Check an extraction against the document type's fields: every field present with a value of
+    its type, no other keys, and at least one field found. Null marks a field the model could not
+    find, as the prompt allows.
+
+    A chunk of a long record often holds nothing relevant, so chunk extractions are checked with
+    require_any_field=False: all-null is the right answer there, not a reason to escalate.
+
+    Returns:
+        List[str]: The problems found; empty when the extraction is valid
+    """
+    if not isinstance(extracted, dict):
+        return ["no JSON object in the response"]
+
+    fields = DOCUMENT_FIELDS[document_type]
+    problems = [f"unexpected key {key!r}" for key in extracted if key not in fields]
+    for field, field_type in fields.items():
+        if field not in extracted:
+            problems.append(f"missing {field}")
+            continue
+        value = extracted[field]
+        if value is not None and not FIELD_CHECKS[field_type](value):
+            problems.append(f"{field} is not a valid {field_type}: {value!r}")
+    if require_any_field and all(extracted.get(field) is None for field in fields):
+        problems.append("no field was extracted")
+    return problems
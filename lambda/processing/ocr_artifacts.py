@@ -0,0 +1,61 @@
+import gzip
+import hashlib
+import logging
+from botocore.exceptions import ClientError
+from typing import Optional
+
+from common.aws import get_client
+from common.artifacts import OCR_ARTIFACT_BUCKET_NAME, CONTENT_HASH_METADATA_KEY, ocr_artifact_key, get_stored_content_hash
+
+logger = logging.getLogger()
+
+s3_client = get_client('s3')
+
+
+def get_content_hash(bucket_name: str, key: str) -> str:
+    """
+    SHA-256 of the staged source file. Uses the hash the extraction Lambda stored with the
+    object, and only streams the object to hash it when that hash is missing.
+    """
+    content_hash = get_stored_content_hash(bucket_name, key)
+    if content_hash:
+        return content_hash
+
+    logger.info(f"No {CONTENT_HASH_METADATA_KEY} metadata on s3://{bucket_name}/{key}. Hashing the object.")
+    digest = hashlib.sha256()
+    body = s3_client.get_object(Bucket=bucket_name, Key=key)['Body']
+    for chunk in body.iter_chunks(chunk_size=1024 * 1024):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_ocr_text(content_hash: str) -> Optional[str]:
+    """
+    Load the persisted OCR text for a source file, or None when it has not been OCR'd yet.
+    """
+    try:
+        response = s3_client.get_object(Bucket=OCR_ARTIFACT_BUCKET_NAME, Key=ocr_artifact_key(content_hash))
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+    with gzip.GzipFile(fileobj=response['Body']) as artifact:
+        return artifact.read().decode('utf-8')
+
+
+def save_ocr_text(content_hash: str, text: str, source_key: str) -> str:
+    """
+    Persist the normalized OCR text as a gzip-compressed artifact keyed by the source file's content hash.
+
+    Returns:
+        str: The artifact's S3 key
+    """
+    artifact_key = ocr_artifact_key(content_hash)
+    s3_client.put_object(
+        Bucket=OCR_ARTIFACT_BUCKET_NAME,
+        Key=artifact_key,
+        Body=gzip.compress(text.encode('utf-8')),
+        ContentType="application/gzip",
+        Metadata={'source-key': source_key}
+    )
+    return artifact_key
@@ -0,0 +1,147 @@
+import os
+import re
+from typing import List, Dict, Any, Tuple
+
+from textract_text import split_pages, PAGE_SEPARATOR
+
+# Documents with fewer pages than this are always sent whole
+PAGE_RELEVANCE_MIN_PAGES = int(os.environ.get('PAGE_RELEVANCE_MIN_PAGES', '4'))
+# Pages scoring at least this share of the best page's score are selected
+PAGE_RELEVANCE_RELATIVE_SCORE = float(os.environ.get('PAGE_RELEVANCE_RELATIVE_SCORE', '0.3'))
+# Pages kept on each side of a selected page (sections often continue onto the next page)
+PAGE_RELEVANCE_NEIGHBORS = int(os.environ.get('PAGE_RELEVANCE_NEIGHBORS', '1'))
+# The best page must reach this score, otherwise the full text is used
+PAGE_RELEVANCE_MIN_SCORE = float(os.environ.get('PAGE_RELEVANCE_MIN_SCORE', '3'))
+# When the selection covers more than this share of the pages, the full text is used instead
+PAGE_RELEVANCE_MAX_FRACTION = float(os.environ.get('PAGE_RELEVANCE_MAX_FRACTION', '0.8'))
+
+# A term at the start of a line (a section heading) counts this many times more than a mention in the body
+HEADING_WEIGHT = 3
+
+# Section vocabularies per document type. Each group lists the patterns for one kind of section;
+# required groups must be found as a heading somewhere in the document, otherwise the filter
+# is not confident enough to drop pages. Types without a vocabulary are always sent whole.
+SECTION_VOCABULARIES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "Diagnostic Test": {
+        "impression": {
+            "required": True,
+            "patterns": [r'impressions?', r'conclusions?', r'opinion'],
+        },
+        "findings": {
+            "required": False,
+            "patterns": [r'findings?', r'results?'],
+        },
+        "exam": {
+            "required": False,
+            "patterns": [r'(exam|examination|study|procedure)\s*(date|performed)?', r'date\s+of\s+(service|exam)',
+                         r'(clinical\s+)?(history|indications?)', r'technique', r'comparison'],
+        },
+    },
+    "Procedures": {
+        "preOpDiagnosis": {
+            "required": True,
+            "patterns": [r'pre-?\s?op(erative)?\s+diagnos[ie]s'],
+        },
+        "postOpDiagnosis": {
+            "required": False,
+            "patterns": [r'post-?\s?op(erative)?\s+diagnos[ie]s'],
+        },
+        "procedurePerformed": {
+            "required": True,
+            "patterns": [r'(procedures?|operations?)\s+performed', r'name\s+of\s+(procedure|operation)',
+                         r'procedures?', r'operations?'],
+        },
+        "context": {
+            "required": False,
+            "patterns": [r'date\s+of\s+(service|surgery|procedure)', r'operative\s+report', r'anesthesia',
+                         r'indications?(\s+for\s+(procedure|surgery))?', r'findings?'],
+        },
+    },
+}
+
+_COMPILED_VOCABULARIES = {
+    document_type: {
+        group: (
+            section['required'],
+            re.compile(r'^\s*(' + '|'.join(section['patterns']) + r')\s*(:|$)', re.IGNORECASE | re.MULTILINE),
+            re.compile(r'\b(' + '|'.join(section['patterns']) + r')\b', re.IGNORECASE),
+        )
+        for group, section in vocabulary.items()
+    }
+    for document_type, vocabulary in SECTION_VOCABULARIES.items()
+}
+
+
+def score_pages(pages: List[str], document_type: str) -> Tuple[List[float], Dict[str, bool]]:
+    """
+    Score each page against the document type's section vocabulary.
+
+    Returns:
+        Tuple[List[float], Dict[str, bool]]: A score per page, and per vocabulary group whether
+        it was found as a heading on any page
+    """
+    vocabulary = _COMPILED_VOCABULARIES[document_type]
+    scores = []
+    groups_found = {group: False for group in vocabulary}
+    for page in pages:
+        score = 0.0
+        for group, (_, heading_pattern, mention_pattern) in vocabulary.items():
+            headings = len(heading_pattern.findall(page))
+            if headings:
+                groups_found[group] = True
+                score += HEADING_WEIGHT * headings
+            elif mention_pattern.search(page):
+                # Body mentions are weak evidence (billing lines, cross references), so they count once per page
+                score += 1
+        scores.append(score)
+    return scores, groups_found
+
+
+def select_relevant_pages(text: str, document_type: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Keep only the pages that hold the sections the document type's fields are extracted from.
+
+    Pages are scored against the section vocabulary; pages scoring close enough to the best page
+    are kept together with their neighbors. The full text is returned whenever the filter is not
+    confident: the type has no vocabulary, the document is short, no page scores well enough, a
+    required section was not found, or the selection would keep most of the document anyway.
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: The text to send to the model and a summary of the selection
+    """
+    pages = split_pages(text)
+    stats: Dict[str, Any] = {"pagesTotal": len(pages), "pagesSelected": len(pages), "selectedPages": None,
+                             "fallbackReason": None}
+
+    def full_text(reason: str) -> Tuple[str, Dict[str, Any]]:
+        stats["fallbackReason"] = reason
+        return text, stats
+
+    if document_type not in _COMPILED_VOCABULARIES:
+        return full_text("no section vocabulary for document type")
+    if len(pages) < PAGE_RELEVANCE_MIN_PAGES:
+        return full_text("too few pages")
+
+    scores, groups_found = score_pages(pages, document_type)
+    best_score = max(scores)
+    if best_score < PAGE_RELEVANCE_MIN_SCORE:
+        return full_text("no page scored above the minimum")
+    missing_groups = [group for group, (required, _, _) in _COMPILED_VOCABULARIES[document_type].items()
+                      if required and not groups_found[group]]
+    if missing_groups:
+        return full_text(f"required sections not found: {', '.join(missing_groups)}")
+
+    selected = set()
+    for index, score in enumerate(scores):
+        if score > 0 and score >= best_score * PAGE_RELEVANCE_RELATIVE_SCORE:
+            selected.update(range(max(index - PAGE_RELEVANCE_NEIGHBORS, 0),
+                                  min(index + PAGE_RELEVANCE_NEIGHBORS, len(pages) - 1) + 1))
+
+    if len(selected) > len(pages) * PAGE_RELEVANCE_MAX_FRACTION:
+        return full_text("selection covers most of the document")
+
+    selected_pages = sorted(selected)
+    stats["pagesSelected"] = len(selected_pages)
+    stats["selectedPages"] = [index + 1 for index in selected_pages]
+    return PAGE_SEPARATOR.join(pages[index] for index in selected_pages), stats
+
@@ -0,0 +1,130 @@
+import hashlib
+from typing import Dict
+
+# Bump when extraction behaviour changes outside the prompt text (parsing, merging) to invalidate cached results
+PROMPT_REVISION = "1"
+
+SYSTEM_PROMPT = """You are a medical document processor trained in extracting information from medical documents. Use the provided Textract OCR results to extract the data accurately and concisely."""
+
+DOCUMENT_PROMPTS = {
+    "PT/Chiro": """Extract the following information and DO NOT be repetitive:
+- history: The patients account of what they verbally told the provider. Summarize the history of present illness from the many vistis, and cause of injury (Limit to 1-2 sentences, do not be repetive). {"value": string}
+- chiefComplaints: What the client complained about in regards to their injury (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g. "chiefComplaints": "<ul><li>First complaint description</li><li>Second complaint description</li><li>Third complaint description</li></ul>") {"value": "<ul><li>string</li></ul>"}
+- numberOfVisits: Total count of visits to the provider. {"value": number}
+- impression: The provider's diagnosis and interpretation of the patient's condition based on their exam or diagnostic test (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {"value": "<ul><li>string</li></ul>"}
+- recommendations: Recommendations based on treatment. Important, only select ONE of the available string values: Physical Therapy, Diagnostic Testing, Injections, Surgery. {"value": string}""",
+    "Provider": """Extract the following information and DO NOT be repetitive:
+- history: The patients account of what they verbally told the provider. Summarize the history of present illness from the many vistis, and cause of injury (Limit to 1-2 sentences, do not be repetive).{"value": strings}
+- chiefComplaints: What the client complained about in regards to their injury (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g. "chiefComplaints": "<ul><li>First complaint description</li><li>Second complaint description</li><li>Third complaint description</li></ul>") {"value": "<ul><li>string</li></ul>"}
+- numberOfVisits: Total count of visits to the provider. The default value is 0. {"value": number}
+- examFindings: The physical exam findings throughout the chronology of the visits. Summary based on current physical exam and the clients condition (Limit to 4-6 sentences). If a list of sentences are provided, please wrap them inordered list <li></li> tags in the response. (e.g. "examFindings": ["<ul><li>Finding 1</li><li>Finding 2</li>Finding 3</li></ul>"]) {"value": "<ul><li>string</li></ul>"}
+- impression: The provider's diagnosis and interpretation of the patient's condition based on their exam or diagnostic test (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {"value": "<ul><li>string</li></ul>"}
+- recommendations: Recommendations based on treatment. Important, onlyselect ONE of the available string values: Physical Therapy, Diagnostic Testing, Injections, Surgery. {"value": string}
+- surgeryRecommended: If surgery is recommended next course of treatment then true else false. The default value is false. {"value": boolean}
+- injectionRecommended: If injections are recommended next course of treatment then true else false. The default value is false. {"value": boolean}
+- numberOfOtherPositiveFindings: Count of unique findings that are NOT fractures, bulges, herniations, or tears. The default value is 0. {"value": number}""",
+    "Diagnostic Test": """Extract the following information and DO NOT be repetitive:
+- numberOfVisits: Total count of visits to the provider. The default value is 0. {"value": number}
+- impression: The provider's diagnosis and interpretation of the patient's condition based on their exam or diagnostic test (bulleted list of strings). Please use bulleted list <li></li> tags in the response.. (e.g "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {"value": "<ul><li>string</li></ul>"}
+- positiveFindings: If a positive finding of fractures, bulges, herniations,or tears exist then true else false. The default value is false. {"value": boolean}
+- numberofFractures: Count of unique fractures in findings. The default value is 0. {"value": number}
+- numberofBulges: Count of unique bulges in findings. The default value is 0. {"value": number}
+- numberofHerniations: Count of unique herniations in findings. The default value is 0. {"value": number}
+- numberofTears: Count of unique tears in findings. The default value is 0. {"value": number}
+- radiculopathy: If Radiculopathy exists in findings then true else false. The default value is false. {"value": boolean}
+- numberOfOtherPositiveFindings: Count of unique findings that are NOT fractures, bulges, herniations, or tears. The default value is 0. {"value": number}""",
+    "Procedures": """Extract the following information and DO NOT be repetitive:
+- numberOfVisits: Total count of visits to the provider. The default value is 0. {"value": number}
+- preOpDiagnosis: The medical condition identified before surgery that requires the surgical procedure (bulleted list of strings). Please use bulleted list <li></li> tags in the response. If there is no pre-op diagnosis, use "N/A" {"value": "<ul><li>string</li></ul>"}
+- postOpDiagnosis: The confirmed medical condition after surgery, often refined with additional findings from the operation (bulleted list of strings). Please use bulleted list <li></li> tags in the response. If there is no post-op diagnosis, use "N/A" {"value": "<ul><li>string</li></ul>"}
+- procedurePerformed: The specific surgical procedure carried out to address the diagnosed medical condition. The default value is an empty array. If there are procedures performed, please use bulleted list <li></li> tags in the response. If there is no procedure performed, use "N/A" {"value": "<ul><li>string</li></ul>"}""",
+    "Hospital/Urgent Care": """Extract the following information and DO NOT be repetitive:
+- history: The patients account of what they verbally told the provider. Summarize the history of present illness from the many vistis, and cause of injury (Limit to 1-2 sentences, do not be repetive). {"value": string}
+- chiefComplaints: What the client complained about in regards to their injury (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g. "chiefComplaints": "<ul><li>First complaint description</li><li>Second complaint description</li><li>Third complaint description</li></ul>") {"value": "<ul><li>string</li></ul>"}
+- impression: The provider's diagnosis and interpretation of the patient's condition based on their exam or diagnostic test (bulleted list of strings). Please use bulleted list <li></li> tags in the response. (e.g "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {"value": "<ul><li>string</li></ul>"}
+- surgeryRecommended: If surgery is recommended next course of treatment then true else false. The default value is false. {"value": boolean}
+- injectionRecommended: If injections are recommended next course of treatment then true else false. The default value is false. {"value": boolean}
+- radiculopathy: If Radiculopathy exists in findings then true else false. The default value is false. {"value": boolean}"""
+}
+
+# Field types drive how partial results from chunked extraction are merged:
+#   text          - free text, the first non-empty value wins
+#   list          - <ul><li> bulleted list, items are merged and deduplicated
+#   visit_count   - counts that add up across page ranges
+#   unique_count  - counts of unique findings, reconciled to the largest partial count
+#   boolean       - true if any partial result is true
+#   choice        - one of CHOICE_VALUES, the value from the latest pages wins
+DOCUMENT_FIELDS: Dict[str, Dict[str, str]] = {
+    "PT/Chiro": {
+        "history": "text",
+        "chiefComplaints": "list",
+        "numberOfVisits": "visit_count",
+        "impression": "list",
+        "recommendations": "choice",
+    },
+    "Provider": {
+        "history": "text",
+        "chiefComplaints": "list",
+        "numberOfVisits": "visit_count",
+        "examFindings": "list",
+        "impression": "list",
+        "recommendations": "choice",
+        "surgeryRecommended": "boolean",
+        "injectionRecommended": "boolean",
+        "numberOfOtherPositiveFindings": "unique_count",
+    },
+    "Diagnostic Test": {
+        "numberOfVisits": "visit_count",
+        "impression": "list",
+        "positiveFindings": "boolean",
+        "numberofFractures": "unique_count",
+        "numberofBulges": "unique_count",
+        "numberofHerniations": "unique_count",
+        "numberofTears": "unique_count",
+        "radiculopathy": "boolean",
+        "numberOfOtherPositiveFindings": "unique_count",
+    },
+    "Procedures": {
+        "numberOfVisits": "visit_count",
+        "preOpDiagnosis": "list",
+        "postOpDiagnosis": "list",
+        "procedurePerformed": "list",
+    },
+    "Hospital/Urgent Care": {
+        "history": "text",
+        "chiefComplaints": "list",
+        "impression": "list",
+        "surgeryRecommended": "boolean",
+        "injectionRecommended": "boolean",
+        "radiculopathy": "boolean",
+    },
+}
+
+CHOICE_VALUES = ["Physical Therapy", "Diagnostic Testing", "Injections", "Surgery"]
+
+
+def build_user_prompt(document_type: str) -> str:
+    return f"""
+    {DOCUMENT_PROMPTS[document_type]}
+
+Do NOT be repetitive in any of your answers. Respond with a JSON object containing the extracted information, matching the structure and data types specified above and follow the instructions in the prompt.
+Some of the items will return a list of strings, please use an unorderded bulleted list <li></li> tags in the response.(e.g. "impression": "<ul><li>The patient has a fracture of the left leg</li><li>The patient has a fracture of the right leg.</li></ul>") {{"value": "<ul><li>string</li></ul>"}}
+Please do not include the "value" key in the response of the JSON object. Do not return "history": {{"value": "This is the history"}}, instead return the value with out the "value" key e.g. {{"history": "This is the history"}}.
+Also important, do not create new keys outside of the ones specified (e.g. do not create {{ "1": "Physical Therapy", "2": "Surgery" }} it must be {{ "recommendations": 'Physical Therapy', 'Surgery'}}), the keys must be the same as the ones specified in the prompt.
+Wrap the JSON object in <extracted_data> tags. If you cannot find the requested information, return an empty JSON object with null values. Do not include any other content in your response. Please ensure that JSON is valid and all fields are present."""
+
+
+def empty_extraction(document_type: str) -> Dict[str, None]:
+    """
+    The result returned when nothing could be extracted: every expected field set to None.
+    """
+    return {field: None for field in DOCUMENT_FIELDS[document_type]}
+
+
+def prompt_version(document_type: str) -> str:
+    """
+    Identifies the exact prompts used for a document type, so cached extractions are
+    invalidated automatically whenever the prompts are tuned.
+    """
+    prompt_text = f"{PROMPT_REVISION}\n{SYSTEM_PROMPT}\n{build_user_prompt(document_type)}"
+    return hashlib.sha256(prompt_text.encode('utf-8')).hexdigest()[:16]
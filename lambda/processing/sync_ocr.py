@@ -0,0 +1,190 @@
+import io
+import os
+import gzip
+import json
+import asyncio
+import hashlib
+import random
+import logging
+import tempfile
+from pypdf import PdfReader, PdfWriter
+from pypdf.errors import PdfReadError
+from botocore.exceptions import ClientError
+from typing import List, Dict, Any, Optional, Tuple
+
+from common.aws import get_client, run_sync
+from common.artifacts import OCR_ARTIFACT_BUCKET_NAME
+from common.ocr_routes import OCR_SYNC_MAX_PAGES
+from common.leases import LeaseUnavailable
+from textract_text import combine_textract_results, PAGE_SEPARATOR
+
+logger = logging.getLogger()
+
+# Pages analyzed at once for one document
+OCR_SYNC_CONCURRENCY = int(os.environ.get('OCR_SYNC_CONCURRENCY', '8'))
+# Pages split out of the PDF at a time; bounds the page copies held in memory next to the source PDF
+OCR_SHARD_GROUP_PAGES = int(os.environ.get('OCR_SHARD_GROUP_PAGES', '16'))
+# Per-page OCR results, keyed by the page's content, so a re-sent document only OCRs new or changed pages
+OCR_PAGE_CACHE_ENABLED = os.environ.get('OCR_PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+OCR_PAGE_CACHE_PREFIX = os.environ.get('OCR_PAGE_CACHE_PREFIX', 'ocr-pages/')
+# Retries of a page Textract still throttles after the client's own retries, with full-jitter exponential backoff
+OCR_THROTTLE_RETRIES = int(os.environ.get('OCR_THROTTLE_RETRIES', '3'))
+OCR_RETRY_BASE_SECONDS = float(os.environ.get('OCR_RETRY_BASE_SECONDS', '2'))
+OCR_RETRY_MAX_SECONDS = float(os.environ.get('OCR_RETRY_MAX_SECONDS', '20'))
+
+# Same features as the workflow's StartDocumentAnalysis job, so every route renders the same text
+OCR_SYNC_FEATURE_TYPES = ['TABLES']
+# Bump when the cached page format changes
+OCR_PAGE_CACHE_VERSION = '1'
+
+PDF_CONTENT_TYPE = 'application/pdf'
+
+THROTTLING_ERROR_CODES = ('ThrottlingException', 'ProvisionedThroughputExceededException', 'LimitExceededException')
+# Textract cannot read the page at all: only a Textract job (or nothing) will
+UNSUITABLE_ERROR_CODES = ('UnsupportedDocumentException', 'BadDocumentException', 'DocumentTooLargeException',
+                          'InvalidParameterException')
+
+
+class SyncOcrUnsuitable(Exception):
+    """
+    The document cannot be OCR'd page by page (too many pages, unreadable PDF, rejected by Textract);
+    a Textract job is needed. The workflow catches it from the processing Lambda and starts one.
+    """
+
+
+def split_pdf_pages(reader: PdfReader, start: int, end: int) -> List[bytes]:
+    """
+    Copy pages [start, end) into single-page PDFs (Textract's synchronous API only reads the first
+    page of a PDF). The output is deterministic, so the same page always has the same bytes.
+    """
+    pages = []
+    for page in reader.pages[start:end]:
+        writer = PdfWriter()
+        writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        pages.append(buffer.getvalue())
+    return pages
+
+
+def page_cache_key(page: bytes) -> str:
+    key_material = hashlib.sha256(page)
+    key_material.update(json.dumps([OCR_PAGE_CACHE_VERSION, OCR_SYNC_FEATURE_TYPES]).encode('utf-8'))
+    return f"{OCR_PAGE_CACHE_PREFIX}{key_material.hexdigest()}.json.gz"
+
+
+def load_cached_page(cache_key: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        response = get_client('s3').get_object(Bucket=OCR_ARTIFACT_BUCKET_NAME, Key=cache_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        logger.warning(f"OCR page cache read failed for {cache_key}: {str(e)}")
+        return None
+    return json.loads(gzip.decompress(response['Body'].read()))
+
+
+def save_cached_page(cache_key: str, blocks: List[Dict[str, Any]]) -> None:
+    try:
+        get_client('s3').put_object(
+            Bucket=OCR_ARTIFACT_BUCKET_NAME,
+            Key=cache_key,
+            Body=gzip.compress(json.dumps(blocks).encode('utf-8')),
+            ContentType="application/gzip"
+        )
+    except ClientError as e:
+        # The page is simply OCR'd again next time
+        logger.warning(f"OCR page cache write failed for {cache_key}: {str(e)}")
+
+
+def analyze_page(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    response = get_client('textract').analyze_document(Document=document, FeatureTypes=OCR_SYNC_FEATURE_TYPES)
+    return response['Blocks']
+
+
+async def analyze_page_with_backoff(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    analyze_page, retrying throttled calls. A page still throttled after OCR_THROTTLE_RETRIES raises
+    LeaseUnavailable, so the Step Function retries the task later; pages already OCR'd are cached.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await run_sync(analyze_page, document)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in THROTTLING_ERROR_CODES:
+                raise
+            attempt += 1
+            if attempt > OCR_THROTTLE_RETRIES:
+                raise LeaseUnavailable(f"Textract kept throttling synchronous OCR: {str(e)}") from e
+            await asyncio.sleep(random.uniform(0, min(OCR_RETRY_MAX_SECONDS, OCR_RETRY_BASE_SECONDS * 2 ** attempt)))
+
+
+async def ocr_document_sync(bucket_name: str, key: str, content_type: str,
+                            max_pages: int = OCR_SYNC_MAX_PAGES) -> Tuple[str, Dict[str, Any]]:
+    """
+    OCR a document with synchronous AnalyzeDocument calls instead of a Textract job.
+
+    Images are read by Textract straight from S3. PDFs are staged in /tmp and read lazily, split
+    into single pages a group of OCR_SHARD_GROUP_PAGES at a time, and the group's pages analyzed
+    OCR_SYNC_CONCURRENCY at a time. Each page's blocks are cached by the page's content, so only
+    pages not seen before are sent to Textract. Pages are rendered to text in order as each group
+    completes and their blocks dropped, so at most one group of pages is held in memory.
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: The combined text with page separators, and page counts
+        (pages, cachedPages)
+
+    Raises:
+        SyncOcrUnsuitable: When the PDF has more than max_pages pages, cannot be read,
+        or Textract rejects a page (e.g. UnsupportedDocumentException)
+        LeaseUnavailable: When Textract keeps throttling the calls
+    """
+    try:
+        if content_type != PDF_CONTENT_TYPE:
+            blocks = await analyze_page_with_backoff({'S3Object': {'Bucket': bucket_name, 'Name': key}})
+            return await run_sync(combine_textract_results, blocks), {'pages': 1, 'cachedPages': 0}
+
+        with tempfile.TemporaryFile() as staged:
+            await run_sync(get_client('s3').download_fileobj, bucket_name, key, staged)
+            return await ocr_pdf(staged, key, max_pages)
+    except PdfReadError as e:
+        raise SyncOcrUnsuitable(f"Synchronous OCR of {key} failed: {str(e)}") from e
+    except ClientError as e:
+        # Only a document Textract cannot read synchronously needs a job; anything else fails the task as usual
+        if e.response.get('Error', {}).get('Code') in UNSUITABLE_ERROR_CODES:
+            raise SyncOcrUnsuitable(f"Synchronous OCR of {key} failed: {str(e)}") from e
+        raise
+
+
+async def ocr_pdf(staged: Any, key: str, max_pages: int) -> Tuple[str, Dict[str, Any]]:
+    reader = await run_sync(PdfReader, staged)
+    page_count = len(reader.pages)
+    if page_count > max_pages:
+        raise SyncOcrUnsuitable(f"{key} has {page_count} pages (more than {max_pages})")
+
+    semaphore = asyncio.Semaphore(OCR_SYNC_CONCURRENCY)
+    cached_pages = 0
+
+    async def ocr_page(page: bytes) -> str:
+        nonlocal cached_pages
+        async with semaphore:
+            cache_key = page_cache_key(page)
+            blocks = await run_sync(load_cached_page, cache_key) if OCR_PAGE_CACHE_ENABLED else None
+            if blocks is not None:
+                cached_pages += 1
+            else:
+                blocks = await analyze_page_with_backoff({'Bytes': page})
+                if OCR_PAGE_CACHE_ENABLED:
+                    await run_sync(save_cached_page, cache_key, blocks)
+            return await run_sync(combine_textract_results, blocks)
+
+    page_texts: List[str] = []
+    for start in range(0, page_count, OCR_SHARD_GROUP_PAGES):
+        # The reader seeks in the staged file, so its pages are split one group at a time
+        pages = await run_sync(split_pdf_pages, reader, start, start + OCR_SHARD_GROUP_PAGES)
+        page_texts.extend(await asyncio.gather(*(ocr_page(page) for page in pages)))
+
+    stats = {'pages': page_count, 'cachedPages': cached_pages}
+    logger.info(f"Analyzed {key} page by page: {stats}")
+    return PAGE_SEPARATOR.join(page_texts), stats
@@ -0,0 +1,105 @@
+import os
+import re
+from collections import Counter
+from typing import Dict, Any, Tuple
+
+from chunked_extraction import estimate_tokens
+from textract_text import split_pages, PAGE_SEPARATOR
+
+# Lines this close to the top or bottom of a page are treated as header/footer candidates
+COMPACTION_EDGE_LINES = int(os.environ.get('COMPACTION_EDGE_LINES', '6'))
+# A header/footer line is repeated when it appears on at least this share of pages (and at least 3 pages)
+COMPACTION_REPEAT_PAGE_FRACTION = float(os.environ.get('COMPACTION_REPEAT_PAGE_FRACTION', '0.5'))
+COMPACTION_REPEAT_MIN_PAGES = 3
+
+WHITESPACE_PATTERN = re.compile(r'[ \t\u00a0]+')
+PAGE_REFERENCE_PATTERN = re.compile(r'\b(page|pg|p\.)\s*\d+(\s*(of|/)\s*\d+)?', re.IGNORECASE)
+PAGE_NUMBER_PATTERN = re.compile(r'^(page\s*)?#?\s*\d+(\s*(of|/)\s*\d+)?$|^-\s*\d+\s*-$', re.IGNORECASE)
+SECTION_HEADING_PATTERN = re.compile(r'^[A-Z][A-Z /&-]{2,40}:$')
+
+
+def _normalize_line(line: str) -> str:
+    return WHITESPACE_PATTERN.sub(' ', line).strip()
+
+
+def _repeat_key(line: str) -> str:
+    # Only page references are masked ("Page 3 of 40", "P. 3/40" in fax banners). Other digits such as
+    # dates of service are kept, so lines that differ in real content are never treated as repeats.
+    return PAGE_REFERENCE_PATTERN.sub('page#', line.lower())
+
+
+def _edge_size(line_count: int) -> int:
+    # Short pages get a proportionally smaller header/footer zone so their body is never considered
+    return min(COMPACTION_EDGE_LINES, line_count // 4)
+
+
+def _is_edge_line(index: int, line_count: int) -> bool:
+    edge_size = _edge_size(line_count)
+    return index < edge_size or index >= line_count - edge_size
+
+
+def _is_repeat_candidate(index: int, line: str, line_count: int) -> bool:
+    # Bare section headings (IMPRESSION:, FINDINGS:) recur legitimately and anchor the extraction
+    return _is_edge_line(index, line_count) and not SECTION_HEADING_PATTERN.match(line)
+
+
+def compact_text(text: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Remove OCR noise that repeats on every page before the text is sent to the model.
+
+    - Header/footer lines (fax banners, page headers, patient demographic blocks) that repeat
+      verbatim near the top or bottom of most pages are kept once, on their first occurrence
+    - Bare page-number lines near the top or bottom of a page are dropped
+    - Whitespace is collapsed, blank lines are removed, and duplicate consecutive lines are merged
+
+    Only lines in the page edges are considered for repeat removal, and bare section headings such
+    as IMPRESSION: are never removed. Page boundaries are kept.
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: The compacted text and before/after character and token counts
+    """
+    pages = [[_normalize_line(line) for line in page.split("\n")] for page in split_pages(text)]
+    pages = [[line for line in page if line] for page in pages]
+
+    repeated_keys = set()
+    if len(pages) >= COMPACTION_REPEAT_MIN_PAGES:
+        page_counts = Counter()
+        for page in pages:
+            page_counts.update({_repeat_key(line) for index, line in enumerate(page)
+                                if _is_repeat_candidate(index, line, len(page))})
+        min_pages = max(COMPACTION_REPEAT_MIN_PAGES, int(len(pages) * COMPACTION_REPEAT_PAGE_FRACTION))
+        repeated_keys = {key for key, count in page_counts.items() if count >= min_pages}
+
+    seen_repeated = set()
+    removed_lines = 0
+    compacted_pages = []
+    for page in pages:
+        compacted = []
+        for index, line in enumerate(page):
+            # Bare numbers in the body are lab values, counts and the like, so only edge lines are page numbers
+            if _is_edge_line(index, len(page)) and PAGE_NUMBER_PATTERN.match(line):
+                removed_lines += 1
+                continue
+            if _is_repeat_candidate(index, line, len(page)):
+                key = _repeat_key(line)
+                if key in repeated_keys:
+                    if key in seen_repeated:
+                        removed_lines += 1
+                        continue
+                    seen_repeated.add(key)
+            if compacted and compacted[-1] == line:
+                removed_lines += 1
+                continue
+            compacted.append(line)
+        compacted_pages.append("\n".join(compacted))
+
+    compacted_text = PAGE_SEPARATOR.join(compacted_pages)
+    stats = {
+        "charsBefore": len(text),
+        "charsAfter": len(compacted_text),
+        "estimatedTokensBefore": estimate_tokens(text),
+        "estimatedTokensAfter": estimate_tokens(compacted_text),
+        "repeatedLinePatterns": len(repeated_keys),
+        "linesRemoved": removed_lines
+    }
+    return compacted_text, stats
@@ -0,0 +1,74 @@
+import os
+import json
+import asyncio
+import logging
+from collections import deque
+from typing import List, Dict, Any, Iterator
+
+from common.aws import get_client, run_sync
+
+logger = logging.getLogger()
+
+# Number of output part objects fetched concurrently (and the most held in memory at once)
+TEXTRACT_OUTPUT_READ_CONCURRENCY = int(os.environ.get('TEXTRACT_OUTPUT_READ_CONCURRENCY', '8'))
+
+s3_client = get_client('s3')
+
+
+def list_output_parts(bucket_name: str, prefix: str, job_id: str) -> List[str]:
+    """
+    List the result part objects Textract wrote for a job.
+
+    Textract writes its OutputConfig results to {S3Prefix}/{JobId}/1, /2, ... alongside a
+    .s3_access_check marker. Parts are returned in numeric order so blocks keep reading order.
+    """
+    job_prefix = f"{prefix.rstrip('/')}/{job_id}/"
+    part_keys = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=job_prefix):
+        for obj in page.get('Contents', []):
+            part_name = obj['Key'][len(job_prefix):]
+            if part_name.isdigit():
+                part_keys.append(obj['Key'])
+
+    return sorted(part_keys, key=lambda part_key: int(part_key.rsplit('/', 1)[-1]))
+
+
+def read_output_part(bucket_name: str, part_key: str) -> List[Dict[str, Any]]:
+    """
+    Fetch a single result part and decode it directly from the response stream.
+    """
+    response = s3_client.get_object(Bucket=bucket_name, Key=part_key)
+    part = json.load(response['Body'])
+
+    job_status = part.get('JobStatus')
+    if job_status not in (None, 'SUCCEEDED', 'PARTIAL_SUCCESS'):
+        raise ValueError(f"Textract output part {part_key} reports job status {job_status}")
+
+    return part.get('Blocks', [])
+
+
+def iter_output_blocks(bucket_name: str, part_keys: List[str], loop: asyncio.AbstractEventLoop) -> Iterator[Dict[str, Any]]:
+    """
+    Yield blocks part by part in reading order.
+
+    Meant to be consumed on a worker thread (e.g. by combine_textract_results under run_sync).
+    Parts are fetched concurrently with run_sync on the shared AWS thread pool, scheduled on
+    loop, but at most TEXTRACT_OUTPUT_READ_CONCURRENCY parts are in flight or buffered at a time,
+    so memory stays bounded however many parts the job wrote.
+    """
+    def fetch(part_key: str):
+        return asyncio.run_coroutine_threadsafe(run_sync(read_output_part, bucket_name, part_key), loop)
+
+    part_iter = iter(part_keys)
+    pending = deque(fetch(part_key) for _, part_key in zip(range(TEXTRACT_OUTPUT_READ_CONCURRENCY), part_iter))
+    try:
+        while pending:
+            part_blocks = pending.popleft().result()
+            next_key = next(part_iter, None)
+            if next_key is not None:
+                pending.append(fetch(next_key))
+            yield from part_blocks
+    finally:
+        for future in pending:
+            future.cancel()
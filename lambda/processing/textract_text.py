@@ -0,0 +1,155 @@
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Optional
+
+# Separates pages in combined text. A form feed is whitespace to the model but still lets
+# later stages split the text back into pages.
+PAGE_BREAK = "\f"
+PAGE_SEPARATOR = f"\n{PAGE_BREAK}\n"
+
+
+def get_child_ids(block: Dict[str, Any]) -> List[str]:
+    child_ids = []
+    for relationship in block.get('Relationships', []):
+        if relationship.get('Type') == 'CHILD':
+            child_ids.extend(relationship.get('Ids', []))
+    return child_ids
+
+
+class _PageBuffer:
+    """
+    The minimal state needed to render one page: LINE text, WORD text for table cells, and
+    the table structure. Geometry and everything else in the block is dropped on arrival.
+    """
+
+    def __init__(self, page_number: int):
+        self.page_number = page_number
+        self.lines: List[Tuple[str, List[str]]] = []
+        self.words: Dict[str, str] = {}
+        self.selected_ids = set()
+        self.cells: Dict[str, Tuple[int, int, List[str]]] = {}
+        self.tables: List[List[str]] = []
+
+    def add(self, block: Dict[str, Any]) -> None:
+        block_type = block.get('BlockType')
+        if block_type == 'LINE':
+            if block.get('Text') is not None:
+                self.lines.append((block['Text'], get_child_ids(block)))
+        elif block_type == 'WORD':
+            self.words[block.get('Id')] = block.get('Text', '')
+        elif block_type == 'SELECTION_ELEMENT':
+            if block.get('SelectionStatus') == 'SELECTED':
+                self.selected_ids.add(block.get('Id'))
+        elif block_type == 'CELL':
+            self.cells[block.get('Id')] = (block.get('RowIndex', 0), block.get('ColumnIndex', 0), get_child_ids(block))
+        elif block_type == 'TABLE':
+            self.tables.append(get_child_ids(block))
+
+    def render(self) -> List[str]:
+        """
+        Render the page as text lines. Tables become pipe-delimited rows and the LINE blocks
+        that fall inside a table are skipped so table text is not emitted twice.
+
+        Textract sends a page's TABLE blocks after all of its LINE blocks, so each table is
+        rendered in place of the first LINE that falls inside it, keeping its reading-order
+        position. A table no LINE falls inside (e.g. only selection elements) ends the page.
+        """
+        table_word_ids = set()
+        for _, _, child_ids in self.cells.values():
+            table_word_ids.update(child_ids)
+        word_tables: Dict[str, int] = {}
+        for table_index, cell_ids in enumerate(self.tables):
+            for cell_id in cell_ids:
+                for child_id in self.cells.get(cell_id, (0, 0, []))[2]:
+                    word_tables.setdefault(child_id, table_index)
+
+        page_lines = []
+        rendered_tables = set()
+        for text, word_ids in self.lines:
+            if word_ids and table_word_ids.issuperset(word_ids):
+                table_index = word_tables.get(word_ids[0])
+                if table_index is not None and table_index not in rendered_tables:
+                    rendered_tables.add(table_index)
+                    page_lines.extend(self._render_table(self.tables[table_index]))
+                continue
+            page_lines.append(text)
+        for table_index, cell_ids in enumerate(self.tables):
+            if table_index not in rendered_tables:
+                page_lines.extend(self._render_table(cell_ids))
+        return page_lines
+
+    def _render_table(self, cell_ids: List[str]) -> List[str]:
+        rows: Dict[int, Dict[int, str]] = {}
+        for cell_id in cell_ids:
+            if cell_id not in self.cells:
+                continue
+            row_index, column_index, child_ids = self.cells[cell_id]
+            words = []
+            for child_id in child_ids:
+                if child_id in self.words:
+                    words.append(self.words[child_id])
+                elif child_id in self.selected_ids:
+                    words.append('[X]')
+            rows.setdefault(row_index, {})[column_index] = ' '.join(words)
+
+        return [' | '.join(rows[row_index][column_index] for column_index in sorted(rows[row_index]))
+                for row_index in sorted(rows)]
+
+
+def iter_page_lines(blocks: Iterable[Dict[str, Any]]) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Stream Textract blocks into rendered pages.
+
+    Textract returns blocks grouped by page, so only the current page is buffered. Peak memory
+    is bounded by one page, however many pages the document has.
+
+    Yields:
+        Tuple[int, List[str]]: The page number and its text lines.
+    """
+    page: Optional[_PageBuffer] = None
+    for block in blocks:
+        page_number = block.get('Page', page.page_number if page else 1)
+        if page is None or page_number != page.page_number:
+            if page is not None:
+                yield page.page_number, page.render()
+            page = _PageBuffer(page_number)
+        page.add(block)
+
+    if page is not None:
+        yield page.page_number, page.render()
+
+
+def iter_text_chunks(blocks: Iterable[Dict[str, Any]], page_separator: Optional[str] = None) -> Iterator[str]:
+    """
+    Emit combined text incrementally, one page at a time.
+
+    Args:
+        blocks: Textract blocks in reading order (a list or a lazy generator)
+        page_separator: Inserted between pages to keep page boundaries; pages are joined
+            with a plain newline when None
+    """
+    first = True
+    for _, page_lines in iter_page_lines(blocks):
+        # Blank pages are kept when page boundaries are requested so page positions stay aligned
+        if not page_lines and page_separator is None:
+            continue
+        if not first:
+            yield page_separator if page_separator is not None else "\n"
+        first = False
+        yield "\n".join(page_lines)
+
+
+def combine_textract_results(textract_results: Iterable[Dict[str, Any]], page_separator: Optional[str] = None) -> str:
+    """
+    Combine Textract blocks into plain text.
+
+    Handles both text detection output (LINE/WORD) and document analysis output with
+    TABLE/CELL blocks. Accepts a lazy block generator so the full block list never has
+    to be materialized.
+    """
+    return "".join(iter_text_chunks(textract_results, page_separator))
+
+
+def split_pages(text: str) -> List[str]:
+    """
+    Split combined text back into pages on the page break written by combine_textract_results.
+    """
+    return [page.strip("\n") for page in text.split(PAGE_BREAK)]
@@ -1,17 +1,20 @@
+import io
 import json
-import boto3
 import os
+import re
 import xml.etree.ElementTree as ET
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple, Optional
 import time
-import aiohttp
-from base64 import b64encode
 from aws_xray_sdk.core import xray_recorder
 from aws_xray_sdk.core import patch_all
 import asyncio
 import logging
-import backoff
 from datetime import timezone, datetime
+from botocore.exceptions import ClientError
+from common.aws import get_client, get_table, run_sync, table_call
+from common.appconnect import get_appconnect_client
+from common.status import StatusPublisher
+from common.soap_storage import build_soap_item
 
 patch_all()
 
@@ -20,73 +23,88 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize AWS clients
-stepfunctions_client = boto3.client("stepfunctions")
-dynamodb = boto3.resource("dynamodb")
+stepfunctions_client = get_client("stepfunctions")
 
 # Constants
 REQUIRED_FIELDS = {'SessionId', 'OrganizationId', 'sf:Id', 'sf:File_Info_Id__c', 'sf:Record_Type_Name__c'}
 DYNAMODB_TABLE_NAME = os.environ['DOCUMENT_SOAP_TABLE_NAME']
+# Claims shared across containers (partition key dedupKey, expired by TTL). Only the in-container cache dedups when it is not set.
+NOTIFICATION_DEDUP_TABLE_NAME = os.environ.get('NOTIFICATION_DEDUP_TABLE_NAME')
 STATE_MACHINE_ARN = os.environ['STATE_MACHINE_ARN']
+# Executions started at once when an outbound message carries several notifications
+START_WORKFLOW_CONCURRENCY = int(os.environ.get('START_WORKFLOW_CONCURRENCY', '10'))
+# A notification for the same record and file within this window is a redelivery or double click and is only Acked
+DEDUP_WINDOW_SECONDS = int(os.environ.get('DEDUP_WINDOW_SECONDS', '900'))
+# A Notification element of an outbound message, with whatever prefix the sender gave the outbound namespace
+NOTIFICATION_ELEMENT_PATTERN = re.compile(r'<((?:[\w.-]+:)?)Notification\b[^>]*>.*?</\1Notification\s*>', re.DOTALL)
+# Dead Letter Queue messages replayed at once from one SQS batch
+REPLAY_CONCURRENCY = int(os.environ.get('REPLAY_CONCURRENCY', '5'))
 
-IBM_APPCONNECT_URL = os.environ['IBM_APPCONNECT_URL']
-IBM_APPCONNECT_USERNAME = os.environ['IBM_APPCONNECT_USERNAME']
-IBM_APPCONNECT_PASSWORD = os.environ['IBM_APPCONNECT_PASSWORD']
+# Notifications claimed by this container (dedup key -> expiry, execution name), checked before the shared DynamoDB claim
+recent_claims: Dict[str, Tuple[float, Optional[str]]] = {}
+
+# Pooled AppConnect session, reused by warm invocations
+appconnect = get_appconnect_client()
 
 SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
 
-@backoff.on_exception(backoff.expo, 
-                      (aiohttp.ClientError, asyncio.TimeoutError),
-                      max_tries=5)
-async def update_salesforce_status(file_info_id, document_id, status):
+async def async_lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
-    Update the Salesforce status for a given fileInfoId and documentId.
+    Two event shapes are handled:
+        - API Gateway request carrying a Salesforce outbound message: {"body": "<soapenv:Envelope ..."}
+        - SQS batch replaying failed requests from the StartWorkflow Dead Letter Queue: {"Records": [...]}
     """
-    
-    payload = {
-        "Id": document_id,
-        "File_Info_Id__c": file_info_id,
-        "Document_Extraction_Status__c": status
-    }
-    
-    async with aiohttp.ClientSession() as session:
+    logger.info(f"Received event: {json.dumps(event, default=str)}")
+
+    if 'Records' in event:
+        return await replay_dead_letters(event['Records'])
+
+    return await process_soap_event(event)
+
+async def replay_dead_letters(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Replay the original API Gateway events queued in the Dead Letter Queue, REPLAY_CONCURRENCY
+    at a time. Notifications already started are skipped by the dedup claim, so a retried
+    message only restarts what actually failed.
+
+    Returns:
+        Dict[str, Any]: SQS partial batch response so only failed messages are retried.
+    """
+    semaphore = asyncio.Semaphore(REPLAY_CONCURRENCY)
+
+    async def replay(record: Dict[str, Any]) -> bool:
         try:
-            _url = f"{IBM_APPCONNECT_URL}/Treatment_API/Treatment/{payload['Id']}"
-            logger.info(f"IBM_APPCONNECT_URL: {_url}")
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/json',
-                'Authorization': f'Basic {b64encode(f"{IBM_APPCONNECT_USERNAME}:{IBM_APPCONNECT_PASSWORD}".encode()).decode()}'
-            }
-            
-            payload_json = json.dumps(payload)
-            logger.debug(f"Payload JSON: {payload_json}")
-            
-            async with session.put(_url, data=payload_json, headers=headers) as response:
-                response_text = await response.text()
-                logger.info(f"IBM AppConnect response: {response_text}")
-
-                if response.status in [200, 201]:
-                    response_data = json.loads(response_text)
-                    logger.info(f"Successfully notified IBM AppConnect for file {file_info_id}")
-                    return response_data  # Return the entire response data
-                else:
-                    error_message = f"Failed to notify IBM AppConnect. Status: {response.status}, Response: {response_text}"
-                    logger.error(error_message)
-                    raise Exception(error_message)
-        except Exception as e:
-            error_message = f"Error notifying IBM AppConnect: {str(e)}"
-            logger.error(error_message)
-            raise
+            original_event = json.loads(record['body'])
+        except (KeyError, TypeError, json.JSONDecodeError) as e:
+            # Retrying can never fix an unreadable message
+            logger.error(f"Dropping unreadable Dead Letter Queue message {record.get('messageId')}: {str(e)}")
+            return True
+        async with semaphore:
+            response = await process_soap_event(original_event, send_failures_to_dlq=False)
+        return response['statusCode'] < 500
 
-async def async_lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    logger.info(f"Received event: {json.dumps(event, default=str)}")
+    results = await asyncio.gather(*(replay(record) for record in records))
+    batch_item_failures = [{'itemIdentifier': record.get('messageId')}
+                           for record, succeeded in zip(records, results) if not succeeded]
+    logger.info(f"Replayed {len(records) - len(batch_item_failures)} of {len(records)} Dead Letter Queue messages")
+    return {'batchItemFailures': batch_item_failures}
+
+async def process_soap_event(event: Dict[str, Any], send_failures_to_dlq: bool = True) -> Dict[str, Any]:
+    """
+    Start a workflow for every notification in the SOAP message of an API Gateway event.
+
+    Failed notifications are sent to the Dead Letter Queue, unless the event is itself being
+    replayed from it (send_failures_to_dlq=False), in which case the response is a 500 so the
+    queue retries the message.
+    """
+    status_publisher = StatusPublisher(appconnect)
     
     try:
-        # Step 1: Extract and validate SOAP message
+        # Step 1: Extract and validate every notification in the SOAP message
         soap_message = event.get('body', '')
         logger.debug(f"SOAP message: {soap_message}")
         try:
-            extracted_data = extract_soap_data(soap_message)
+            notifications = extract_soap_notifications(soap_message)
         except ET.ParseError as parse_error:
             if "no element found" in str(parse_error):
                 logger.warning(f"Ignoring 'no element found' error: {str(parse_error)}")
@@ -94,67 +112,227 @@ async def async_lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str,
             else:
                 raise  # Re-raise the exception if it's not the specific error we're looking for
 
-        if not all(field in extracted_data for field in REQUIRED_FIELDS):
-            return create_response(400, is_soap=True)
+        valid_notifications = []
+        invalid_notifications = []
+        for extracted_data, notification_message in notifications:
+            if (all(field in extracted_data for field in REQUIRED_FIELDS)
+                    and extracted_data['sf:Id'] and extracted_data['sf:File_Info_Id__c']):
+                valid_notifications.append((extracted_data, notification_message))
+            else:
+                invalid_notifications.append(extracted_data)
 
-        document_type = extracted_data['sf:Record_Type_Name__c']
-        document_id = extracted_data['sf:Id']
-        file_info_id = extracted_data['sf:File_Info_Id__c']
-        
-        # Validate required fields
-        if not all([document_id, file_info_id]):
-            error_message = f"Missing required fields in event. documentId: {document_id}, fileInfoId: {file_info_id}"
+        # Redelivery cannot fix a notification with missing fields, so it is reported and the rest of the batch goes ahead
+        if invalid_notifications:
+            error_message = (f"Missing required fields in {len(invalid_notifications)} of {len(notifications)} "
+                             f"notifications: {json.dumps(invalid_notifications)}")
             logger.error(error_message)
-            send_sns_notification("Missing Required Fields", error_message)
+            await run_sync(send_sns_notification, "Missing Required Fields", error_message)
+        if not valid_notifications:
             return create_response(400, is_soap=True)
 
-        # Update Salesforce status
-        try:
-            await update_salesforce_status(file_info_id, document_id, "Starting Document Process Workflow")
-        except Exception as e:
-            error_message = f"Failed to update Salesforce status: {str(e)}"
-            logger.error(error_message)
-            send_sns_notification("Salesforce Update Error", error_message)
-            return create_response(500, is_soap=True)
+        # Steps 2-3: Start the Step Function executions, START_WORKFLOW_CONCURRENCY at a time
+        semaphore = asyncio.Semaphore(START_WORKFLOW_CONCURRENCY)
+        # Notifications whose claim this invocation made; a copy re-driving another claim's execution has no SOAP record to add
+        first_claims = set()
 
-        # Step 2: Prepare Step Function input
-        step_function_input = {
-            "startWorkflowTask": {
-                "documentId": document_id,
-                "fileInfoId": file_info_id,
-                "documentType": document_type
-            }
-        }
-        logger.debug(f"step_function_input: {step_function_input}")
+        async def start(extracted_data: Dict[str, str]) -> Optional[Dict[str, Any]]:
+            dedup_key = get_dedup_key(extracted_data)
+            claim = await claim_notification(dedup_key)
+            if not claim['first'] and (claim['started'] or not claim['executionName']):
+                logger.info(f"Duplicate notification for {dedup_key}. Acking without starting a workflow.")
+                return None
+            if claim['first']:
+                first_claims.add(dedup_key)
+            else:
+                # The copy that claimed it never recorded a start (it crashed or failed). The execution
+                # name is the claim's, so this is a no-op when the execution did start after all
+                logger.info(f"Notification {dedup_key} was claimed but not started. Starting {claim['executionName']}.")
+            try:
+                async with semaphore:
+                    response = await start_workflow(extracted_data, claim['executionName'], status_publisher)
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ExecutionAlreadyExists':
+                    recent_claims.pop(dedup_key, None)
+                    raise
+                # The claimed execution started and already finished
+                logger.info(f"Execution {claim['executionName']} for {dedup_key} already exists. Acking.")
+                await mark_started(dedup_key)
+                return None
+            except Exception:
+                # The shared claim keeps its execution name, so the Dead Letter Queue replay starts the same execution
+                recent_claims.pop(dedup_key, None)
+                raise
+            await mark_started(dedup_key)
+            return response
 
-        # Step 3: Start Step Function execution
-        state_machine_arn = STATE_MACHINE_ARN
-        response = stepfunctions_client.start_execution(
-            stateMachineArn=state_machine_arn,
-            input=json.dumps(step_function_input)
-        )
+        results = await asyncio.gather(*(start(extracted_data) for extracted_data, _ in valid_notifications),
+                                       return_exceptions=True)
+        started = [notification for notification, result in zip(valid_notifications, results)
+                   if result is not None and not isinstance(result, Exception)]
+        duplicates = sum(1 for result in results if result is None)
+        failed = [(notification, result) for notification, result in zip(valid_notifications, results)
+                  if isinstance(result, Exception)]
+        logger.info(f"Started {len(started)} of {len(valid_notifications)} workflows ({duplicates} duplicates)")
 
-        # Step 4: Write record to DynamoDB
-        write_to_dynamodb(extracted_data, soap_message)
-        
-        await update_salesforce_status(file_info_id, document_id, "Started Document Process Workflow")
+        # Step 4: Write the SOAP records of the workflows this invocation claimed to DynamoDB
+        claimed = [notification for notification in started if get_dedup_key(notification[0]) in first_claims]
+        if claimed:
+            await write_to_dynamodb(claimed)
+
+        # Only the failed notifications go to the Dead Letter Queue, each as its own SOAP message
+        if failed:
+            error_message = "Failed to start workflows: " + json.dumps(
+                [{'documentId': data['sf:Id'], 'fileInfoId': data['sf:File_Info_Id__c'], 'error': str(error)}
+                 for (data, _), error in failed])
+            logger.error(error_message)
+            await asyncio.gather(
+                run_sync(send_sns_notification, "Workflow Start Error", error_message, event),
+                *(run_sync(send_to_dlq, {**event, 'body': notification_message})
+                  for (_, notification_message), _ in failed if send_failures_to_dlq)
+            )
+
+        status_update_failures = await status_publisher.flush()
+        if status_update_failures:
+            error_message = f"Failed to update Salesforce status: {json.dumps(status_update_failures)}"
+            logger.error(error_message)
+            await run_sync(send_sns_notification, "Salesforce Update Error", error_message)
 
-        return create_response(200, is_soap=True)
+        # One Ack covers the whole batch; failed notifications are retried from the Dead Letter Queue
+        if failed and not send_failures_to_dlq:
+            return create_response(500, is_soap=True)
+        return create_response(200 if started or duplicates else 500, is_soap=True)
     except Exception as e:
         error_message = f"Uncaught exception in StartWorkflow Lambda: {str(e)}"
         logger.error(error_message)
-        send_sns_notification("Uncaught Exception in StartWorkflow Lambda", error_message, event)
-        send_to_dlq(event)  # Send the failed event to the Dead Letter Queue
+        await status_publisher.flush()
+        # Send the failed event to the Dead Letter Queue
+        await asyncio.gather(
+            run_sync(send_sns_notification, "Uncaught Exception in StartWorkflow Lambda", error_message, event),
+            *([run_sync(send_to_dlq, event)] if send_failures_to_dlq else [])
+        )
         return create_response(500, is_soap=True)
 
+def get_dedup_key(extracted_data: Dict[str, str]) -> str:
+    return f"dedup#{extracted_data['sf:Id']}#{extracted_data['sf:File_Info_Id__c']}"
+
+def get_execution_name(dedup_key: str, claimed_at: int) -> str:
+    # Step Functions execution names allow letters, digits, '-' and '_', up to 80 characters
+    return re.sub(r'[^A-Za-z0-9_-]', '-', f"{dedup_key.split('#', 1)[1]}-{claimed_at}")[:80]
+
+async def claim_notification(dedup_key: str) -> Dict[str, Any]:
+    """
+    Claim a notification so only the first copy within DEDUP_WINDOW_SECONDS starts a workflow.
+
+    The in-container cache catches copies in the same envelope and quick retries to a warm
+    container. The conditional write to the dedup table catches copies handled by other containers.
+    The claim item expires through the table's TTL.
+
+    The claim holds the name of the notification's execution. Starting an execution under a name
+    that is already running with the same input is a no-op, so a copy that finds a claim never
+    marked started can safely start it: a claimer that crashed before StartExecution does not
+    drop the document.
+
+    Returns:
+        Dict[str, Any]: first (True for the first copy), executionName (None for a claim made
+        before names were stored) and started (whether the claimer recorded the execution start)
+    """
+    now = time.time()
+    cached = recent_claims.get(dedup_key)
+    if cached and cached[0] > now:
+        return {'first': False, 'executionName': cached[1], 'started': True}
+    execution_name = get_execution_name(dedup_key, int(now))
+    recent_claims[dedup_key] = (now + DEDUP_WINDOW_SECONDS, execution_name)
+    if len(recent_claims) > 1000:
+        for key in [key for key, (expires_at, _) in recent_claims.items() if expires_at <= now]:
+            del recent_claims[key]
+    if not NOTIFICATION_DEDUP_TABLE_NAME:
+        return {'first': True, 'executionName': execution_name, 'started': False}
+
+    try:
+        await table_call(
+            NOTIFICATION_DEDUP_TABLE_NAME, 'put_item',
+            Item={'dedupKey': dedup_key, 'ttl': int(now) + DEDUP_WINDOW_SECONDS,
+                  'executionName': execution_name, 'started': False},
+            ConditionExpression='attribute_not_exists(dedupKey) OR #ttl < :now',
+            ExpressionAttributeNames={'#ttl': 'ttl'},
+            ExpressionAttributeValues={':now': int(now)},
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            claim = e.response.get('Item', {})
+            return {
+                'first': False,
+                'executionName': claim.get('executionName', {}).get('S'),
+                'started': claim.get('started', {}).get('BOOL', True)
+            }
+        # Dedup only saves work, so an unavailable table must not block the workflow
+        logger.warning(f"Could not record dedup claim {dedup_key}: {str(e)}")
+    return {'first': True, 'executionName': execution_name, 'started': False}
+
+async def mark_started(dedup_key: str) -> None:
+    """
+    Record on the claim that its execution started, so later copies are only Acked.
+    """
+    if not NOTIFICATION_DEDUP_TABLE_NAME:
+        return
+    try:
+        await table_call(
+            NOTIFICATION_DEDUP_TABLE_NAME, 'update_item',
+            Key={'dedupKey': dedup_key},
+            UpdateExpression='SET started = :started',
+            ConditionExpression='attribute_exists(dedupKey)',
+            ExpressionAttributeValues={':started': True}
+        )
+    except ClientError as e:
+        # A later copy then starts the same execution name again, which is a no-op
+        logger.warning(f"Could not mark dedup claim {dedup_key} started: {str(e)}")
+
+async def start_workflow(extracted_data: Dict[str, str], execution_name: str,
+                         status_publisher: StatusPublisher) -> Dict[str, Any]:
+    """
+    Start the document processing Step Function for one notification, under the execution name
+    of its dedup claim.
+    """
+    document_type = extracted_data['sf:Record_Type_Name__c']
+    document_id = extracted_data['sf:Id']
+    file_info_id = extracted_data['sf:File_Info_Id__c']
+
+    # Update Salesforce status in the background. A failed update is reported but no longer stops the workflow.
+    await status_publisher.publish(file_info_id, document_id, "Starting Document Process Workflow")
+
+    step_function_input = {
+        "startWorkflowTask": {
+            "documentId": document_id,
+            "fileInfoId": file_info_id,
+            "documentType": document_type
+        }
+    }
+    logger.debug(f"step_function_input: {step_function_input}")
+
+    response = await run_sync(
+        stepfunctions_client.start_execution,
+        stateMachineArn=STATE_MACHINE_ARN,
+        name=execution_name,
+        input=json.dumps(step_function_input)
+    )
+
+    await status_publisher.publish(file_info_id, document_id, "Started Document Process Workflow")
+    return response
+
 @xray_recorder.capture('lambda_handler')
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     loop = asyncio.get_event_loop()
     return loop.run_until_complete(async_lambda_handler(event, context))
 
-def extract_soap_data(soap_message: str) -> Dict[str, str]:
+def extract_soap_notifications(soap_message: str) -> List[Tuple[Dict[str, str], str]]:
     """
-    Extract relevant data from SOAP message.
+    Extract the data of every notification in a SOAP message. Salesforce outbound messaging
+    packs up to 100 notifications into one envelope.
+
+    Returns:
+        List[Tuple[Dict[str, str], str]]: Per notification, its extracted fields and a SOAP message
+        holding only that notification (the original message when it has a single notification)
     """
     root = ET.fromstring(soap_message)
     namespaces = {
@@ -163,34 +341,90 @@ def extract_soap_data(soap_message: str) -> Dict[str, str]:
         'sf': 'urn:sobject.enterprise.soap.sforce.com'
     }
 
-    data = {}
+    notifications_element = root.find('.//ns:notifications', namespaces)
+    if notifications_element is None:
+        return [({}, soap_message)]
+
+    # SessionId and OrganizationId are sent once per envelope and apply to every notification
+    envelope_data = {}
     for field in REQUIRED_FIELDS:
-        if field.startswith('sf:'):
-            xpath = f'.//ns:sObject/sf:{field.split(":")[-1]}'
+        if not field.startswith('sf:'):
+            element = notifications_element.find(f'ns:{field}', namespaces)
+            if element is not None:
+                envelope_data[field] = element.text
+
+    notification_elements = notifications_element.findall('ns:Notification', namespaces)
+    envelope_parts = None
+    if len(notification_elements) > 1:
+        envelope_parts = split_envelope(soap_message, len(notification_elements))
+        if envelope_parts is None:
+            for notification_element in notification_elements:
+                notifications_element.remove(notification_element)
+            register_namespace_prefixes(soap_message)
+
+    notifications = []
+    for index, notification_element in enumerate(notification_elements):
+        data = dict(envelope_data)
+        for field in REQUIRED_FIELDS:
+            if field.startswith('sf:'):
+                element = notification_element.find(f'ns:sObject/sf:{field.split(":")[-1]}', namespaces)
+                if element is not None:
+                    data[field] = element.text
+
+        if envelope_parts is not None:
+            notification_message = envelope_parts[index]
+        elif len(notification_elements) > 1:
+            notifications_element.append(notification_element)
+            notification_message = ET.tostring(root, encoding='unicode')
+            notifications_element.remove(notification_element)
         else:
-            xpath = f'.//ns:{field}'
-        
-        element = root.find(xpath, namespaces)
-        if element is not None:
-            data[field] = element.text
+            notification_message = soap_message
+        notifications.append((data, notification_message))
 
-    return data
+    return notifications or [(envelope_data, soap_message)]
 
-def write_to_dynamodb(extracted_data: Dict[str, str], soap_message: str) -> None:
+def split_envelope(soap_message: str, count: int) -> Optional[List[str]]:
     """
-    Write extracted data and SOAP message to DynamoDB.
+    One SOAP message per Notification element, cut from the original text so every namespace
+    declaration and prefix (including those only referenced by xsi:type values) is kept as sent.
+    None when the elements cannot be matched one-to-one in the text.
+    """
+    matches = list(NOTIFICATION_ELEMENT_PATTERN.finditer(soap_message))
+    if len(matches) != count:
+        return None
+    head = soap_message[:matches[0].start()]
+    tail = soap_message[matches[-1].end():]
+    return [head + match.group(0) + tail for match in matches]
+
+def register_namespace_prefixes(soap_message: str) -> None:
+    """
+    Make ElementTree serialize with the message's own prefixes instead of ns0, ns1...
+    """
+    for _, (prefix, uri) in ET.iterparse(io.StringIO(soap_message), events=('start-ns',)):
+        try:
+            ET.register_namespace(prefix, uri)
+        except ValueError:
+            # Prefixes of the ns<digits> form are reserved by ElementTree
+            pass
+
+async def write_to_dynamodb(notifications: List[Tuple[Dict[str, str], str]]) -> None:
+    """
+    Write the SOAP record of each notification to DynamoDB in batches. How the SOAP message
+    itself is stored (inline, compressed or in S3) is set by SOAP_STORAGE_MODE.
     """
-    table = dynamodb.Table(DYNAMODB_TABLE_NAME)
     current_timestamp = int(time.time() * 1000)  # Current time in milliseconds
-    
-    table.put_item(Item={
-        'id': extracted_data['sf:Id'],
-        'timestamp': current_timestamp,
-        'file_info_id': extracted_data['sf:File_Info_Id__c'],
-        'document_type': extracted_data['sf:Record_Type_Name__c'],
-        'extracted_data': extracted_data,
-        'soap_message': soap_message
-    })
+    # Notifications of one envelope can share a record (sf:Id) with different files, so each item gets
+    # its own millisecond in the sort key instead of overwriting the others
+    items = await asyncio.gather(*(run_sync(build_soap_item, extracted_data, soap_message, current_timestamp + index)
+                                   for index, (extracted_data, soap_message) in enumerate(notifications)))
+    await run_sync(batch_write_items, items)
+
+def batch_write_items(items: List[Dict[str, Any]]) -> None:
+    table = get_table(DYNAMODB_TABLE_NAME)
+    # Keys are unique per item (only the copy that made a notification's claim writes its record)
+    with table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=item)
 
 def create_response(status_code: int, is_soap: bool = False, body: Any = None) -> Dict[str, Any]:
     """
@@ -219,7 +453,7 @@ def create_response(status_code: int, is_soap: bool = False, body: Any = None) -
         }
 
 def send_sns_notification(subject: str, message: str, event: Dict[str, Any] = None):
-    sns_client = boto3.client('sns')
+    sns_client = get_client('sns')
     try:
         error_details = {
             "subject": subject,
@@ -242,7 +476,7 @@ def send_sns_notification(subject: str, message: str, event: Dict[str, Any] = No
         logger.error(f"Failed to send SNS notification: {str(e)}")
 
 def send_to_dlq(message: Dict[str, Any]):
-    sqs_client = boto3.client('sqs')
+    sqs_client = get_client('sqs')
     try:
         sqs_client.send_message(
             QueueUrl=os.environ['DLQ_URL'],
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import asyncio
+from botocore.exceptions import ClientError
+from typing import Dict, Any, List, Optional
+from aws_xray_sdk.core import xray_recorder
+from aws_xray_sdk.core import patch_all
+from common.aws import get_client, get_table, run_sync, table_call
+from common.leases import ConcurrencyGovernor
+
+patch_all()
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Check for required environment variables
+REQUIRED_ENV_VARS = [
+    'TEXTRACT_TASK_TOKEN_TABLE_NAME',
+    'TEXTRACT_OUTPUT_BUCKET_NAME',
+    'TEXTRACT_SNS_TOPIC_ARN',
+    'TEXTRACT_SNS_ROLE_ARN'
+]
+missing_vars = [var for var in REQUIRED_ENV_VARS if not os.environ.get(var)]
+if missing_vars:
+    raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
+
+# Initialize AWS clients
+textract_client = get_client('textract')
+stepfunctions_client = get_client('stepfunctions')
+
+# Get environment variables
+TEXTRACT_TASK_TOKEN_TABLE_NAME = os.environ['TEXTRACT_TASK_TOKEN_TABLE_NAME']
+TEXTRACT_OUTPUT_BUCKET_NAME = os.environ['TEXTRACT_OUTPUT_BUCKET_NAME']
+TEXTRACT_SNS_TOPIC_ARN = os.environ['TEXTRACT_SNS_TOPIC_ARN']
+TEXTRACT_SNS_ROLE_ARN = os.environ['TEXTRACT_SNS_ROLE_ARN']
+
+# Task tokens are only kept long enough to cover the Step Function task timeout
+TASK_TOKEN_TTL_SECONDS = int(os.environ.get('TASK_TOKEN_TTL_SECONDS', '86400'))
+
+# Textract jobs running at once across every workflow execution. A job's slot is released when its
+# completion notification arrives; a lost notification frees the slot after the Step Function task timeout.
+TEXTRACT_JOB_CONCURRENCY_LIMIT = int(os.environ.get('TEXTRACT_JOB_CONCURRENCY_LIMIT', '50'))
+TEXTRACT_JOB_LEASE_SECONDS = int(os.environ.get('TEXTRACT_JOB_LEASE_SECONDS', '7200'))
+
+textract_jobs = ConcurrencyGovernor('textract-jobs', TEXTRACT_JOB_CONCURRENCY_LIMIT, TEXTRACT_JOB_LEASE_SECONDS)
+
+
+@xray_recorder.capture('lambda_handler')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return asyncio.get_event_loop().run_until_complete(async_lambda_handler(event, context))
+
+
+async def async_lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Start a Textract job on behalf of a waiting Step Function task, or resume that task
+    when Textract publishes the job completion notification.
+
+    Two event shapes are handled:
+        - Step Function invocation (waitForTaskToken): {"taskToken", "bucket_name", "file_name"}
+        - SQS batch of Textract completion notifications delivered through SNS: {"Records": [...]}
+    """
+    logger.info(f"Received event: {json.dumps(event, default=str)}")
+
+    if 'Records' in event:
+        return await resume_workflows(event['Records'])
+
+    return await start_textract_job(event)
+
+
+async def start_textract_job(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Store the task token under a job tag derived from it, then start the analysis job with a
+    notification channel. The token is stored first so a fast job can never complete
+    before the resume handler is able to find it.
+
+    A Textract job slot is leased first. When none frees up in time, LeaseUnavailable fails
+    the invocation and the Step Function retries the task later.
+
+    A retried invocation for the same task token gets the same job tag. The tag is also the
+    ClientRequestToken, so Textract returns the job an earlier attempt started instead of
+    starting a second one, and the earlier attempt's lease is reused instead of taking another.
+    """
+    task_token = event['taskToken']
+    bucket_name = event['bucket_name']
+    file_name = event['file_name']
+
+    # JobTag and ClientRequestToken both allow up to 64 characters
+    job_tag = f"sfn-{hashlib.sha256(task_token.encode('utf-8')).hexdigest()[:60]}"
+    previous = (await table_call(TEXTRACT_TASK_TOKEN_TABLE_NAME, 'get_item', Key={'jobTag': job_tag})).get('Item')
+    if previous and previous.get('jobId'):
+        logger.info(f"Textract job {previous['jobId']} with tag {job_tag} was already started for {file_name}")
+        return {'JobId': previous['jobId'], 'JobTag': job_tag}
+
+    lease = previous['lease'] if previous and previous.get('lease') else await textract_jobs.acquire()
+    try:
+        await table_call(TEXTRACT_TASK_TOKEN_TABLE_NAME, 'put_item', Item={
+            'jobTag': job_tag,
+            'taskToken': task_token,
+            'documentKey': file_name,
+            'lease': lease,
+            'ttl': int(time.time()) + TASK_TOKEN_TTL_SECONDS
+        })
+
+        response = await run_sync(
+            textract_client.start_document_analysis,
+            DocumentLocation={
+                'S3Object': {
+                    'Bucket': bucket_name,
+                    'Name': file_name
+                }
+            },
+            FeatureTypes=['TABLES'],
+            OutputConfig={
+                'S3Bucket': TEXTRACT_OUTPUT_BUCKET_NAME,
+                'S3Prefix': f'textract-output/{file_name}'
+            },
+            NotificationChannel={
+                'SNSTopicArn': TEXTRACT_SNS_TOPIC_ARN,
+                'RoleArn': TEXTRACT_SNS_ROLE_ARN
+            },
+            JobTag=job_tag,
+            ClientRequestToken=job_tag
+        )
+    except Exception:
+        # No job is running on the slot. The token item goes too, so a retry takes a new lease
+        await textract_jobs.release(lease)
+        await table_call(TEXTRACT_TASK_TOKEN_TABLE_NAME, 'delete_item', Key={'jobTag': job_tag})
+        raise
+    job_id = response['JobId']
+
+    await table_call(
+        TEXTRACT_TASK_TOKEN_TABLE_NAME, 'update_item',
+        Key={'jobTag': job_tag},
+        UpdateExpression="SET jobId = :job_id",
+        ExpressionAttributeValues={':job_id': job_id}
+    )
+    logger.info(f"Started Textract job {job_id} with tag {job_tag} for {file_name}")
+
+    return {'JobId': job_id, 'JobTag': job_tag}
+
+
+async def resume_workflows(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Resume the Step Function task waiting on each completed Textract job. Records are
+    independent, so they are resumed concurrently.
+
+    Returns:
+        Dict[str, Any]: SQS partial batch response so only failed records are retried.
+    """
+    async def resume(record: Dict[str, Any]) -> bool:
+        try:
+            notification = parse_textract_notification(record)
+            lease = await run_sync(resume_workflow, notification)
+            await textract_jobs.release(lease)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to resume workflow for message {record.get('messageId')}: {str(e)}", exc_info=True)
+            return False
+
+    results = await asyncio.gather(*(resume(record) for record in records))
+    return {'batchItemFailures': [{'itemIdentifier': record.get('messageId')}
+                                  for record, succeeded in zip(records, results) if not succeeded]}
+
+
+def parse_textract_notification(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the Textract completion message from an SQS record. The SNS envelope is
+    unwrapped when the subscription does not use raw message delivery.
+    """
+    body = json.loads(record['body'])
+    if body.get('Type') == 'Notification' and 'Message' in body:
+        body = json.loads(body['Message'])
+    return body
+
+
+def resume_workflow(notification: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Send the job's outcome to the waiting task.
+
+    Returns:
+        Optional[Dict[str, Any]]: The Textract job slot lease taken when the job was started
+    """
+    job_id = notification['JobId']
+    job_tag = notification.get('JobTag')
+    status = notification['Status']
+    table = get_table(TEXTRACT_TASK_TOKEN_TABLE_NAME)
+
+    item = table.get_item(Key={'jobTag': job_tag}).get('Item') if job_tag else None
+    if not item:
+        logger.warning(f"No waiting workflow found for Textract job {job_id} (tag: {job_tag}). Ignoring notification.")
+        return None
+
+    try:
+        if status in ('SUCCEEDED', 'PARTIAL_SUCCESS'):
+            stepfunctions_client.send_task_success(
+                taskToken=item['taskToken'],
+                output=json.dumps({'JobId': job_id, 'JobStatus': status})
+            )
+        else:
+            stepfunctions_client.send_task_failure(
+                taskToken=item['taskToken'],
+                error='TextractJobFailed',
+                cause=f"Textract job {job_id} finished with status {status}"
+            )
+        logger.info(f"Resumed workflow for Textract job {job_id} with status {status}")
+    except ClientError as e:
+        # The execution already timed out or was stopped, so there is nothing left to resume
+        if e.response['Error']['Code'] in ('TaskTimedOut', 'TaskDoesNotExist', 'InvalidToken'):
+            logger.warning(f"Workflow for Textract job {job_id} can no longer be resumed: {str(e)}")
+        else:
+            raise
+
+    table.delete_item(Key={'jobTag': job_tag})
+    return item.get('lease')
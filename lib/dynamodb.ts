@@ -6,6 +6,10 @@ import * as backup from 'aws-cdk-lib/aws-backup';
 export class DynamoDBConstruct extends Construct {
     public readonly documentMetadataTable: dynamodb.TableV2;
     public readonly documentSoapTable: dynamodb.TableV2;
+    public readonly textractTaskTokenTable: dynamodb.TableV2;
+    public readonly extractionCacheTable: dynamodb.TableV2;
+    public readonly concurrencyLeaseTable: dynamodb.TableV2;
+    public readonly notificationDedupTable: dynamodb.TableV2;
 
     constructor(scope: Construct, id: string) {
         super(scope, id);
@@ -13,6 +17,10 @@ export class DynamoDBConstruct extends Construct {
         // Get the table names from environment variables
         const metadataTableName = process.env.DOCUMENT_METADATA_TABLE_NAME || 'sh-metadata-table';
         const soapTableName = process.env.DOCUMENT_SOAP_TABLE_NAME || 'sh-soap-table';
+        const textractTaskTokenTableName = process.env.TEXTRACT_TASK_TOKEN_TABLE_NAME || 'sh-textract-task-token-table';
+        const extractionCacheTableName = process.env.EXTRACTION_CACHE_TABLE_NAME || 'sh-extraction-cache-table';
+        const concurrencyLeaseTableName = process.env.CONCURRENCY_LEASE_TABLE_NAME || 'sh-concurrency-lease-table';
+        const notificationDedupTableName = process.env.NOTIFICATION_DEDUP_TABLE_NAME || 'sh-notification-dedup-table';
 
         // Create the DynamoDB tables with custom resource policies
         this.documentMetadataTable = new dynamodb.TableV2(this, 'sh-Document-Metadata-Table', {
@@ -41,6 +49,42 @@ export class DynamoDBConstruct extends Construct {
             timeToLiveAttribute: 'ttl',
         });
 
+        // Step Function task tokens waiting on Textract job completion, keyed by the Textract JobTag
+        this.textractTaskTokenTable = new dynamodb.TableV2(this, 'sh-Textract-Task-Token-Table', {
+            tableName: textractTaskTokenTableName,
+            partitionKey: { name: 'jobTag', type: dynamodb.AttributeType.STRING },
+            billing: dynamodb.Billing.onDemand(),
+            removalPolicy: cdk.RemovalPolicy.DESTROY,
+            timeToLiveAttribute: 'ttl',
+        });
+
+        // Bedrock extraction results keyed by a hash of the OCR text, document type, model and prompt version
+        this.extractionCacheTable = new dynamodb.TableV2(this, 'sh-Extraction-Cache-Table', {
+            tableName: extractionCacheTableName,
+            partitionKey: { name: 'cacheKey', type: dynamodb.AttributeType.STRING },
+            billing: dynamodb.Billing.onDemand(),
+            removalPolicy: cdk.RemovalPolicy.DESTROY,
+            timeToLiveAttribute: 'ttl',
+        });
+
+        // Concurrency slots for Textract jobs and Bedrock calls, leased with conditional writes across Lambda instances
+        this.concurrencyLeaseTable = new dynamodb.TableV2(this, 'sh-Concurrency-Lease-Table', {
+            tableName: concurrencyLeaseTableName,
+            partitionKey: { name: 'resource', type: dynamodb.AttributeType.STRING },
+            sortKey: { name: 'slot', type: dynamodb.AttributeType.NUMBER },
+            billing: dynamodb.Billing.onDemand(),
+            removalPolicy: cdk.RemovalPolicy.DESTROY,
+        });
+
+        // Short-lived claims on Salesforce notifications, so redelivered copies do not start a second workflow
+        this.notificationDedupTable = new dynamodb.TableV2(this, 'sh-Notification-Dedup-Table', {
+            tableName: notificationDedupTableName,
+            partitionKey: { name: 'dedupKey', type: dynamodb.AttributeType.STRING },
+            billing: dynamodb.Billing.onDemand(),
+            removalPolicy: cdk.RemovalPolicy.DESTROY,
+            timeToLiveAttribute: 'ttl',
+        });
+
         // Add attributes for the new fields
         this.documentSoapTable.addLocalSecondaryIndex({
             indexName: 'FileInfoIdIndex',
@@ -103,5 +147,15 @@ export class DynamoDBConstruct extends Construct {
             value: this.documentSoapTable.tableName,
             description: 'SOAP DynamoDB Table Name',
         });
+
+        new cdk.CfnOutput(this, 'TextractTaskTokenTableName', {
+            value: this.textractTaskTokenTable.tableName,
+            description: 'Textract Task Token DynamoDB Table Name',
+        });
+
+        new cdk.CfnOutput(this, 'ExtractionCacheTableName', {
+            value: this.extractionCacheTable.tableName,
+            description: 'Extraction Cache DynamoDB Table Name',
+        });
     }
 }
@@ -1,6 +1,6 @@
 import * as cdk from 'aws-cdk-lib';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
-import { PythonFunction } from '@aws-cdk/aws-lambda-python-alpha';
+import { PythonFunction, PythonLayerVersion } from '@aws-cdk/aws-lambda-python-alpha';
 import { Construct } from 'constructs';
 import * as dotenv from 'dotenv';
 import * as iam from 'aws-cdk-lib/aws-iam';
@@ -26,6 +26,10 @@ export interface LambdaConstructProps {
     bedrockModelId?: string;
     documentMetadataTableName: string;
     documentSoapTableName: string;
+    textractTaskTokenTableName: string;
+    extractionCacheTableName: string;
+    concurrencyLeaseTableName: string;
+    notificationDedupTableName: string;
     ibmAppConnect: {
         url: string;
         username: string;
@@ -44,11 +48,13 @@ export class LambdaConstruct extends Construct {
     private readonly region: string;
     private readonly account: string;
     private readonly role: iam.IRole;
+    private readonly sharedLayer: PythonLayerVersion;
 
     public readonly startWorkflowLambda: PythonFunction;
     public readonly documentExtractionLambda: PythonFunction;
     public readonly dataProcessingLambda: PythonFunction;
     public readonly ibmAppConnectNotificationLambda: PythonFunction;
+    public readonly textractCallbackLambda: PythonFunction;
 
     constructor(scope: Construct, id: string, props: LambdaConstructProps) {
         super(scope, id);
@@ -61,11 +67,23 @@ export class LambdaConstruct extends Construct {
         });
 
         const bedrockModelId = props.bedrockModelId || 'anthropic.claude-3-haiku-20240307-v1:0';
+        // Parameter Store entry sharing the DocRio OAuth token between extraction containers
+        const docRioTokenParameterName = process.env.DOC_RIO_TOKEN_PARAMETER_NAME || '/docrio/access-token';
+
+        // Shared Python code in src/ (the `common` package), available to every Lambda under /opt/python
+        this.sharedLayer = new PythonLayerVersion(this, 'SharedPythonLayer', {
+            entry: 'src',
+            compatibleRuntimes: [awsLambda.Runtime.PYTHON_3_11],
+            description: 'Shared Python code for the document processing Lambdas',
+        });
 
 
         this.startWorkflowLambda = this.createLambdaFunction('StartWorkflowLambda', 'start_workflow', props, {
             STATE_MACHINE_ARN: props.stepFunctionArn,
             DOCUMENT_SOAP_TABLE_NAME: props.documentSoapTableName,
+            NOTIFICATION_DEDUP_TABLE_NAME: props.notificationDedupTableName,
+            SOAP_STORAGE_MODE: process.env.SOAP_STORAGE_MODE || 'compressed',
+            SOAP_STORAGE_BUCKET_NAME: props.s3BucketNames.shlambdaOutputBucket,
             IBM_APPCONNECT_URL: props.ibmAppConnect.url,
             IBM_APPCONNECT_USERNAME: props.ibmAppConnect.username,
             IBM_APPCONNECT_PASSWORD: props.ibmAppConnect.password,
@@ -73,20 +91,34 @@ export class LambdaConstruct extends Construct {
 
         this.documentExtractionLambda = this.createLambdaFunction('DocumentExtractionLambda', 'extraction', props, {
             RAW_STAGING_BUCKET_NAME: props.s3BucketNames.shrawStagingBucket,
+            LAMBDA_OUTPUT_BUCKET_NAME: props.s3BucketNames.shlambdaOutputBucket,
             DOC_RIO_AUTH_URL: props.docRio.authUrl,
             DOC_RIO_API_URL: props.docRio.apiUrl,
             DOC_RIO_CLIENT_ID: props.docRio.clientId,
             DOC_RIO_CLIENT_SECRET: props.docRio.clientSecret,
+            DOC_RIO_TOKEN_PARAMETER_NAME: docRioTokenParameterName,
             IBM_APPCONNECT_URL: props.ibmAppConnect.url,
             IBM_APPCONNECT_USERNAME: props.ibmAppConnect.username,
             IBM_APPCONNECT_PASSWORD: props.ibmAppConnect.password,
         });
 
+        this.documentExtractionLambda.addToRolePolicy(new iam.PolicyStatement({
+            actions: ['ssm:GetParameter', 'ssm:PutParameter'],
+            resources: [`arn:aws:ssm:${this.region}:${this.account}:parameter/${docRioTokenParameterName.replace(/^\//, '')}`],
+        }));
+
         this.dataProcessingLambda = this.createLambdaFunction('DataProcessingLambda', 'processing', props, {
             DOCUMENT_METADATA_TABLE_NAME: props.documentMetadataTableName,
             RAW_STAGING_BUCKET_NAME: props.s3BucketNames.shrawStagingBucket,
             LAMBDA_OUTPUT_BUCKET_NAME: props.s3BucketNames.shlambdaOutputBucket,
+            TEXTRACT_OUTPUT_BUCKET_NAME: props.s3BucketNames.shtextractOutputBucket,
+            EXTRACTION_CACHE_TABLE_NAME: props.extractionCacheTableName,
+            CONCURRENCY_LEASE_TABLE_NAME: props.concurrencyLeaseTableName,
+            BEDROCK_CONCURRENCY_LIMIT: process.env.BEDROCK_CONCURRENCY_LIMIT || '10',
+            TEXTRACT_JOB_CONCURRENCY_LIMIT: process.env.TEXTRACT_JOB_CONCURRENCY_LIMIT || '50',
             BEDROCK_MODEL_ID: bedrockModelId,
+            // Optional per-document-type model escalation order (JSON); defaults to BEDROCK_MODEL_ID alone
+            BEDROCK_MODEL_LADDER: process.env.BEDROCK_MODEL_LADDER || '',
             IBM_APPCONNECT_URL: props.ibmAppConnect.url,
             IBM_APPCONNECT_USERNAME: props.ibmAppConnect.username,
             IBM_APPCONNECT_PASSWORD: props.ibmAppConnect.password,
@@ -98,6 +130,40 @@ export class LambdaConstruct extends Construct {
             IBM_APPCONNECT_PASSWORD: props.ibmAppConnect.password,
             DOCUMENT_METADATA_TABLE_NAME: props.documentMetadataTableName,
         });
+
+        // Textract publishes job completion to SNS, which is delivered to the callback Lambda through SQS
+        const textractCompletionTopic = new sns.Topic(this, 'TextractCompletionTopic', {
+            topicName: 'TextractJobCompletionTopic',
+        });
+
+        const textractNotificationRole = new iam.Role(this, 'TextractNotificationRole', {
+            assumedBy: new iam.ServicePrincipal('textract.amazonaws.com'),
+            description: 'Allows Textract to publish job completion notifications',
+        });
+        textractCompletionTopic.grantPublish(textractNotificationRole);
+
+        const textractCompletionQueue = new sqs.Queue(this, 'TextractCompletionQueue', {
+            queueName: 'TextractJobCompletionQueue',
+            visibilityTimeout: cdk.Duration.seconds(900),
+        });
+        textractCompletionTopic.addSubscription(new subscriptions.SqsSubscription(textractCompletionQueue));
+
+        this.textractCallbackLambda = this.createLambdaFunction('TextractCallbackLambda', 'textract_callback', props, {
+            TEXTRACT_TASK_TOKEN_TABLE_NAME: props.textractTaskTokenTableName,
+            TEXTRACT_OUTPUT_BUCKET_NAME: props.s3BucketNames.shtextractOutputBucket,
+            TEXTRACT_SNS_TOPIC_ARN: textractCompletionTopic.topicArn,
+            TEXTRACT_SNS_ROLE_ARN: textractNotificationRole.roleArn,
+            CONCURRENCY_LEASE_TABLE_NAME: props.concurrencyLeaseTableName,
+            TEXTRACT_JOB_CONCURRENCY_LIMIT: process.env.TEXTRACT_JOB_CONCURRENCY_LIMIT || '50',
+        });
+
+        this.textractCallbackLambda.addEventSource(new lambdaEventSources.SqsEventSource(textractCompletionQueue, {
+            reportBatchItemFailures: true,
+        }));
+        this.textractCallbackLambda.addToRolePolicy(new iam.PolicyStatement({
+            actions: ['iam:PassRole'],
+            resources: [textractNotificationRole.roleArn],
+        }));
         
         this.setupCommonConfigurations(props);
 
@@ -114,6 +180,7 @@ export class LambdaConstruct extends Construct {
             environment: environment,
             tracing: awsLambda.Tracing.ACTIVE,
             logRetention: logs.RetentionDays.ONE_WEEK,
+            layers: [this.sharedLayer],
         });
 
         // Add xray permissions for all lambdas
@@ -124,7 +191,7 @@ export class LambdaConstruct extends Construct {
 
         if (name === 'DataProcessingLambda') {
             lambda.addToRolePolicy(new iam.PolicyStatement({
-                actions: ['bedrock:*', 'textract:GetDocumentTextDetection', 'textract:StartDocumentTextDetection'],
+                actions: ['bedrock:*', 'textract:GetDocumentTextDetection', 'textract:StartDocumentTextDetection', 'textract:GetDocumentAnalysis', 'textract:AnalyzeDocument'],
                 resources: ['*'],
             }));
 
@@ -132,6 +199,18 @@ export class LambdaConstruct extends Construct {
                 actions: ['dynamodb:GetItem', 'dynamodb:PutItem'],
                 resources: [`arn:aws:dynamodb:${this.region}:${this.account}:table/${props.documentMetadataTableName}`],
             }));
+
+            lambda.addToRolePolicy(new iam.PolicyStatement({
+                actions: ['dynamodb:GetItem', 'dynamodb:PutItem'],
+                resources: [`arn:aws:dynamodb:${this.region}:${this.account}:table/${props.extractionCacheTableName}`],
+            }));
+        }
+
+        if (name === 'DataProcessingLambda' || name === 'TextractCallbackLambda') {
+            lambda.addToRolePolicy(new iam.PolicyStatement({
+                actions: ['dynamodb:Query', 'dynamodb:UpdateItem'],
+                resources: [`arn:aws:dynamodb:${this.region}:${this.account}:table/${props.concurrencyLeaseTableName}`],
+            }));
         }
 
         if (name === 'IBMAppConnectNotificationLambda') {
@@ -141,12 +220,34 @@ export class LambdaConstruct extends Construct {
             }));
         }
 
+        if (name === 'TextractCallbackLambda') {
+            lambda.addToRolePolicy(new iam.PolicyStatement({
+                actions: ['textract:StartDocumentAnalysis'],
+                resources: ['*'],
+            }));
+
+            lambda.addToRolePolicy(new iam.PolicyStatement({
+                actions: ['dynamodb:GetItem', 'dynamodb:PutItem', 'dynamodb:UpdateItem', 'dynamodb:DeleteItem'],
+                resources: [`arn:aws:dynamodb:${this.region}:${this.account}:table/${props.textractTaskTokenTableName}`],
+            }));
+
+            lambda.addToRolePolicy(new iam.PolicyStatement({
+                actions: ['states:SendTaskSuccess', 'states:SendTaskFailure'],
+                resources: [props.stepFunctionArn],
+            }));
+        }
+
         if (name === 'StartWorkflowLambda') {
             lambda.addToRolePolicy(new iam.PolicyStatement({
-                actions: ['dynamodb:GetItem', 'dynamodb:PutItem'],
+                actions: ['dynamodb:GetItem', 'dynamodb:PutItem', 'dynamodb:BatchWriteItem'],
                 resources: [`arn:aws:dynamodb:${this.region}:${this.account}:table/${props.documentSoapTableName}`],
             }));
 
+            lambda.addToRolePolicy(new iam.PolicyStatement({
+                actions: ['dynamodb:PutItem', 'dynamodb:UpdateItem'],
+                resources: [`arn:aws:dynamodb:${this.region}:${this.account}:table/${props.notificationDedupTableName}`],
+            }));
+
             lambda.addToRolePolicy(new iam.PolicyStatement({
                 actions: ['states:StartExecution'],
                 resources: [props.stepFunctionArn],
@@ -191,7 +292,12 @@ export class LambdaConstruct extends Construct {
                 visibilityTimeout: cdk.Duration.seconds(900),
             });
 
-            this.startWorkflowLambda.addEventSource(new lambdaEventSources.SqsEventSource(startWorkflowDLQ));
+            // Replays failed requests in bulk; only the messages that fail again are retried
+            this.startWorkflowLambda.addEventSource(new lambdaEventSources.SqsEventSource(startWorkflowDLQ, {
+                batchSize: 10,
+                maxBatchingWindow: cdk.Duration.seconds(5),
+                reportBatchItemFailures: true,
+            }));
             this.startWorkflowLambda.addToRolePolicy(new iam.PolicyStatement({
                 actions: ['sqs:SendMessage'],
                 resources: [startWorkflowDLQ.queueArn],
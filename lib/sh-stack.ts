@@ -39,6 +39,10 @@ export class SHStack extends cdk.Stack {
                 },
                 documentMetadataTableName: process.env.DOCUMENT_METADATA_TABLE_NAME!,
                 documentSoapTableName: process.env.DOCUMENT_SOAP_TABLE_NAME!,
+                textractTaskTokenTableName: dynamoDB.textractTaskTokenTable.tableName,
+                extractionCacheTableName: dynamoDB.extractionCacheTable.tableName,
+                concurrencyLeaseTableName: dynamoDB.concurrencyLeaseTable.tableName,
+                notificationDedupTableName: dynamoDB.notificationDedupTable.tableName,
                 ibmAppConnect: {
                     url: process.env.IBM_APPCONNECT_URL!,
                     username: process.env.IBM_APPCONNECT_USERNAME!,
@@ -59,6 +63,7 @@ export class SHStack extends cdk.Stack {
                 startWorkflowLambda: lambdas.startWorkflowLambda,
                 extractionLambda: lambdas.documentExtractionLambda,
                 processingLambda: lambdas.dataProcessingLambda,
+                textractCallbackLambda: lambdas.textractCallbackLambda,
                 notifyIBMAppConnectLambda: lambdas.ibmAppConnectNotificationLambda,
             });
 
@@ -15,6 +15,7 @@ export interface StepFunctionProps {
     extractionLambda: lambda.IFunction;
     processingLambda: lambda.IFunction;
     notifyIBMAppConnectLambda: lambda.IFunction;
+    textractCallbackLambda: lambda.IFunction;
 }
 
 export class StepFunction extends Construct {
@@ -25,6 +26,9 @@ export class StepFunction extends Construct {
 
         const s3Buckets = new S3BucketsConstruct(this, 'S3Buckets');
 
+        // 'callback' waits on a task token resumed by Textract's SNS notification, 'poll' checks the job every 30 seconds
+        const textractCompletionMode = process.env.TEXTRACT_COMPLETION_MODE || 'callback';
+
         // Define a single Fail state
         const jobFailed = new stepfunctions.Fail(this, 'JobFailed', {
             comment: 'Job processing failed'
@@ -80,6 +84,29 @@ export class StepFunction extends Construct {
             resultPath: '$.textractJobStatus',
         });
 
+        const startTextractWithCallbackTask = new tasks.LambdaInvoke(this, 'StartTextractWithCallbackTask', {
+            lambdaFunction: props.textractCallbackLambda,
+            integrationPattern: sfn.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+            payload: sfn.TaskInput.fromObject({
+                taskToken: sfn.JsonPath.taskToken,
+                bucket_name: sfn.JsonPath.stringAt('$.body.bucket_name'),
+                file_name: sfn.JsonPath.stringAt('$.body.file_name'),
+            }),
+            resultPath: '$.textractJobId',
+            taskTimeout: sfn.Timeout.duration(cdk.Duration.hours(2)),
+            retryOnServiceExceptions: true,
+        }).addRetry({
+            // Every Textract job slot was taken; wait for running jobs to finish
+            errors: ['LeaseUnavailable'],
+            interval: cdk.Duration.seconds(30),
+            backoffRate: 1.5,
+            maxDelay: cdk.Duration.minutes(5),
+            maxAttempts: 30,
+            jitterStrategy: sfn.JitterType.FULL,
+        }).addCatch(jobFailed, {
+            resultPath: '$.error'
+        });
+
         const prepareSuccessOutput = new stepfunctions.Pass(this, 'PrepareSuccessOutput', {
             parameters: {
                 'processingResult': {
@@ -88,7 +115,78 @@ export class StepFunction extends Construct {
                     'documentId': stepfunctions.JsonPath.stringAt('$.body.documentId'),
                     'fileInfoId': stepfunctions.JsonPath.stringAt('$.body.fileInfoId'),
                     'bucket_name': stepfunctions.JsonPath.stringAt('$.body.bucket_name'),
-                    'file_name': stepfunctions.JsonPath.stringAt('$.body.file_name')
+                    'file_name': stepfunctions.JsonPath.stringAt('$.body.file_name'),
+                    'contentHash': stepfunctions.JsonPath.stringAt('$.body.contentHash'),
+                    'unchanged': stepfunctions.JsonPath.objectAt('$.body.unchanged'),
+                    'priorArtifacts': stepfunctions.JsonPath.objectAt('$.body.priorArtifacts')
+                }
+            }
+        });
+
+        // OCR text is persisted per unique file content, so a file that was already OCR'd skips Textract entirely
+        const lookupOcrArtifactTask = new stepfunctionsTasks.CallAwsService(this, 'LookupOcrArtifactTask', {
+            service: 's3',
+            action: 'listObjectsV2',
+            parameters: {
+                Bucket: s3Buckets.shlambdaOutputBucketName,
+                Prefix: stepfunctions.JsonPath.format('ocr-text/{}.txt.gz', stepfunctions.JsonPath.stringAt('$.body.contentHash')),
+                MaxKeys: 1
+            },
+            iamAction: 's3:ListBucket',
+            iamResources: [`arn:aws:s3:::${s3Buckets.shlambdaOutputBucketName}`],
+            resultSelector: {
+                'KeyCount': stepfunctions.JsonPath.numberAt('$.KeyCount')
+            },
+            resultPath: '$.ocrArtifact',
+        });
+
+        const prepareCachedOcrOutput = new stepfunctions.Pass(this, 'PrepareCachedOcrOutput', {
+            parameters: {
+                'processingResult': {
+                    'documentType': stepfunctions.JsonPath.stringAt('$.body.documentType'),
+                    'documentId': stepfunctions.JsonPath.stringAt('$.body.documentId'),
+                    'fileInfoId': stepfunctions.JsonPath.stringAt('$.body.fileInfoId'),
+                    'bucket_name': stepfunctions.JsonPath.stringAt('$.body.bucket_name'),
+                    'file_name': stepfunctions.JsonPath.stringAt('$.body.file_name'),
+                    'contentHash': stepfunctions.JsonPath.stringAt('$.body.contentHash'),
+                    'unchanged': stepfunctions.JsonPath.objectAt('$.body.unchanged'),
+                    'priorArtifacts': stepfunctions.JsonPath.objectAt('$.body.priorArtifacts')
+                }
+            }
+        });
+
+        // Images and PDFs of a known, bounded page count are OCR'd synchronously by the processing Lambda,
+        // so no Textract job is started or waited for
+        const prepareSyncOcrOutput = new stepfunctions.Pass(this, 'PrepareSyncOcrOutput', {
+            parameters: {
+                'processingResult': {
+                    'documentType': stepfunctions.JsonPath.stringAt('$.body.documentType'),
+                    'documentId': stepfunctions.JsonPath.stringAt('$.body.documentId'),
+                    'fileInfoId': stepfunctions.JsonPath.stringAt('$.body.fileInfoId'),
+                    'bucket_name': stepfunctions.JsonPath.stringAt('$.body.bucket_name'),
+                    'file_name': stepfunctions.JsonPath.stringAt('$.body.file_name'),
+                    'contentHash': stepfunctions.JsonPath.stringAt('$.body.contentHash'),
+                    'contentType': stepfunctions.JsonPath.stringAt('$.body.contentType'),
+                    'ocrRoute': stepfunctions.JsonPath.stringAt('$.body.ocrRoute'),
+                    'unchanged': stepfunctions.JsonPath.objectAt('$.body.unchanged'),
+                    'priorArtifacts': stepfunctions.JsonPath.objectAt('$.body.priorArtifacts')
+                }
+            }
+        });
+
+        // A sync-routed document the processing Lambda could not OCR page by page (more pages than the hint said,
+        // unreadable PDF, rejected by Textract) goes back through a Textract job, restoring the $.body the job reads
+        const prepareOcrFallback = new stepfunctions.Pass(this, 'PrepareOcrFallback', {
+            parameters: {
+                'body': {
+                    'documentType': stepfunctions.JsonPath.stringAt('$.processingResult.documentType'),
+                    'documentId': stepfunctions.JsonPath.stringAt('$.processingResult.documentId'),
+                    'fileInfoId': stepfunctions.JsonPath.stringAt('$.processingResult.fileInfoId'),
+                    'bucket_name': stepfunctions.JsonPath.stringAt('$.processingResult.bucket_name'),
+                    'file_name': stepfunctions.JsonPath.stringAt('$.processingResult.file_name'),
+                    'contentHash': stepfunctions.JsonPath.stringAt('$.processingResult.contentHash'),
+                    'unchanged': stepfunctions.JsonPath.objectAt('$.processingResult.unchanged'),
+                    'priorArtifacts': stepfunctions.JsonPath.objectAt('$.processingResult.priorArtifacts')
                 }
             }
         });
@@ -98,6 +196,17 @@ export class StepFunction extends Construct {
             outputPath: '$.Payload',
             inputPath: '$',
             retryOnServiceExceptions: true,
+        }).addRetry({
+            // Every Bedrock or Textract job slot was taken; wait for other documents to finish
+            errors: ['LeaseUnavailable'],
+            interval: cdk.Duration.seconds(30),
+            backoffRate: 1.5,
+            maxDelay: cdk.Duration.minutes(5),
+            maxAttempts: 30,
+            jitterStrategy: sfn.JitterType.FULL,
+        }).addCatch(prepareOcrFallback, {
+            errors: ['SyncOcrUnsuitable'],
+            resultPath: '$.ocrFallback'
         }).addCatch(jobFailed, {
             resultPath: '$.error'
         });
@@ -110,21 +219,41 @@ export class StepFunction extends Construct {
             resultPath: '$.error'
         });
 
+        const processingChain = processingTask
+            .next(notifyIBMAppConnectTask)
+            .next(new stepfunctions.Choice(this, 'WasNotifyIBMAppConnectSuccess')
+                .when(stepfunctions.Condition.numberEquals('$.statusCode', 200), new stepfunctions.Succeed(this, 'Success'))
+                .otherwise(jobFailed));
+        const processDocument = prepareSuccessOutput.next(processingChain);
+
+        const runTextract = textractCompletionMode === 'poll'
+            ? startTextractTask
+                .next(waitForTextractJob)
+                .next(getTextractJobStatus)
+                .next(new stepfunctions.Choice(this, 'CheckTextractJobStatus')
+                    .when(stepfunctions.Condition.stringEquals('$.textractJobStatus.JobStatus', 'SUCCEEDED'), processDocument)
+                    .when(stepfunctions.Condition.stringEquals('$.textractJobStatus.JobStatus', 'FAILED'), jobFailed)
+                    .otherwise(waitForTextractJob))
+            : startTextractWithCallbackTask
+                .next(processDocument);
+        prepareOcrFallback.next(runTextract);
+
         // Define the main chain
         const definition = startWorkflowTask
             .next(documentExtractionTask)
-            .next(startTextractTask)
-            .next(waitForTextractJob)
-            .next(getTextractJobStatus)
-            .next(new stepfunctions.Choice(this, 'CheckTextractJobStatus')
-                .when(stepfunctions.Condition.stringEquals('$.textractJobStatus.JobStatus', 'SUCCEEDED'), prepareSuccessOutput
-                    .next(processingTask)
-                    .next(notifyIBMAppConnectTask)
-                    .next(new stepfunctions.Choice(this, 'WasNotifyIBMAppConnectSuccess')
-                        .when(stepfunctions.Condition.numberEquals('$.statusCode', 200), new stepfunctions.Succeed(this, 'Success'))
-                        .otherwise(jobFailed)))
-                .when(stepfunctions.Condition.stringEquals('$.textractJobStatus.JobStatus', 'FAILED'), jobFailed)
-                .otherwise(waitForTextractJob));
+            .next(lookupOcrArtifactTask)
+            .next(new stepfunctions.Choice(this, 'OcrArtifactExists')
+                .when(stepfunctions.Condition.numberGreaterThan('$.ocrArtifact.KeyCount', 0), prepareCachedOcrOutput
+                    .next(processingChain))
+                .otherwise(new stepfunctions.Choice(this, 'OcrRoute')
+                    .when(stepfunctions.Condition.and(
+                        stepfunctions.Condition.isPresent('$.body.ocrRoute'),
+                        stepfunctions.Condition.or(
+                            stepfunctions.Condition.stringEquals('$.body.ocrRoute', 'sync'),
+                            stepfunctions.Condition.stringEquals('$.body.ocrRoute', 'sharded')
+                        )
+                    ), prepareSyncOcrOutput.next(processingChain))
+                    .otherwise(runTextract)));
 
         // Create an explicit IAM role for Textract
         const textractRole = new iam.Role(this, 'TextractServiceRole', {
@@ -0,0 +1,70 @@
+import sys
+import argparse
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Any, Iterator
+
+# textract_text has no AWS dependencies, so it can be imported straight from the Lambda source
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'lambda' / 'processing'))
+from textract_text import combine_textract_results, PAGE_SEPARATOR  # noqa: E402
+
+def synthetic_blocks(pages: int, lines_per_page: int = 50, words_per_line: int = 8) -> Iterator[Dict[str, Any]]:
+    """
+    Generate a synthetic Textract analysis result one block at a time, shaped like the real
+    output (PAGE, LINE and WORD blocks with geometry and relationships).
+    """
+    geometry = {
+        "BoundingBox": {"Width": 0.5, "Height": 0.01, "Left": 0.1, "Top": 0.1},
+        "Polygon": [{"X": 0.1, "Y": 0.1}, {"X": 0.6, "Y": 0.1}, {"X": 0.6, "Y": 0.11}, {"X": 0.1, "Y": 0.11}]
+    }
+    for page in range(1, pages + 1):
+        line_ids = [f"p{page}-l{line}" for line in range(lines_per_page)]
+        yield {"BlockType": "PAGE", "Id": f"p{page}", "Page": page, "Geometry": geometry,
+               "Relationships": [{"Type": "CHILD", "Ids": line_ids}]}
+        for line in range(lines_per_page):
+            word_ids = [f"p{page}-l{line}-w{word}" for word in range(words_per_line)]
+            yield {"BlockType": "LINE", "Id": line_ids[line], "Page": page, "Confidence": 99.1,
+                   "Text": " ".join(f"word{word}" for word in range(words_per_line)), "Geometry": geometry,
+                   "Relationships": [{"Type": "CHILD", "Ids": word_ids}]}
+            for word_index, word_id in enumerate(word_ids):
+                yield {"BlockType": "WORD", "Id": word_id, "Page": page, "Confidence": 99.1,
+                       "Text": f"word{word_index}", "TextType": "PRINTED", "Geometry": geometry}
+
+def measure(pages: int, materialize: bool) -> int:
+    tracemalloc.start()
+    blocks = synthetic_blocks(pages)
+    if materialize:
+        blocks = list(blocks)
+    text = combine_textract_results(blocks, PAGE_SEPARATOR)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The combined text itself is the output, not pipeline overhead
+    return peak - sys.getsizeof(text)
+
+def main():
+    """
+    Memory regression check for the streaming Textract block pipeline.
+
+    Usage:
+    python scripts/benchmarks/textract_memory_check.py [--pages 1000] [--budget-mb 8]
+    """
+    parser = argparse.ArgumentParser(description='Check peak memory of combine_textract_results on a synthetic document')
+    parser.add_argument('--pages', type=int, default=1000, help='Number of synthetic pages')
+    parser.add_argument('--budget-mb', type=float, default=8.0, help='Maximum allowed pipeline overhead in MB')
+    parser.add_argument('--compare', action='store_true', help='Also measure the materialized block list for reference')
+    args = parser.parse_args()
+
+    streaming_peak = measure(args.pages, materialize=False)
+    print(f"Streaming pipeline peak over {args.pages} pages: {streaming_peak / 1024 / 1024:.1f} MB")
+
+    if args.compare:
+        list_peak = measure(args.pages, materialize=True)
+        print(f"Materialized block list peak over {args.pages} pages: {list_peak / 1024 / 1024:.1f} MB")
+
+    if streaming_peak > args.budget_mb * 1024 * 1024:
+        print(f"FAIL: peak exceeds the {args.budget_mb} MB budget")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import random
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from aiohttp import web
+
+def create_app(latency: float, fail_rate: float, fail_status: int) -> web.Application:
+    """
+    A local stand-in for the IBM AppConnect Treatment API, for testing status publishing and
+    the final notification without touching Salesforce.
+
+    PUT /Treatment_API/Treatment/{Id} answers like AppConnect after an optional delay, or fails
+    with fail_status for a fraction of requests. Every request received is recorded and can be
+    read back with GET /_requests (and cleared with DELETE /_requests).
+
+    Usage:
+    python fake_appconnect.py [--port 8080] [--latency 0.5] [--fail-rate 0.2] [--fail-status 503]
+    then point the Lambdas at it, for example:
+    IBM_APPCONNECT_URL=http://localhost:8080 IBM_APPCONNECT_USERNAME=test IBM_APPCONNECT_PASSWORD=test
+    """
+    received = []
+
+    async def update_treatment(request: web.Request) -> web.Response:
+        payload = await request.json()
+        record = {
+            "receivedAt": datetime.now(timezone.utc).isoformat(),
+            "id": request.match_info['id'],
+            "authorization": request.headers.get('Authorization'),
+            "payload": payload
+        }
+        received.append(record)
+        print(f"{record['receivedAt']} PUT {record['id']}: {payload.get('Document_Extraction_Status__c')}")
+
+        if latency:
+            await asyncio.sleep(latency)
+        if not request.headers.get('Authorization', '').startswith('Basic '):
+            return web.json_response({"error": "Unauthorized"}, status=401)
+        if random.random() < fail_rate:
+            return web.json_response({"error": "Simulated failure"}, status=fail_status)
+        return web.json_response({"Id": request.match_info['id'], "success": True})
+
+    async def list_requests(request: web.Request) -> web.Response:
+        return web.json_response(received)
+
+    async def clear_requests(request: web.Request) -> web.Response:
+        received.clear()
+        return web.json_response({"cleared": True})
+
+    app = web.Application()
+    app.router.add_put('/Treatment_API/Treatment/{id}', update_treatment)
+    app.router.add_get('/_requests', list_requests)
+    app.router.add_delete('/_requests', clear_requests)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake IBM AppConnect Treatment API locally.")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering each request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests (0-1) answered with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=503, help="HTTP status returned for simulated failures")
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.latency, args.fail_rate, args.fail_status), port=args.port)
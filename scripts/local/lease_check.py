@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from common.leases import ConcurrencyGovernor, LeaseUnavailable
+
+
+def create_lease_table(table_name: str, endpoint_url: str) -> None:
+    """
+    Create the lease table (same keys as the CDK table) when it does not exist yet.
+    """
+    client = boto3.client('dynamodb', endpoint_url=endpoint_url)
+    if table_name in client.list_tables()['TableNames']:
+        return
+    client.create_table(
+        TableName=table_name,
+        KeySchema=[
+            {'AttributeName': 'resource', 'KeyType': 'HASH'},
+            {'AttributeName': 'slot', 'KeyType': 'RANGE'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'resource', 'AttributeType': 'S'},
+            {'AttributeName': 'slot', 'AttributeType': 'N'},
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    client.get_waiter('table_exists').wait(TableName=table_name)
+
+
+async def run_contention(table_name: str, workers: int, limit: int, hold: float, timeout: float) -> None:
+    """
+    Start `workers` holders competing for `limit` slots, each holding a slot for `hold` seconds,
+    and report the most holders seen at once (never more than the limit).
+    """
+    resource = f"lease-check-{int(time.time())}"
+    governor = ConcurrencyGovernor(resource, limit, lease_seconds=60, table_name=table_name, acquire_timeout=timeout)
+    holding = 0
+    peak = 0
+    unavailable = 0
+
+    async def worker() -> None:
+        nonlocal holding, peak, unavailable
+        try:
+            async with governor.slot():
+                holding += 1
+                peak = max(peak, holding)
+                await asyncio.sleep(hold)
+                holding -= 1
+        except LeaseUnavailable:
+            unavailable += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed = time.monotonic() - started
+    print(f"{workers} workers, {limit} slots: peak {peak} holders, {unavailable} gave up, {elapsed:.1f}s "
+          f"(ideal {workers / limit * hold:.1f}s)")
+    if peak > limit:
+        raise SystemExit(f"More holders than slots: {peak} > {limit}")
+
+
+async def run_expiry(table_name: str) -> None:
+    """
+    A holder that never releases (a crashed Lambda) loses its slot once the lease expires.
+    """
+    resource = f"lease-expiry-{int(time.time())}"
+    crashed = ConcurrencyGovernor(resource, 1, lease_seconds=2, table_name=table_name, acquire_timeout=0)
+    await crashed.acquire()
+    waiting = ConcurrencyGovernor(resource, 1, lease_seconds=60, table_name=table_name, acquire_timeout=10)
+    started = time.monotonic()
+    lease = await waiting.acquire()
+    print(f"Expired lease taken over after {time.monotonic() - started:.1f}s")
+    await waiting.release(lease)
+
+
+def main():
+    """
+    Exercise the concurrency leases against a local DynamoDB stand-in.
+
+    Usage:
+    docker run -p 8000:8000 amazon/dynamodb-local
+    DYNAMODB_ENDPOINT_URL=http://localhost:8000 AWS_DEFAULT_REGION=us-east-1 \\
+        AWS_ACCESS_KEY_ID=local AWS_SECRET_ACCESS_KEY=local python lease_check.py [--workers 50] [--limit 5]
+
+    The Lambdas use the same stand-in when DYNAMODB_ENDPOINT_URL and CONCURRENCY_LEASE_TABLE_NAME are set.
+    """
+    parser = argparse.ArgumentParser(description="Check the DynamoDB concurrency leases against DynamoDB Local")
+    parser.add_argument('--table', default=os.environ.get('CONCURRENCY_LEASE_TABLE_NAME', 'sh-concurrency-lease-table'))
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument('--hold', type=float, default=0.5, help="Seconds each worker holds its slot")
+    parser.add_argument('--timeout', type=float, default=60, help="Acquire timeout per worker")
+    args = parser.parse_args()
+
+    endpoint_url = os.environ.get('DYNAMODB_ENDPOINT_URL')
+    if not endpoint_url:
+        raise SystemExit("Set DYNAMODB_ENDPOINT_URL to the local DynamoDB endpoint")
+
+    create_lease_table(args.table, endpoint_url)
+    asyncio.run(run_contention(args.table, args.workers, args.limit, args.hold, args.timeout))
+    asyncio.run(run_expiry(args.table))
+
+
+if __name__ == "__main__":
+    main()
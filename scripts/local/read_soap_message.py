@@ -0,0 +1,43 @@
+import sys
+import argparse
+from pathlib import Path
+import boto3
+from boto3.dynamodb.conditions import Key
+
+# The shared Lambda layer code, so envelopes are decoded exactly as the Lambdas store them
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+from common.soap_storage import read_soap_message
+
+def print_soap_messages(table_name: str, document_id: str, limit: int) -> None:
+    """
+    Print the SOAP envelopes stored for a Salesforce record, newest first, whether they were
+    stored inline, zlib-compressed or in S3.
+
+    Usage:
+    python read_soap_message.py <document_id> [--table sh-soap-table] [--limit 1]
+    for example:
+    python read_soap_message.py a32TV000000n0lFYAQ --limit 3
+    """
+    table = boto3.resource('dynamodb').Table(table_name)
+    response = table.query(
+        KeyConditionExpression=Key('id').eq(document_id),
+        ScanIndexForward=False,
+        Limit=limit
+    )
+    items = response.get('Items', [])
+    if not items:
+        print(f"No SOAP messages stored for {document_id}")
+        return
+
+    for item in items:
+        print(f"--- {item['id']} @ {item['timestamp']} ({item.get('document_type')}, file {item.get('file_info_id')})")
+        print(read_soap_message(item))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the stored SOAP envelopes for a Salesforce record.")
+    parser.add_argument("document_id", help="The Salesforce record Id (sf:Id)")
+    parser.add_argument("--table", default="sh-soap-table", help="The SOAP DynamoDB table name")
+    parser.add_argument("--limit", type=int, default=1, help="How many of the most recent messages to print")
+    args = parser.parse_args()
+
+    print_soap_messages(args.table, args.document_id, args.limit)
@@ -0,0 +1,82 @@
+import json
+import uuid
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+def generate_notification_event(job_id: str, job_tag: str, status: str, file_name: str) -> str:
+    """
+    Generate an SQS event carrying a Textract job completion notification, wrapped in the
+    SNS envelope exactly as TextractJobCompletionQueue delivers it to the TextractCallbackLambda.
+    This stands in for Textract when testing the callback flow locally.
+
+    Args:
+        job_id (str): The Textract job ID.
+        job_tag (str): The JobTag the callback Lambda used when starting the job.
+        status (str): The job status to report (SUCCEEDED, FAILED, ERROR or PARTIAL_SUCCESS).
+        file_name (str): The document key in the raw staging bucket.
+
+    Returns:
+        str: The generated JSON string.
+
+    Usage:
+    python generate_textract_notification.py <job_id> <job_tag> [--status SUCCEEDED] [--file-name <file_name>]
+    for example:
+    python generate_textract_notification.py 1a2b3c4d sfn-0f1e2d3c4b5a69788796a5b4c3d2e1f0 --status SUCCEEDED
+    """
+    timestamp = datetime.now(timezone.utc)
+    textract_message = {
+        "JobId": job_id,
+        "Status": status,
+        "API": "StartDocumentAnalysis",
+        "JobTag": job_tag,
+        "Timestamp": int(timestamp.timestamp() * 1000),
+        "DocumentLocation": {
+            "S3ObjectName": file_name,
+            "S3Bucket": "sh-raw-staging"
+        }
+    }
+
+    sns_envelope = {
+        "Type": "Notification",
+        "MessageId": str(uuid.uuid4()),
+        "TopicArn": "arn:aws:sns:us-east-1:026090522987:TextractJobCompletionTopic",
+        "Message": json.dumps(textract_message),
+        "Timestamp": timestamp.isoformat()
+    }
+
+    event = {
+        "Records": [
+            {
+                "messageId": str(uuid.uuid4()),
+                "receiptHandle": "local-receipt-handle",
+                "body": json.dumps(sns_envelope),
+                "attributes": {},
+                "messageAttributes": {},
+                "eventSource": "aws:sqs",
+                "eventSourceARN": "arn:aws:sqs:us-east-1:026090522987:TextractJobCompletionQueue",
+                "awsRegion": "us-east-1"
+            }
+        ]
+    }
+
+    return json.dumps(event, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a Textract completion notification event for TextractCallbackLambda')
+    parser.add_argument('job_id', help='Textract Job ID')
+    parser.add_argument('job_tag', help='Textract JobTag returned when the job was started')
+    parser.add_argument('--status', default='SUCCEEDED', help='Job status to report')
+    parser.add_argument('--file-name', default='a2VTV000000nmwL2AQ.pdf', help='Document key in the raw staging bucket')
+    args = parser.parse_args()
+
+    event_json = generate_notification_event(args.job_id, args.job_tag, args.status, args.file_name)
+
+    output_path = Path('event-and-env-vars/textract_callback') / f"event-notification-{args.status.lower()}.json"
+    with open(output_path, 'w') as f:
+        f.write(event_json)
+
+    print(f"Event JSON file generated: {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+sam local invoke "TextractCallbackLambda" \
+    -e ./event-and-env-vars/textract_callback/event.json \
+    -n ./event-and-env-vars/textract_callback/event-vars.json \
+    -t ./cdk.out/shulmanStack.template.json \
+    --profile shulman-hill
@@ -0,0 +1,3 @@
+"""
+Shared code for the document processing Lambdas, deployed as a Lambda layer (importable as `common`).
+"""
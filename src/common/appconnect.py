@@ -0,0 +1,117 @@
+import os
+import json
+import asyncio
+import logging
+import aiohttp
+from base64 import b64encode
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+APPCONNECT_TOTAL_TIMEOUT_SECONDS = float(os.environ.get('APPCONNECT_TOTAL_TIMEOUT_SECONDS', '30'))
+APPCONNECT_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('APPCONNECT_CONNECT_TIMEOUT_SECONDS', '5'))
+# Connections kept open to AppConnect, and how long an idle one is kept for reuse
+APPCONNECT_CONNECTION_LIMIT = int(os.environ.get('APPCONNECT_CONNECTION_LIMIT', '10'))
+APPCONNECT_KEEPALIVE_SECONDS = float(os.environ.get('APPCONNECT_KEEPALIVE_SECONDS', '60'))
+
+
+class AppConnectError(Exception):
+    """
+    AppConnect answered with a status other than 200/201.
+    """
+
+    def __init__(self, status: int, response_text: str):
+        super().__init__(f"Failed to notify IBM AppConnect. Status: {status}, Response: {response_text}")
+        self.status = status
+        self.response_text = response_text
+
+
+class AppConnectClient:
+    """
+    Client for the AppConnect Treatment API.
+
+    The HTTP session is kept at module scope, so warm Lambda invocations reuse its pooled
+    keep-alive connections instead of opening a new TCP+TLS connection for every status update.
+    The session is tied to an event loop, so it is recreated when the loop changes or the session
+    was closed.
+    """
+
+    def __init__(self, base_url: str, username: str, password: str):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'Authorization': f'Basic {b64encode(f"{username}:{password}".encode()).decode()}'
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=APPCONNECT_CONNECTION_LIMIT,
+                    keepalive_timeout=APPCONNECT_KEEPALIVE_SECONDS,
+                    ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=APPCONNECT_TOTAL_TIMEOUT_SECONDS,
+                    connect=APPCONNECT_CONNECT_TIMEOUT_SECONDS
+                ),
+                headers=self.headers
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def update_treatment(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        PUT a Treatment record update (fields keyed by their Salesforce API names, including Id).
+
+        Returns:
+            Dict[str, Any]: The AppConnect response body
+
+        Raises:
+            AppConnectError: If AppConnect does not answer 200/201
+            aiohttp.ClientError, asyncio.TimeoutError: On connection failures and timeouts
+        """
+        url = f"{self.base_url}/Treatment_API/Treatment/{payload['Id']}"
+        logger.info(f"IBM_APPCONNECT_URL: {url}")
+        async with self._get_session().put(url, data=json.dumps(payload)) as response:
+            response_text = await response.text()
+            logger.info(f"IBM AppConnect response: {response_text}")
+            if response.status not in (200, 201):
+                raise AppConnectError(response.status, response_text)
+            return json.loads(response_text)
+
+    async def update_status(self, file_info_id: str, document_id: str, status: str) -> Dict[str, Any]:
+        """
+        Update the Document Extraction Status shown on the Salesforce record.
+        """
+        return await self.update_treatment({
+            "Id": document_id,
+            "File_Info_Id__c": file_info_id,
+            "Document_Extraction_Status__c": status
+        })
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+_client: Optional[AppConnectClient] = None
+
+
+def get_appconnect_client() -> AppConnectClient:
+    """
+    The container-wide AppConnect client, configured from IBM_APPCONNECT_URL,
+    IBM_APPCONNECT_USERNAME and IBM_APPCONNECT_PASSWORD.
+    """
+    global _client
+    if _client is None:
+        _client = AppConnectClient(
+            os.environ['IBM_APPCONNECT_URL'],
+            os.environ['IBM_APPCONNECT_USERNAME'],
+            os.environ['IBM_APPCONNECT_PASSWORD']
+        )
+    return _client
@@ -0,0 +1,94 @@
+import os
+import json
+from botocore.exceptions import ClientError
+from typing import Dict, Any, Optional
+
+from common.aws import get_client
+
+# Where the processing stage keeps what it derives from a staged source file
+OCR_ARTIFACT_BUCKET_NAME = os.environ.get('OCR_ARTIFACT_BUCKET_NAME', os.environ.get('LAMBDA_OUTPUT_BUCKET_NAME'))
+OCR_ARTIFACT_PREFIX = os.environ.get('OCR_ARTIFACT_PREFIX', 'ocr-text/')
+ANALYSIS_BUCKET_NAME = os.environ.get('LAMBDA_OUTPUT_BUCKET_NAME')
+
+# Object metadata written by the extraction Lambda when it stages the source file
+CONTENT_HASH_METADATA_KEY = 'content-sha256'
+# CopyObject (used to attach the metadata after a multipart upload) is limited to 5 GB objects,
+# so larger staged files keep their hash in a sidecar object next to them
+COPY_OBJECT_MAX_BYTES = 5 * 1024 ** 3
+CONTENT_HASH_SIDECAR_SUFFIX = '.content-sha256.json'
+
+
+def ocr_artifact_key(content_hash: str) -> str:
+    return f"{OCR_ARTIFACT_PREFIX}{content_hash}.txt.gz"
+
+
+def analysis_key(source_key: str) -> str:
+    return f"{source_key}-organized-analysis.json"
+
+
+def head_object(bucket_name: str, key: str) -> Optional[Dict[str, Any]]:
+    """
+    HeadObject, or None when the object does not exist.
+    """
+    try:
+        return get_client('s3').head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404', 'NotFound'):
+            return None
+        raise
+
+
+def content_hash_sidecar_key(key: str) -> str:
+    return f"{key}{CONTENT_HASH_SIDECAR_SUFFIX}"
+
+
+def put_content_hash_sidecar(bucket_name: str, key: str, etag: str, content_hash: str) -> None:
+    """
+    Record the hash of a staged file too large for CopyObject. The object's ETag is stored with
+    it, so a sidecar left over from an earlier version of the object is never trusted.
+    """
+    get_client('s3').put_object(
+        Bucket=bucket_name,
+        Key=content_hash_sidecar_key(key),
+        Body=json.dumps({'etag': etag, CONTENT_HASH_METADATA_KEY: content_hash}),
+        ContentType="application/json"
+    )
+
+
+def get_stored_content_hash(bucket_name: str, key: str) -> Optional[str]:
+    """
+    The content-sha256 of a staged source file, from its metadata or, for files over
+    COPY_OBJECT_MAX_BYTES, its sidecar. None when the object or the hash is missing.
+    """
+    head = head_object(bucket_name, key)
+    if not head:
+        return None
+    content_hash = head.get('Metadata', {}).get(CONTENT_HASH_METADATA_KEY)
+    if content_hash or head.get('ContentLength', 0) <= COPY_OBJECT_MAX_BYTES:
+        return content_hash
+    try:
+        response = get_client('s3').get_object(Bucket=bucket_name, Key=content_hash_sidecar_key(key))
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404', 'NotFound'):
+            return None
+        raise
+    sidecar = json.load(response['Body'])
+    return sidecar.get(CONTENT_HASH_METADATA_KEY) if sidecar.get('etag') == head.get('ETag') else None
+
+
+def find_prior_artifacts(content_hash: str, source_key: str) -> Dict[str, Dict[str, str]]:
+    """
+    Locations of the artifacts an earlier run already derived from this source file.
+
+    Returns:
+        Dict[str, Dict[str, str]]: 'ocrText' and/or 'analysis', each with bucket and key, for the ones that exist
+    """
+    candidates = {
+        'ocrText': (OCR_ARTIFACT_BUCKET_NAME, ocr_artifact_key(content_hash)),
+        'analysis': (ANALYSIS_BUCKET_NAME, analysis_key(source_key)),
+    }
+    return {
+        name: {'bucket': bucket_name, 'key': key}
+        for name, (bucket_name, key) in candidates.items()
+        if bucket_name and head_object(bucket_name, key)
+    }
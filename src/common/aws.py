@@ -0,0 +1,79 @@
+import os
+import asyncio
+import functools
+import contextvars
+import threading
+import boto3
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar('T')
+
+# Worker threads for blocking boto3 calls, shared by every handler in the container
+AWS_THREAD_POOL_SIZE = int(os.environ.get('AWS_THREAD_POOL_SIZE', '16'))
+# HTTP connections kept per client. Matches the thread pool so concurrent calls never wait for a connection.
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', str(AWS_THREAD_POOL_SIZE)))
+
+# Points DynamoDB clients and tables at a local stand-in (e.g. DynamoDB Local at http://localhost:8000)
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+
+AWS_CLIENT_CONFIG = Config(
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    retries={'max_attempts': 5, 'mode': 'standard'}
+)
+
+_executor = ThreadPoolExecutor(max_workers=AWS_THREAD_POOL_SIZE, thread_name_prefix='aws')
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+_resources = threading.local()
+
+
+def get_client(service_name: str, config: Config = None) -> Any:
+    """
+    A boto3 client per service, created once per container with a connection pool sized for
+    concurrent calls. Clients are thread-safe, so the same client is used from every worker thread.
+    """
+    cache_key = service_name if config is None else f"{service_name}:{id(config)}"
+    client = _clients.get(cache_key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(cache_key)
+            if client is None:
+                client_config = AWS_CLIENT_CONFIG.merge(config) if config else AWS_CLIENT_CONFIG
+                endpoint_url = DYNAMODB_ENDPOINT_URL if service_name == 'dynamodb' else None
+                client = boto3.client(service_name, config=client_config, endpoint_url=endpoint_url)
+                _clients[cache_key] = client
+    return client
+
+
+def get_table(table_name: str) -> Any:
+    """
+    A DynamoDB Table resource. boto3 resources are not thread-safe, so each worker thread gets its own.
+    """
+    tables = getattr(_resources, 'tables', None)
+    if tables is None:
+        tables = _resources.tables = {}
+    table = tables.get(table_name)
+    if table is None:
+        if not hasattr(_resources, 'dynamodb'):
+            _resources.dynamodb = boto3.resource('dynamodb', config=AWS_CLIENT_CONFIG, endpoint_url=DYNAMODB_ENDPOINT_URL)
+        table = tables[table_name] = _resources.dynamodb.Table(table_name)
+    return table
+
+
+async def run_sync(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking call (typically a boto3 call) on the shared AWS thread pool without blocking
+    the event loop, so independent AWS calls can be awaited together with asyncio.gather.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+async def table_call(table_name: str, method: str, **kwargs: Any) -> Any:
+    """
+    Call a DynamoDB Table method (put_item, query, update_item, ...) on the shared AWS thread pool.
+    """
+    return await run_sync(lambda: getattr(get_table(table_name), method)(**kwargs))
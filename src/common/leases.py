@@ -0,0 +1,152 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from botocore.exceptions import ClientError
+from typing import Any, AsyncIterator, Dict, Optional
+
+from common.aws import table_call
+
+logger = logging.getLogger(__name__)
+
+# Table holding the concurrency slots (partition key resource, sort key slot). Leasing is off when it is not set.
+CONCURRENCY_LEASE_TABLE_NAME = os.environ.get('CONCURRENCY_LEASE_TABLE_NAME')
+# How long acquire() keeps looking for a free slot before raising LeaseUnavailable
+LEASE_ACQUIRE_TIMEOUT_SECONDS = float(os.environ.get('LEASE_ACQUIRE_TIMEOUT_SECONDS', '60'))
+# Full-jitter exponential backoff between attempts while every slot is taken
+LEASE_RETRY_BASE_SECONDS = float(os.environ.get('LEASE_RETRY_BASE_SECONDS', '0.5'))
+LEASE_RETRY_MAX_SECONDS = float(os.environ.get('LEASE_RETRY_MAX_SECONDS', '5'))
+
+
+class LeaseUnavailable(Exception):
+    """
+    Every slot of the resource stayed held by an unexpired lease for the whole acquire timeout.
+    """
+
+
+class ConcurrencyGovernor:
+    """
+    Caps how many holders, across every Lambda instance, use a resource at the same time.
+
+    The resource has `limit` slots, stored as items (resource, slot) in the lease table. A slot is
+    taken with a conditional write that only succeeds when the slot is free or its lease has
+    expired, so a holder that crashed without releasing gives its slot back after lease_seconds.
+    Release only clears a slot its holder still owns.
+
+    Leases are plain dicts, so a lease taken by one invocation can be stored (e.g. next to a task
+    token) and released by another. Without a table or with a limit of 0 no leases are taken and
+    acquire() never waits.
+    """
+
+    def __init__(self, resource: str, limit: int, lease_seconds: int,
+                 table_name: Optional[str] = CONCURRENCY_LEASE_TABLE_NAME,
+                 acquire_timeout: float = LEASE_ACQUIRE_TIMEOUT_SECONDS):
+        self.resource = resource
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self.table_name = table_name
+        self.acquire_timeout = acquire_timeout
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.table_name) and self.limit > 0
+
+    async def try_acquire(self) -> Optional[Dict[str, Any]]:
+        """
+        Take one free or expired slot, or return None when all of them are held.
+        """
+        now = int(time.time())
+        response = await table_call(
+            self.table_name, 'query',
+            KeyConditionExpression="#resource = :resource",
+            ExpressionAttributeNames={'#resource': 'resource'},
+            ExpressionAttributeValues={':resource': self.resource}
+        )
+        held = {
+            int(item['slot']) for item in response.get('Items', [])
+            if item.get('holder') and int(item.get('expiresAt', 0)) >= now
+        }
+        candidates = [slot for slot in range(self.limit) if slot not in held]
+        # Spread concurrent acquirers over different slots
+        random.shuffle(candidates)
+
+        holder = uuid.uuid4().hex
+        expires_at = now + self.lease_seconds
+        for slot in candidates:
+            try:
+                # The read above may be stale; the condition decides who gets the slot
+                await table_call(
+                    self.table_name, 'update_item',
+                    Key={'resource': self.resource, 'slot': slot},
+                    UpdateExpression="SET holder = :holder, expiresAt = :expires_at",
+                    ConditionExpression="attribute_not_exists(holder) OR expiresAt < :now",
+                    ExpressionAttributeValues={':holder': holder, ':expires_at': expires_at, ':now': now}
+                )
+                return {'resource': self.resource, 'slot': slot, 'holder': holder, 'expiresAt': expires_at}
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        return None
+
+    async def acquire(self) -> Optional[Dict[str, Any]]:
+        """
+        Wait for a slot, backing off while all of them are held.
+
+        Returns:
+            Optional[Dict[str, Any]]: The lease to pass to release(), or None when leasing is disabled
+
+        Raises:
+            LeaseUnavailable: When no slot freed up within the acquire timeout
+        """
+        if not self.enabled:
+            return None
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            lease = await self.try_acquire()
+            if lease:
+                waited = time.monotonic() - started
+                if attempt:
+                    logger.info(f"Acquired {self.resource} slot {lease['slot']} after {attempt} attempts ({waited:.1f}s)")
+                return lease
+            attempt += 1
+            remaining = self.acquire_timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                raise LeaseUnavailable(
+                    f"All {self.limit} {self.resource} slots stayed held for {self.acquire_timeout:.0f}s"
+                )
+            delay = random.uniform(0, min(LEASE_RETRY_MAX_SECONDS, LEASE_RETRY_BASE_SECONDS * 2 ** attempt))
+            await asyncio.sleep(min(delay, remaining))
+
+    async def release(self, lease: Optional[Dict[str, Any]]) -> None:
+        """
+        Free the lease's slot. A lease that already expired and was taken over is left alone.
+        """
+        if not lease or not self.table_name:
+            return
+        try:
+            await table_call(
+                self.table_name, 'update_item',
+                Key={'resource': lease['resource'], 'slot': int(lease['slot'])},
+                UpdateExpression="REMOVE holder, expiresAt",
+                ConditionExpression="holder = :holder",
+                ExpressionAttributeValues={':holder': lease['holder']}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            logger.warning(f"Lease on {lease['resource']} slot {lease['slot']} expired before it was released")
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Hold a slot for the duration of the block.
+        """
+        lease = await self.acquire()
+        try:
+            yield lease
+        finally:
+            await self.release(lease)
@@ -0,0 +1,20 @@
+import os
+from typing import Optional
+
+# OCR routes the extraction Lambda picks for a staged file (ocrRoute), other than 'async' (a Textract job):
+#   sync    - images and short PDFs, OCR'd with synchronous AnalyzeDocument calls by the processing Lambda
+#   sharded - longer PDFs, split and OCR'd page by page in parallel by the processing Lambda
+SYNC_OCR_ROUTES = ('sync', 'sharded')
+
+# Most ER discharge sheets and similar short records are 1-3 pages
+OCR_SYNC_MAX_PAGES = int(os.environ.get('OCR_SYNC_MAX_PAGES', '10'))
+# Bounded by the processing Lambda timeout: pages are OCR'd OCR_SYNC_CONCURRENCY at a time (0 disables the route)
+OCR_SHARDED_MAX_PAGES = int(os.environ.get('OCR_SHARDED_MAX_PAGES', '500'))
+
+
+def route_max_pages(route: Optional[str]) -> int:
+    """
+    The most pages a document on the route may have. The extraction Lambda routes on a page count
+    that can be too low, so the processing Lambda checks the real count against the same ceiling.
+    """
+    return OCR_SYNC_MAX_PAGES if route == 'sync' else OCR_SHARDED_MAX_PAGES
@@ -0,0 +1,71 @@
+import os
+import gzip
+import zlib
+from typing import Dict, Any
+
+from common.aws import get_client
+
+# How the raw SOAP envelope is stored on its SOAP table item:
+#   inline     - the envelope string and the extracted data map on the item (original layout)
+#   compressed - only the indexed fields, with the envelope zlib-compressed into a binary attribute
+#   s3         - only the indexed fields, with the envelope gzipped to S3 and a pointer on the item
+SOAP_STORAGE_MODE = os.environ.get('SOAP_STORAGE_MODE', 'compressed')
+SOAP_STORAGE_BUCKET_NAME = os.environ.get('SOAP_STORAGE_BUCKET_NAME')
+SOAP_STORAGE_PREFIX = os.environ.get('SOAP_STORAGE_PREFIX', 'soap-messages/')
+# Compressed envelopes larger than this go to S3 (when a bucket is configured) to stay clear of the 400 KB item limit
+SOAP_INLINE_MAX_BYTES = int(os.environ.get('SOAP_INLINE_MAX_BYTES', str(300 * 1024)))
+
+
+def build_soap_item(extracted_data: Dict[str, str], soap_message: str, timestamp: int) -> Dict[str, Any]:
+    """
+    Build the SOAP table item for one notification according to SOAP_STORAGE_MODE.
+    In s3 mode (or for an oversized compressed envelope) the envelope is uploaded here.
+    """
+    item = {
+        'id': extracted_data['sf:Id'],
+        'timestamp': timestamp,
+        'file_info_id': extracted_data['sf:File_Info_Id__c'],
+        'document_type': extracted_data['sf:Record_Type_Name__c'],
+    }
+
+    if SOAP_STORAGE_MODE == 'inline':
+        item['extracted_data'] = extracted_data
+        item['soap_message'] = soap_message
+        return item
+
+    message_bytes = soap_message.encode('utf-8')
+    if SOAP_STORAGE_MODE == 'compressed':
+        compressed = zlib.compress(message_bytes)
+        if len(compressed) <= SOAP_INLINE_MAX_BYTES or not SOAP_STORAGE_BUCKET_NAME:
+            item['soap_message_zlib'] = compressed
+            return item
+
+    key = f"{SOAP_STORAGE_PREFIX}{item['id']}/{timestamp}.xml.gz"
+    get_client('s3').put_object(
+        Bucket=SOAP_STORAGE_BUCKET_NAME,
+        Key=key,
+        Body=gzip.compress(message_bytes),
+        ContentType="application/gzip"
+    )
+    item['soap_message_s3_bucket'] = SOAP_STORAGE_BUCKET_NAME
+    item['soap_message_s3_key'] = key
+    return item
+
+
+def read_soap_message(item: Dict[str, Any]) -> str:
+    """
+    Return the raw SOAP envelope of a SOAP table item, whichever way it was stored.
+    """
+    if 'soap_message' in item:
+        return item['soap_message']
+
+    if 'soap_message_zlib' in item:
+        value = item['soap_message_zlib']
+        # The DynamoDB resource returns binary attributes wrapped in boto3.dynamodb.types.Binary
+        return zlib.decompress(bytes(getattr(value, 'value', value))).decode('utf-8')
+
+    if 'soap_message_s3_key' in item:
+        response = get_client('s3').get_object(Bucket=item['soap_message_s3_bucket'], Key=item['soap_message_s3_key'])
+        return gzip.decompress(response['Body'].read()).decode('utf-8')
+
+    raise KeyError(f"SOAP table item {item.get('id')}/{item.get('timestamp')} has no stored SOAP message")
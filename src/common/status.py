@@ -0,0 +1,87 @@
+import os
+import asyncio
+import logging
+import aiohttp
+from typing import Dict, Any, List, Optional, Tuple
+
+from common.appconnect import AppConnectClient, get_appconnect_client
+
+logger = logging.getLogger(__name__)
+
+# 'background' sends status updates alongside the stage's work; 'inline' awaits each update (and raises on failure)
+STATUS_UPDATE_MODE = os.environ.get('STATUS_UPDATE_MODE', 'background')
+# Extra attempts for a status update that failed with a connection error or timeout
+STATUS_UPDATE_RETRIES = int(os.environ.get('STATUS_UPDATE_RETRIES', '2'))
+
+
+class StatusPublisher:
+    """
+    Publishes Document Extraction Status updates to Salesforce (through AppConnect) without
+    keeping them on the critical path.
+
+    In background mode publish() only queues the update. Updates for the same document are
+    delivered one at a time and in order; when a newer status is queued before an older one was
+    sent, the older one is dropped because Salesforce would overwrite it immediately. flush()
+    waits for everything queued and returns the updates that could not be delivered, so a slow
+    or failing AppConnect never fails the stage itself.
+
+    Create one publisher per invocation and always flush it before the handler returns.
+    """
+
+    def __init__(self, client: Optional[AppConnectClient] = None, mode: str = STATUS_UPDATE_MODE):
+        self.client = client or get_appconnect_client()
+        self.background = mode != 'inline'
+        self._queued: Dict[str, Tuple[str, str]] = {}
+        self._senders: Dict[str, asyncio.Task] = {}
+        self._failures: List[Dict[str, Any]] = []
+
+    async def publish(self, file_info_id: str, document_id: str, status: str) -> None:
+        if not self.background:
+            await self.client.update_status(file_info_id, document_id, status)
+            return
+
+        superseded = self._queued.get(document_id)
+        if superseded:
+            logger.info(f"Dropping superseded status '{superseded[1]}' for document {document_id}")
+        self._queued[document_id] = (file_info_id, status)
+        sender = self._senders.get(document_id)
+        if sender is None or sender.done():
+            self._senders[document_id] = asyncio.create_task(self._send_queued(document_id))
+
+    async def _send_queued(self, document_id: str) -> None:
+        while document_id in self._queued:
+            file_info_id, status = self._queued.pop(document_id)
+            try:
+                await self._send(file_info_id, document_id, status)
+                logger.info(f"Published status '{status}' for document {document_id}")
+            except Exception as e:
+                logger.warning(f"Failed to publish status '{status}' for document {document_id}: {str(e)}")
+                self._failures.append({
+                    'documentId': document_id,
+                    'fileInfoId': file_info_id,
+                    'status': status,
+                    'error': str(e)
+                })
+
+    async def _send(self, file_info_id: str, document_id: str, status: str) -> None:
+        for attempt in range(STATUS_UPDATE_RETRIES + 1):
+            try:
+                await self.client.update_status(file_info_id, document_id, status)
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # A newer status makes retrying this one pointless
+                if attempt == STATUS_UPDATE_RETRIES or document_id in self._queued:
+                    raise
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def flush(self) -> List[Dict[str, Any]]:
+        """
+        Wait for every queued update to be delivered or to fail.
+
+        Returns:
+            List[Dict[str, Any]]: The updates that could not be delivered (empty when all succeeded)
+        """
+        while any(not sender.done() for sender in self._senders.values()):
+            await asyncio.gather(*self._senders.values())
+        failures, self._failures = self._failures, []
+        return failures
@@ -0,0 +1,27 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The Lambdas import the shared layer as `common` and their own modules by bare name
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'processing'))
+
+# Settings the handlers require at import time; nothing here reaches AWS
+for name, value in {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_XRAY_SDK_ENABLED': 'false',
+    'DOCUMENT_METADATA_TABLE_NAME': 'document-metadata',
+    'DOCUMENT_SOAP_TABLE_NAME': 'document-soap',
+    'BEDROCK_MODEL_ID': 'model',
+    'LAMBDA_OUTPUT_BUCKET_NAME': 'output',
+    'IBM_APPCONNECT_URL': 'http://appconnect.invalid',
+    'IBM_APPCONNECT_USERNAME': 'user',
+    'IBM_APPCONNECT_PASSWORD': 'password',
+    'STATE_MACHINE_ARN': 'arn:aws:states:us-east-1:000000000000:stateMachine:test',
+    'SNS_TOPIC_ARN': 'arn:aws:sns:us-east-1:000000000000:test',
+    'EXTRACTION_CACHE_TIERS': 'memory',
+}.items():
+    os.environ.setdefault(name, value)
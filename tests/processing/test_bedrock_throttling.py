@@ -0,0 +1,23 @@
+import asyncio
+
+import handler
+from bedrock_throttling import BedrockInvoker
+
+
+def test_stream_stopped_at_the_closing_tag_settles_its_reservation():
+    invoker = BedrockInvoker(rpm_limit=0, tpm_limit=100000)
+    # Closed at the tag before message_delta, so the response never reported its output tokens
+    text = '<extracted_data>{}</extracted_data>' + 'x' * 365
+    stats = {'inputTokens': 1000, 'outputTokens': None, 'stoppedAtTag': True}
+
+    async def call():
+        return text, stats
+
+    async def invoke():
+        return await invoker.invoke(call, 1000 + 4096, handler.used_tokens)
+
+    asyncio.run(invoke())
+
+    # Only the prompt and the streamed text stay reserved, not the whole output budget
+    assert handler.used_tokens((text, stats)) == 1000 + 100
+    assert invoker.tokens.available >= 100000 - 1100 - 1
@@ -0,0 +1,67 @@
+import json
+import asyncio
+
+import handler
+from model_tiering import validate_extraction
+from textract_text import PAGE_SEPARATOR
+
+EMPTY_CHUNK = {"history": None, "chiefComplaints": None, "numberOfVisits": None,
+               "impression": None, "recommendations": None}
+FOUND_CHUNK = {"history": "Rear-ended at a stop light", "chiefComplaints": "<ul><li>Neck pain</li></ul>",
+               "numberOfVisits": 4, "impression": "<ul><li>Cervical strain</li></ul>",
+               "recommendations": "Physical Therapy"}
+
+
+class FakeCache:
+    def __init__(self):
+        self.puts = {}
+
+    def get(self, key):
+        return None, None
+
+    def put(self, key, value):
+        self.puts[key] = value
+
+
+def fake_model(calls):
+    async def invoke(system_prompt, user_prompt, text, model_id, document_type):
+        calls.append(model_id)
+        extracted = FOUND_CHUNK if "relevant" in text else EMPTY_CHUNK
+        return f"<extracted_data>{json.dumps(extracted)}</extracted_data>"
+    return invoke
+
+
+def test_all_null_fails_only_when_a_field_is_required():
+    assert validate_extraction("PT/Chiro", EMPTY_CHUNK) == ["no field was extracted"]
+    assert validate_extraction("PT/Chiro", EMPTY_CHUNK, require_any_field=False) == []
+
+
+def test_empty_chunk_does_not_escalate(monkeypatch):
+    calls = []
+    monkeypatch.setattr(handler, "invoke_claude_converse", fake_model(calls))
+
+    extracted, tier = asyncio.run(handler.extract_with_model_ladder(
+        "nothing here", "PT/Chiro", ["cheap", "strong"], require_any_field=False))
+
+    assert extracted == EMPTY_CHUNK
+    assert tier["modelId"] == "cheap" and tier["valid"] and tier["escalations"] == 0
+    assert calls == ["cheap"]
+
+
+def test_chunked_document_with_empty_chunks_is_cached(monkeypatch):
+    calls = []
+    cache = FakeCache()
+    monkeypatch.setattr(handler, "invoke_claude_converse", fake_model(calls))
+    monkeypatch.setattr(handler, "extraction_cache", cache)
+    monkeypatch.setattr(handler, "model_ladder", lambda document_type: ["cheap", "strong"])
+    monkeypatch.setattr(handler, "EXTRACTION_CHUNK_THRESHOLD_TOKENS", 10)
+    monkeypatch.setattr(handler, "EXTRACTION_CHUNK_MAX_TOKENS", 10)
+    text = PAGE_SEPARATOR.join(["billing ledger " * 10, "relevant visit note " * 10, "fax cover " * 10])
+
+    result = asyncio.run(handler.process_data_with_claude(text, "record.pdf", "PT/Chiro"))
+
+    assert result["chunkCount"] == 3
+    assert set(calls) == {"cheap"}
+    assert all(tier["valid"] for tier in result["modelTiering"])
+    assert result["extractedData"]["history"] == FOUND_CHUNK["history"]
+    assert cache.puts == {result["cache"]["key"]: result["extractedData"]}
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+import sync_ocr
+from common.leases import LeaseUnavailable
+
+
+def client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'AnalyzeDocument')
+
+
+def failing_analyze(code, calls):
+    def analyze(document):
+        calls.append(document)
+        raise client_error(code)
+    return analyze
+
+
+def ocr_image():
+    return asyncio.run(sync_ocr.ocr_document_sync('bucket', 'scan.png', 'image/png'))
+
+
+def test_unreadable_document_needs_a_textract_job(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sync_ocr, 'analyze_page', failing_analyze('UnsupportedDocumentException', calls))
+
+    with pytest.raises(sync_ocr.SyncOcrUnsuitable):
+        ocr_image()
+    assert len(calls) == 1
+
+
+def test_throttling_backs_off_then_leaves_the_retry_to_the_workflow(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sync_ocr, 'analyze_page', failing_analyze('ProvisionedThroughputExceededException', calls))
+    monkeypatch.setattr(sync_ocr, 'OCR_RETRY_BASE_SECONDS', 0)
+
+    with pytest.raises(LeaseUnavailable):
+        ocr_image()
+    assert len(calls) == sync_ocr.OCR_THROTTLE_RETRIES + 1
+
+
+def test_throttled_page_succeeds_on_retry(monkeypatch):
+    calls = []
+
+    def analyze(document):
+        calls.append(document)
+        if len(calls) == 1:
+            raise client_error('ThrottlingException')
+        return [{'BlockType': 'LINE', 'Text': 'Cervical strain', 'Page': 1}]
+
+    monkeypatch.setattr(sync_ocr, 'analyze_page', analyze)
+    monkeypatch.setattr(sync_ocr, 'OCR_RETRY_BASE_SECONDS', 0)
+
+    text, stats = ocr_image()
+    assert 'Cervical strain' in text
+    assert stats == {'pages': 1, 'cachedPages': 0}
+
+
+def test_other_errors_are_not_routed_to_a_textract_job(monkeypatch):
+    monkeypatch.setattr(sync_ocr, 'analyze_page', failing_analyze('AccessDeniedException', []))
+
+    with pytest.raises(ClientError):
+        ocr_image()
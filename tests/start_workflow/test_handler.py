@@ -0,0 +1,130 @@
+import os
+import asyncio
+import importlib.util
+
+import pytest
+from botocore.exceptions import ClientError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ENVELOPE = """<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+ <soapenv:Body>
+  <notifications xmlns="http://soap.sforce.com/2005/09/outbound">
+   <OrganizationId>00D000000000001</OrganizationId>
+   <SessionId>session</SessionId>
+   <Notification>
+    <Id>04l000000000001</Id>
+    <sObject xsi:type="sf:Medical_Record__c" xmlns:sf="urn:sobject.enterprise.soap.sforce.com">
+     <sf:Id>a01000000000001</sf:Id>
+     <sf:File_Info_Id__c>a02000000000001</sf:File_Info_Id__c>
+     <sf:Record_Type_Name__c>Provider</sf:Record_Type_Name__c>
+    </sObject>
+   </Notification>
+  </notifications>
+ </soapenv:Body>
+</soapenv:Envelope>"""
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    # Loaded under its own name: the processing Lambda's handler module is also importable as `handler`
+    spec = importlib.util.spec_from_file_location(
+        'start_workflow_handler', os.path.join(ROOT, 'lambda', 'start_workflow', 'handler.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'NOTIFICATION_DEDUP_TABLE_NAME', 'notification-dedup')
+    return module
+
+
+def fake_aws(handler, monkeypatch, existing_claim=None):
+    calls = {'tables': [], 'started': [], 'written': []}
+
+    async def table_call(table_name, method, **kwargs):
+        calls['tables'].append((table_name, method))
+        if method == 'put_item' and existing_claim is not None:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}, 'Item': existing_claim},
+                              'PutItem')
+
+    async def start_workflow(extracted_data, execution_name, status_publisher):
+        calls['started'].append(execution_name)
+        return {'executionArn': execution_name}
+
+    async def write_to_dynamodb(notifications):
+        calls['written'].extend(data['sf:File_Info_Id__c'] for data, _ in notifications)
+
+    monkeypatch.setattr(handler, 'table_call', table_call)
+    monkeypatch.setattr(handler, 'start_workflow', start_workflow)
+    monkeypatch.setattr(handler, 'write_to_dynamodb', write_to_dynamodb)
+    return calls
+
+
+def test_first_claim_starts_and_records_the_notification(handler, monkeypatch):
+    calls = fake_aws(handler, monkeypatch)
+
+    response = asyncio.run(handler.process_soap_event({'body': ENVELOPE}))
+
+    assert response['statusCode'] == 200
+    assert len(calls['started']) == 1
+    assert calls['written'] == ['a02000000000001']
+    # Claims stay off the SOAP table
+    assert {table for table, _ in calls['tables']} == {'notification-dedup'}
+
+
+def test_copy_redriving_an_unstarted_claim_does_not_write_a_second_record(handler, monkeypatch):
+    claim = {'executionName': {'S': 'a01000000000001-a02000000000001-1'}, 'started': {'BOOL': False}}
+    calls = fake_aws(handler, monkeypatch, existing_claim=claim)
+
+    response = asyncio.run(handler.process_soap_event({'body': ENVELOPE}))
+
+    assert response['statusCode'] == 200
+    assert calls['started'] == ['a01000000000001-a02000000000001-1']
+    assert calls['written'] == []
+
+
+def test_copy_of_a_started_claim_is_only_acked(handler, monkeypatch):
+    claim = {'executionName': {'S': 'a01000000000001-a02000000000001-1'}, 'started': {'BOOL': True}}
+    calls = fake_aws(handler, monkeypatch, existing_claim=claim)
+
+    response = asyncio.run(handler.process_soap_event({'body': ENVELOPE}))
+
+    assert response['statusCode'] == 200
+    assert calls['started'] == []
+    assert calls['written'] == []
+
+
+def batch_envelope(notifications):
+    notification = ENVELOPE[ENVELOPE.index('   <Notification>'):ENVELOPE.index('  </notifications>')]
+    batch = ''.join(notification.replace('000000000001', f'{index:012d}') for index in range(1, notifications + 1))
+    return ENVELOPE.replace(notification, batch)
+
+
+def assert_round_trips(handler, notifications):
+    for index, (data, message) in enumerate(notifications, start=1):
+        # The stored envelope is parsed again on replay and by anything reading the SOAP table
+        [(reparsed, reparsed_message)] = handler.extract_soap_notifications(message)
+        assert reparsed == data
+        assert reparsed_message == message
+        assert data['sf:File_Info_Id__c'] == f'a02{index:012d}'
+        # xsi:type refers to the sf prefix by name, so the prefix must still be declared
+        assert 'xsi:type="sf:Medical_Record__c"' in message
+        assert 'xmlns:sf="urn:sobject.enterprise.soap.sforce.com"' in message
+        assert 'xmlns:xsi=' in message and 'ns0:' not in message
+
+
+def test_batch_envelope_is_split_with_its_original_prefixes(handler):
+    notifications = handler.extract_soap_notifications(batch_envelope(3))
+
+    assert len(notifications) == 3
+    assert_round_trips(handler, notifications)
+
+
+def test_serialized_split_keeps_the_original_prefixes(handler, monkeypatch):
+    # Envelopes the text split cannot line up with are rebuilt from the parsed tree
+    monkeypatch.setattr(handler, 'split_envelope', lambda soap_message, count: None)
+
+    notifications = handler.extract_soap_notifications(batch_envelope(2))
+
+    assert len(notifications) == 2
+    for data, message in notifications:
+        assert '<soapenv:Envelope' in message
+    assert_round_trips(handler, notifications)